@@ -13,7 +13,28 @@
 #include <cmath>
 #include <numeric>
 #include <set>
+#include <unordered_map>
+#include <unordered_set>
 #include <cctype>
+#include <cstdlib>
+#include <cstring>
+#include <climits>
+#include <charconv>
+#include <stdexcept>
+#include <string_view>
+#include <thread>
+#include <exception>
+#include <sqlite3.h>
+
+#ifndef ANALYTICS_LIBRARY
+#include <csignal>
+#include <cerrno>
+#include <fcntl.h>
+#include <poll.h>
+#include <sys/socket.h>
+#include <sys/un.h>
+#include <unistd.h>
+#endif
 
 using namespace std;
 
@@ -96,6 +117,7 @@ public:
     
     // Методи для роботи з позиціями
     void addItem(const SaleItem& item) { items.push_back(item); }
+    void addItem(SaleItem&& item) { items.push_back(std::move(item)); }
     size_t getItemsCount() const { return items.size(); }
     
     // Метод для отримання загальної виручки з позицій
@@ -115,35 +137,28 @@ public:
  */
 class TopProduct {
 private:
+    int product_id;
     string name;
     double revenue;
     int quantity;
 
 public:
-    TopProduct() : revenue(0.0), quantity(0) {}
+    TopProduct() : product_id(0), revenue(0.0), quantity(0) {}
     
-    TopProduct(const string& n, double rev, int qty)
-        : name(n), revenue(rev), quantity(qty) {}
+    TopProduct(int id, const string& n, double rev, int qty)
+        : product_id(id), name(n), revenue(rev), quantity(qty) {}
     
     // Геттери
+    int getProductId() const { return product_id; }
     const string& getName() const { return name; }
     double getRevenue() const { return revenue; }
     int getQuantity() const { return quantity; }
     
     // Сеттери
+    void setProductId(int id) { product_id = id; }
     void setName(const string& n) { name = n; }
     void setRevenue(double rev) { revenue = rev; }
     void setQuantity(int qty) { quantity = qty; }
-    
-    // Метод порівняння для сортування за виручкою
-    static bool compareByRevenue(const TopProduct& a, const TopProduct& b) {
-        return a.revenue > b.revenue;
-    }
-    
-    // Метод порівняння для сортування за кількістю
-    static bool compareByQuantity(const TopProduct& a, const TopProduct& b) {
-        return a.quantity > b.quantity;
-    }
 };
 
 
@@ -189,24 +204,27 @@ public:
  */
 class ABCResult {
 private:
+    int product_id;
     string product_name;
     double revenue;
     double cumulative_percent;
     char category;
 
 public:
-    ABCResult() : revenue(0.0), cumulative_percent(0.0), category('C') {}
+    ABCResult() : product_id(0), revenue(0.0), cumulative_percent(0.0), category('C') {}
     
-    ABCResult(const string& name, double rev, double cum, char cat)
-        : product_name(name), revenue(rev), cumulative_percent(cum), category(cat) {}
+    ABCResult(int id, const string& name, double rev, double cum, char cat)
+        : product_id(id), product_name(name), revenue(rev), cumulative_percent(cum), category(cat) {}
     
     // Геттери
+    int getProductId() const { return product_id; }
     const string& getProductName() const { return product_name; }
     double getRevenue() const { return revenue; }
     double getCumulativePercent() const { return cumulative_percent; }
     char getCategory() const { return category; }
     
     // Сеттери
+    void setProductId(int id) { product_id = id; }
     void setProductName(const string& name) { product_name = name; }
     void setRevenue(double rev) { revenue = rev; }
     void setCumulativePercent(double cum) { cumulative_percent = cum; }
@@ -214,61 +232,30 @@ public:
 };
 
 
-// ========== ДОПОМІЖНІ КЛАСИ ==========
-
 /**
- * Клас для парсингу чисел
- * Інкапсулює логіку безпечного парсингу
+ * Клас для частки категорії у виручці
  */
-class NumberParser {
+class CategoryShare {
+private:
+    int category_id;
+    string name;
+    double share;
+
 public:
-    static int parseInteger(const string& str) {
-        if (str.empty()) return 0;
-        string clean;
-        bool hasSign = false;
-        for (size_t i = 0; i < str.length(); i++) {
-            char c = str[i];
-            if (isdigit(c)) {
-                clean += c;
-            } else if ((c == '-' || c == '+') && !hasSign && clean.empty()) {
-                clean += c;
-                hasSign = true;
-            }
-        }
-        if (clean.empty() || clean == "-" || clean == "+") return 0;
-        try {
-            return stoi(clean);
-        } catch (...) {
-            return 0;
-        }
-    }
-    
-    static double parseDouble(const string& str) {
-        if (str.empty()) return 0.0;
-        string clean;
-        bool hasDot = false;
-        bool hasE = false;
-        for (size_t i = 0; i < str.length(); i++) {
-            char c = str[i];
-            if (isdigit(c) || 
-                (i == 0 && (c == '-' || c == '+')) || 
-                (c == '.' && !hasDot) ||
-                ((c == 'e' || c == 'E') && !hasE && i > 0)) {
-                clean += c;
-                if (c == '.') hasDot = true;
-                if (c == 'e' || c == 'E') hasE = true;
-            }
-        }
-        if (clean.empty() || clean == "-" || clean == "+" || clean == ".") return 0.0;
-        try {
-            return stod(clean);
-        } catch (...) {
-            return 0.0;
-        }
-    }
+    CategoryShare() : category_id(0), share(0.0) {}
+    
+    CategoryShare(int id, const string& n, double sh)
+        : category_id(id), name(n), share(sh) {}
+    
+    // Геттери
+    int getCategoryId() const { return category_id; }
+    const string& getName() const { return name; }
+    double getShare() const { return share; }
 };
 
 
+// ========== ДОПОМІЖНІ КЛАСИ ==========
+
 /**
  * Клас для роботи з датами
  * Інкапсулює логіку парсингу та обробки дат
@@ -294,228 +281,509 @@ public:
 };
 
 
+// ========== КЛАС ДЛЯ ПАРСИНГУ JSON ==========
+
 /**
- * Клас для екранування JSON
- * Інкапсулює логіку екранування спеціальних символів
+ * Помилка синтаксису JSON з позицією (рядок і стовпець від 1)
  */
-class JSONEscaper {
+class JSONParseError : public runtime_error {
+private:
+    size_t line;
+    size_t column;
+
 public:
-    static string escape(const string& str) {
-        string result;
-        for (char c : str) {
-            if (c == '"') {
-                result += "\\\"";
-            } else if (c == '\\') {
-                result += "\\\\";
-            } else if (c == '\n') {
-                result += "\\n";
-            } else if (c == '\r') {
-                result += "\\r";
-            } else if (c == '\t') {
-                result += "\\t";
-            } else {
-                result += c;
-            }
-        }
-        return result;
+    JSONParseError(const string& message, size_t errorLine, size_t errorColumn)
+        : runtime_error(message), line(errorLine), column(errorColumn) {}
+    
+    size_t getLine() const { return line; }
+    size_t getColumn() const { return column; }
+    
+    string describe() const {
+        ostringstream text;
+        text << "JSON parse error at line " << line << ", column " << column << ": " << what();
+        return text.str();
     }
 };
 
 
-// ========== КЛАС ДЛЯ ПАРСИНГУ JSON ==========
-
 /**
- * Клас для парсингу JSON
- * Інкапсулює всю логіку парсингу JSON в класи
+ * Однопрохідний парсер JSON (рекурсивний спуск)
+ * Кожен байт входу читається один раз; рядки без екранування повертаються
+ * як string_view у вхідний буфер, копіюються тільки назви, що зберігаються.
+ * Невідомі ключі (з вкладеними об'єктами та масивами) пропускаються.
  */
 class JSONParser {
 private:
-    string json;
+    static const int MAX_DEPTH = 256;
     
-    // Приватні методи для парсингу
-    string extractStringValue(size_t startPos) {
-        // Спочатку знаходимо двокрапку після ключа
-        size_t colonPos = json.find(":", startPos);
-        if (colonPos == string::npos) return "";
-        
-        // Потім шукаємо першу лапку після двокрапки (пропускаючи пробіли)
-        size_t quotePos = colonPos + 1;
-        while (quotePos < json.length() && (json[quotePos] == ' ' || json[quotePos] == '\t')) {
-            quotePos++;
-        }
-        if (quotePos >= json.length() || json[quotePos] != '"') return "";
-        
-        // Шукаємо кінцеву лапку, пропускаючи екрановані
-        size_t endPos = quotePos + 1;
-        while (endPos < json.length()) {
-            if (json[endPos] == '"' && (endPos == 0 || json[endPos - 1] != '\\')) {
-                break;
+    string_view json;
+    size_t pos;
+    
+    [[noreturn]] void fail(const string& message) const {
+        // Рядок і стовпець рахуються тільки при помилці
+        size_t line = 1;
+        size_t lineStart = 0;
+        size_t end = min(pos, json.size());
+        for (size_t i = 0; i < end; ++i) {
+            if (json[i] == '\n') {
+                ++line;
+                lineStart = i + 1;
             }
-            endPos++;
         }
-        
-        if (endPos >= json.length()) return "";
-        
-        string value = json.substr(quotePos + 1, endPos - quotePos - 1);
-        // Замінюємо екрановані лапки
-        size_t pos = 0;
-        while ((pos = value.find("\\\"", pos)) != string::npos) {
-            value.replace(pos, 2, "\"");
-            pos += 1;
+        throw JSONParseError(message, line, end - lineStart + 1);
+    }
+    
+    void skipWhitespace() {
+        while (pos < json.size()) {
+            char c = json[pos];
+            if (c != ' ' && c != '\t' && c != '\n' && c != '\r') break;
+            ++pos;
+        }
+    }
+    
+    char peek() {
+        skipWhitespace();
+        if (pos >= json.size()) fail("unexpected end of input");
+        return json[pos];
+    }
+    
+    void expect(char c) {
+        if (peek() != c) fail(string("expected '") + c + "'");
+        ++pos;
+    }
+    
+    bool consume(char c) {
+        if (peek() != c) return false;
+        ++pos;
+        return true;
+    }
+    
+    static void appendUtf8(string& out, unsigned codepoint) {
+        if (codepoint < 0x80) {
+            out += static_cast<char>(codepoint);
+        } else if (codepoint < 0x800) {
+            out += static_cast<char>(0xC0 | (codepoint >> 6));
+            out += static_cast<char>(0x80 | (codepoint & 0x3F));
+        } else if (codepoint < 0x10000) {
+            out += static_cast<char>(0xE0 | (codepoint >> 12));
+            out += static_cast<char>(0x80 | ((codepoint >> 6) & 0x3F));
+            out += static_cast<char>(0x80 | (codepoint & 0x3F));
+        } else {
+            out += static_cast<char>(0xF0 | (codepoint >> 18));
+            out += static_cast<char>(0x80 | ((codepoint >> 12) & 0x3F));
+            out += static_cast<char>(0x80 | ((codepoint >> 6) & 0x3F));
+            out += static_cast<char>(0x80 | (codepoint & 0x3F));
+        }
+    }
+    
+    unsigned parseHex4() {
+        if (pos + 4 > json.size()) fail("truncated \\u escape");
+        unsigned value = 0;
+        for (int i = 0; i < 4; ++i) {
+            char c = json[pos++];
+            value <<= 4;
+            if (c >= '0' && c <= '9') value |= c - '0';
+            else if (c >= 'a' && c <= 'f') value |= c - 'a' + 10;
+            else if (c >= 'A' && c <= 'F') value |= c - 'A' + 10;
+            else fail("invalid \\u escape");
         }
         return value;
     }
     
-    string extractNumericValue(size_t startPos) {
-        size_t colonPos = json.find(":", startPos);
-        if (colonPos == string::npos) return "";
+    /**
+     * Рядок у лапках. Без екранування - view у вхідний буфер;
+     * з екрануванням - декодується у buffer, і повертається view на нього.
+     */
+    string_view parseString(string& buffer) {
+        if (peek() != '"') fail("expected string");
+        size_t start = ++pos;
         
-        size_t endPos = colonPos + 1;
-        bool inString = false;
-        while (endPos < json.length()) {
-            if (json[endPos] == '"' && (endPos == 0 || json[endPos - 1] != '\\')) {
-                inString = !inString;
-            } else if (!inString && (json[endPos] == ',' || json[endPos] == '}')) {
-                break;
-            }
-            endPos++;
+        // Швидкий шлях: до закриваючої лапки немає зворотних слешів
+        while (pos < json.size() && json[pos] != '"' && json[pos] != '\\') {
+            if (static_cast<unsigned char>(json[pos]) < 0x20) fail("control character in string");
+            ++pos;
+        }
+        if (pos >= json.size()) fail("unterminated string");
+        if (json[pos] == '"') {
+            return json.substr(start, pos++ - start);
         }
         
-        string value = json.substr(colonPos + 1, endPos - colonPos - 1);
-        // Видаляємо пробіли
-        size_t first = value.find_first_not_of(" \t\n\r");
-        if (first != string::npos) {
-            size_t last = value.find_last_not_of(" \t\n\r");
-            if (last != string::npos && last >= first) {
-                value = value.substr(first, last - first + 1);
-            } else {
-                value = value.substr(first);
+        buffer.assign(json.data() + start, pos - start);
+        while (true) {
+            if (pos >= json.size()) fail("unterminated string");
+            char c = json[pos++];
+            if (c == '"') break;
+            if (static_cast<unsigned char>(c) < 0x20) {
+                --pos;
+                fail("control character in string");
+            }
+            if (c != '\\') {
+                buffer += c;
+                continue;
+            }
+            if (pos >= json.size()) fail("unterminated string");
+            char escape = json[pos++];
+            switch (escape) {
+                case '"': buffer += '"'; break;
+                case '\\': buffer += '\\'; break;
+                case '/': buffer += '/'; break;
+                case 'b': buffer += '\b'; break;
+                case 'f': buffer += '\f'; break;
+                case 'n': buffer += '\n'; break;
+                case 'r': buffer += '\r'; break;
+                case 't': buffer += '\t'; break;
+                case 'u': {
+                    unsigned codepoint = parseHex4();
+                    if (codepoint >= 0xD800 && codepoint <= 0xDBFF) {
+                        // Сурогатна пара
+                        if (pos + 2 > json.size() || json[pos] != '\\' || json[pos + 1] != 'u') {
+                            fail("unpaired surrogate in \\u escape");
+                        }
+                        pos += 2;
+                        unsigned low = parseHex4();
+                        if (low < 0xDC00 || low > 0xDFFF) fail("invalid surrogate pair");
+                        codepoint = 0x10000 + ((codepoint - 0xD800) << 10) + (low - 0xDC00);
+                    }
+                    appendUtf8(buffer, codepoint);
+                    break;
+                }
+                default:
+                    --pos;
+                    fail("invalid escape sequence");
             }
-        } else {
-            value.clear();
         }
-        return value;
+        return buffer;
     }
     
-    SaleItem parseSaleItem(size_t itemPos, const string& saleDate) {
-        SaleItem item;
-        item.setDate(saleDate);
-        
-        // product_id
-        size_t pidPos = json.find("\"product_id\"", itemPos);
-        if (pidPos != string::npos && pidPos < json.find("}", itemPos)) {
-            string pidStr = extractNumericValue(pidPos);
-            item.setProductId(NumberParser::parseInteger(pidStr));
+    // Число за граматикою JSON, повертається як view
+    string_view parseNumberToken() {
+        skipWhitespace();
+        size_t start = pos;
+        if (pos < json.size() && json[pos] == '-') ++pos;
+        if (pos >= json.size() || !isdigit(static_cast<unsigned char>(json[pos]))) fail("invalid number");
+        if (json[pos] == '0') {
+            ++pos;
+        } else {
+            while (pos < json.size() && isdigit(static_cast<unsigned char>(json[pos]))) ++pos;
         }
-        
-        // product_name
-        size_t pnamePos = json.find("\"product_name\"", itemPos);
-        if (pnamePos != string::npos && pnamePos < json.find("}", itemPos)) {
-            item.setProductName(extractStringValue(pnamePos));
+        if (pos < json.size() && json[pos] == '.') {
+            ++pos;
+            if (pos >= json.size() || !isdigit(static_cast<unsigned char>(json[pos]))) fail("invalid number");
+            while (pos < json.size() && isdigit(static_cast<unsigned char>(json[pos]))) ++pos;
         }
-        
-        // category_id
-        size_t cidPos = json.find("\"category_id\"", itemPos);
-        if (cidPos != string::npos && cidPos < json.find("}", itemPos)) {
-            string cidStr = extractNumericValue(cidPos);
-            item.setCategoryId(NumberParser::parseInteger(cidStr));
+        if (pos < json.size() && (json[pos] == 'e' || json[pos] == 'E')) {
+            ++pos;
+            if (pos < json.size() && (json[pos] == '+' || json[pos] == '-')) ++pos;
+            if (pos >= json.size() || !isdigit(static_cast<unsigned char>(json[pos]))) fail("invalid number");
+            while (pos < json.size() && isdigit(static_cast<unsigned char>(json[pos]))) ++pos;
         }
-        
-        // category_name
-        size_t cnamePos = json.find("\"category_name\"", itemPos);
-        if (cnamePos != string::npos && cnamePos < json.find("}", itemPos)) {
-            item.setCategoryName(extractStringValue(cnamePos));
+        return json.substr(start, pos - start);
+    }
+    
+    void parseLiteral(const char* literal) {
+        size_t length = strlen(literal);
+        if (json.compare(pos, length, literal) != 0) fail("invalid literal");
+        pos += length;
+    }
+    
+    /**
+     * Числове поле: число, числовий рядок (Decimal з Django) або null
+     */
+    double parseNumber() {
+        char c = peek();
+        string_view token;
+        string buffer;
+        if (c == '"') {
+            token = parseString(buffer);
+        } else if (c == 'n') {
+            parseLiteral("null");
+            return 0.0;
+        } else {
+            token = parseNumberToken();
         }
-        
-        // quantity
-        size_t qtyPos = json.find("\"quantity\"", itemPos);
-        if (qtyPos != string::npos && qtyPos < json.find("}", itemPos)) {
-            string qtyStr = extractNumericValue(qtyPos);
-            item.setQuantity(NumberParser::parseInteger(qtyStr));
+        double value = 0.0;
+        auto result = from_chars(token.data(), token.data() + token.size(), value);
+        if (result.ec != errc() || result.ptr != token.data() + token.size()) {
+            if (c == '"') fail("expected numeric string");
+            fail("number out of range");
         }
-        
-        // price
-        size_t pricePos = json.find("\"price\"", itemPos);
-        if (pricePos != string::npos && pricePos < json.find("}", itemPos)) {
-            string priceStr = extractNumericValue(pricePos);
-            item.setPrice(NumberParser::parseDouble(priceStr));
+        return value;
+    }
+    
+    int parseInteger() {
+        double value = parseNumber();
+        if (value < INT_MIN || value > INT_MAX) fail("integer out of range");
+        return static_cast<int>(value);
+    }
+    
+    string parseOptionalString() {
+        if (peek() == 'n') {
+            parseLiteral("null");
+            return string();
         }
-        
-        // subtotal
-        size_t subPos = json.find("\"subtotal\"", itemPos);
-        if (subPos != string::npos && subPos < json.find("}", itemPos)) {
-            string subStr = extractNumericValue(subPos);
-            item.setSubtotal(NumberParser::parseDouble(subStr));
+        string buffer;
+        return string(parseString(buffer));
+    }
+    
+    // Пропуск довільного значення (невідомі ключі), глибина вкладеності обмежена
+    void skipValue(int depth = 0) {
+        if (depth > MAX_DEPTH) fail("nesting too deep");
+        char c = peek();
+        if (c == '{') {
+            parseObject([&](string_view) { skipValue(depth + 1); });
+        } else if (c == '[') {
+            parseArray([&]() { skipValue(depth + 1); });
+        } else if (c == '"') {
+            string buffer;
+            parseString(buffer);
+        } else if (c == 't') {
+            parseLiteral("true");
+        } else if (c == 'f') {
+            parseLiteral("false");
+        } else if (c == 'n') {
+            parseLiteral("null");
+        } else {
+            parseNumberToken();
         }
-        
+    }
+    
+    /**
+     * Обхід членів об'єкта: handler(key) має розібрати значення
+     */
+    template <typename Handler>
+    void parseObject(Handler handler) {
+        expect('{');
+        if (consume('}')) return;
+        string keyBuffer;
+        do {
+            // keyBuffer належить цьому рівню, вкладені значення його не перезаписують
+            string_view key = parseString(keyBuffer);
+            expect(':');
+            handler(key);
+        } while (consume(','));
+        expect('}');
+    }
+    
+    template <typename Handler>
+    void parseArray(Handler handler) {
+        expect('[');
+        if (consume(']')) return;
+        do {
+            handler();
+        } while (consume(','));
+        expect(']');
+    }
+    
+    SaleItem parseSaleItem() {
+        SaleItem item;
+        parseObject([&](string_view key) {
+            if (key == "product_id") item.setProductId(parseInteger());
+            else if (key == "product_name") item.setProductName(parseOptionalString());
+            else if (key == "category_id") item.setCategoryId(parseInteger());
+            else if (key == "category_name") item.setCategoryName(parseOptionalString());
+            else if (key == "quantity") item.setQuantity(parseInteger());
+            else if (key == "price") item.setPrice(parseNumber());
+            else if (key == "subtotal") item.setSubtotal(parseNumber());
+            else skipValue();
+        });
         return item;
     }
+    
+    Sale parseSale() {
+        Sale sale;
+        vector<SaleItem> items;
+        parseObject([&](string_view key) {
+            if (key == "id") sale.setId(parseInteger());
+            else if (key == "date") sale.setDate(parseOptionalString());
+            else if (key == "total_amount") sale.setTotalAmount(parseNumber());
+            else if (key == "items") {
+                if (peek() == 'n') {
+                    parseLiteral("null");
+                    return;
+                }
+                parseArray([&]() { items.push_back(parseSaleItem()); });
+            }
+            else skipValue();
+        });
+        
+        // Дата може йти після позицій - проставляється в кінці
+        for (auto& item : items) {
+            item.setDate(sale.getDate());
+            sale.addItem(std::move(item));
+        }
+        return sale;
+    }
 
 public:
-    JSONParser(const string& jsonStr) : json(jsonStr) {}
+    // Парсер не копіює вхід: рядок має жити до кінця parseSales()
+    JSONParser(string_view jsonStr) : json(jsonStr), pos(0) {}
     
     /**
-     * Парсинг JSON та повернення вектору продажів
-     * Інкапсулює всю логіку парсингу
+     * Парсинг документа {"sales": [...]} за один прохід
+     * При синтаксичній помилці кидає JSONParseError з рядком і стовпцем
      */
     vector<Sale> parseSales() {
         vector<Sale> sales;
-        
-        size_t salesPos = json.find("\"sales\"");
-        if (salesPos == string::npos) return sales;
-        
-        salesPos = json.find("[", salesPos);
-        if (salesPos == string::npos) return sales;
-        
-        size_t pos = salesPos;
+        pos = 0;
+        parseObject([&](string_view key) {
+            if (key == "sales") {
+                parseArray([&]() { sales.push_back(parseSale()); });
+            } else {
+                skipValue();
+            }
+        });
+        skipWhitespace();
+        if (pos != json.size()) fail("unexpected data after JSON document");
+        return sales;
+    }
+};
+
+
+// ========== ПОТОКОВИЙ КОЛОНКОВИЙ ФОРМАТ ==========
+
+// Перший рядок потоку в колонковому форматі (інакше вхід вважається JSON)
+const char* const COLUMNAR_HEADER = "#ACOL 1";
+
+/**
+ * Клас для читання колонкового формату з потоку (рядок за рядком)
+ * Поля розділені табуляцією:
+ *   P <id> <назва>                     - словник товарів
+ *   C <id> <назва>                     - словник категорій
+ *   S <id> <дата> <сума>               - продаж
+ *   I <id продажу> <id товару> <id категорії> <кількість> <ціна> <сума>
+ * Назви передаються один раз, позиції посилаються на них за id.
+ */
+class ColumnarStreamReader {
+private:
+    map<int, string> productNames;
+    map<int, string> categoryNames;
+    map<int, size_t> saleIndex;
+    string error;
+    size_t lineNumber;
+    
+    static void split(const string& line, vector<string>& fields) {
+        fields.clear();
+        size_t start = 0;
         while (true) {
-            pos = json.find("{", pos);
-            if (pos == string::npos) break;
-            
-            Sale sale;
-            
-            // ID продажу
-            size_t idPos = json.find("\"id\"", pos);
-            if (idPos != string::npos) {
-                string idStr = extractNumericValue(idPos);
-                sale.setId(NumberParser::parseInteger(idStr));
+            size_t tab = line.find('\t', start);
+            if (tab == string::npos) {
+                fields.push_back(line.substr(start));
+                return;
             }
-            
-            // Дата
-            size_t datePos = json.find("\"date\"", pos);
-            if (datePos != string::npos) {
-                sale.setDate(extractStringValue(datePos));
+            fields.push_back(line.substr(start, tab - start));
+            start = tab + 1;
+        }
+    }
+    
+    // Зворотні послідовності для табуляції, переводу рядка та бекслешу
+    static string unescape(const string& value) {
+        string result;
+        result.reserve(value.size());
+        for (size_t i = 0; i < value.size(); ++i) {
+            if (value[i] == '\\' && i + 1 < value.size()) {
+                char next = value[++i];
+                if (next == 't') result += '\t';
+                else if (next == 'n') result += '\n';
+                else result += next;
+            } else {
+                result += value[i];
             }
-            
-            // Загальна сума
-            size_t totalPos = json.find("\"total_amount\"", pos);
-            if (totalPos != string::npos) {
-                string totalStr = extractNumericValue(totalPos);
-                sale.setTotalAmount(NumberParser::parseDouble(totalStr));
+        }
+        return result;
+    }
+    
+    bool fail(const string& message) {
+        ostringstream text;
+        text << "Line " << lineNumber << ": " << message;
+        error = text.str();
+        return false;
+    }
+    
+    // Числові поля розбираються строго (from_chars, як у JSON-парсері): "12abc" чи "" - помилка рядка
+    bool parseField(const string& field, const char* name, int& value) {
+        auto result = from_chars(field.data(), field.data() + field.size(), value);
+        if (field.empty() || result.ec != errc() || result.ptr != field.data() + field.size()) {
+            return fail(string("invalid integer in field '") + name + "': '" + field + "'");
+        }
+        return true;
+    }
+    
+    bool parseField(const string& field, const char* name, double& value) {
+        auto result = from_chars(field.data(), field.data() + field.size(), value);
+        if (field.empty() || result.ec != errc() || result.ptr != field.data() + field.size()) {
+            return fail(string("invalid number in field '") + name + "': '" + field + "'");
+        }
+        return true;
+    }
+    
+    static const string& lookup(const map<int, string>& names, int id) {
+        static const string empty;
+        map<int, string>::const_iterator it = names.find(id);
+        return it != names.end() ? it->second : empty;
+    }
+
+public:
+    ColumnarStreamReader() : lineNumber(1) {}
+    
+    const string& getError() const { return error; }
+    
+    /**
+     * Читання записів після рядка заголовка
+     * Продажі додаються у порядку потоку, позиції - до свого продажу
+     */
+    bool read(istream& in, vector<Sale>& sales) {
+        string line;
+        vector<string> fields;
+        while (getline(in, line)) {
+            ++lineNumber;
+            if (!line.empty() && line[line.size() - 1] == '\r') {
+                line.erase(line.size() - 1);
             }
+            if (line.empty()) continue;
             
-            // Позиції продажу
-            size_t itemsPos = json.find("\"items\"", pos);
-            if (itemsPos != string::npos) {
-                itemsPos = json.find("[", itemsPos);
-                size_t itemsEnd = json.find("]", itemsPos);
-                
-                size_t itemPos = itemsPos;
-                while (true) {
-                    itemPos = json.find("{", itemPos);
-                    if (itemPos == string::npos || itemPos >= itemsEnd) break;
-                    
-                    SaleItem item = parseSaleItem(itemPos, sale.getDate());
-                    sale.addItem(item);
-                    itemPos = json.find("}", itemPos) + 1;
+            split(line, fields);
+            const string& kind = fields[0];
+            if (kind == "P" || kind == "C") {
+                if (fields.size() != 3) return fail("expected 3 fields");
+                int id;
+                if (!parseField(fields[1], "id", id)) return false;
+                map<int, string>& names = (kind == "P") ? productNames : categoryNames;
+                names[id] = unescape(fields[2]);
+            } else if (kind == "S") {
+                if (fields.size() != 4) return fail("expected 4 fields");
+                int id;
+                double total;
+                if (!parseField(fields[1], "sale_id", id) || !parseField(fields[3], "total", total)) {
+                    return false;
                 }
+                saleIndex[id] = sales.size();
+                sales.push_back(Sale(id, fields[2], total));
+            } else if (kind == "I") {
+                if (fields.size() != 7) return fail("expected 7 fields");
+                int saleId, productId, categoryId, quantity;
+                double price, subtotal;
+                if (!parseField(fields[1], "sale_id", saleId)
+                    || !parseField(fields[2], "product_id", productId)
+                    || !parseField(fields[3], "category_id", categoryId)
+                    || !parseField(fields[4], "quantity", quantity)
+                    || !parseField(fields[5], "price", price)
+                    || !parseField(fields[6], "subtotal", subtotal)) {
+                    return false;
+                }
+                map<int, size_t>::const_iterator sale = saleIndex.find(saleId);
+                if (sale == saleIndex.end()) return fail("item references unknown sale");
+                
+                Sale& target = sales[sale->second];
+                target.addItem(SaleItem(
+                    productId, lookup(productNames, productId),
+                    categoryId, lookup(categoryNames, categoryId),
+                    quantity, price, subtotal,
+                    target.getDate()));
+            } else if (kind[0] != '#') {
+                return fail("unknown record type '" + kind + "'");
             }
-            
-            sales.push_back(sale);
-            pos = json.find("}", pos) + 1;
         }
-        
-        return sales;
+        return true;
     }
 };
 
@@ -529,167 +797,202 @@ public:
 class StatisticsCalculator {
 public:
     /**
-     * Обчислення статистик з вектору значень
+     * Статистики по додатних сумах без повного сортування:
+     * медіана через nth_element (масив переставляється)
      */
-    static Statistics calculate(const vector<double>& values) {
+    static Statistics fromPositive(vector<double>& values) {
         Statistics stats;
-        
         if (values.empty()) {
             stats.reset();
             return stats;
         }
         
-        // Фільтруємо нульові значення
-        vector<double> nonZeroValues;
+        size_t n = values.size();
+        auto range = minmax_element(values.begin(), values.end());
+        double minValue = *range.first, maxValue = *range.second;
+        double mean = accumulate(values.begin(), values.end(), 0.0) / n;
+        double variance = 0.0;
         for (double val : values) {
-            if (val > 0) {
-                nonZeroValues.push_back(val);
-            }
-        }
-        
-        if (nonZeroValues.empty()) {
-            stats.reset();
-            return stats;
+            variance += (val - mean) * (val - mean);
         }
         
-        vector<double> sorted = nonZeroValues;
-        sort(sorted.begin(), sorted.end());
-        
-        // Мінімум і максимум
-        stats.setMin(sorted.front());
-        stats.setMax(sorted.back());
-        
-        // Середнє
-        double sum = accumulate(sorted.begin(), sorted.end(), 0.0);
-        stats.setMean(sum / sorted.size());
-        
-        // Медіана
-        size_t n = sorted.size();
+        auto middle = values.begin() + n / 2;
+        nth_element(values.begin(), middle, values.end());
+        double median = *middle;
         if (n % 2 == 0) {
-            stats.setMedian((sorted[n/2 - 1] + sorted[n/2]) / 2.0);
-        } else {
-            stats.setMedian(sorted[n/2]);
-        }
-        
-        // Стандартне відхилення
-        double mean = stats.getMean();
-        double variance = 0.0;
-        for (double val : sorted) {
-            variance += (val - mean) * (val - mean);
+            // Нижня половина вже не більша за middle - шукаємо її максимум
+            median = (*max_element(values.begin(), middle) + median) / 2.0;
         }
-        variance /= sorted.size();
-        stats.setStdDev(sqrt(variance));
         
+        stats.setMin(minValue);
+        stats.setMax(maxValue);
+        stats.setMean(mean);
+        stats.setMedian(median);
+        stats.setStdDev(sqrt(variance / n));
         return stats;
     }
 };
 
 
-// ========== КЛАС ДЛЯ АГРЕГАЦІЇ ДАНИХ ==========
+// ========== ЩІЛЬНА АГРЕГАЦІЯ ПОЗИЦІЙ ЗА ID ==========
 
 /**
- * Клас для агрегації даних по періодах
- * Інкапсулює логіку агрегації по днях/тижнях/місяцях
+ * Відображення id -> щільний індекс 0..n-1
+ * Агрегати зберігаються у плоских векторах за індексом, назва запам'ятовується
+ * один раз на id (перша зустрінута) і потрібна тільки при виводі.
+ * Різні товари з однаковою назвою не зливаються.
  */
-class DataAggregator {
+class DenseIdIndex {
+private:
+    unordered_map<int, size_t> slots;
+    vector<int> ids;
+    vector<string> names;
+
 public:
-    /**
-     * Агрегація по днях
-     */
-    static map<string, double> aggregateByDay(const vector<Sale>& sales) {
-        map<string, double> dailyTotals;
-        for (const auto& sale : sales) {
-            dailyTotals[sale.getDate()] += sale.getTotalAmount();
-        }
-        return dailyTotals;
+    // Назва (string або const char*) копіюється тільки для нового id
+    template <typename Name>
+    size_t slotFor(int id, const Name& name) {
+        auto found = slots.find(id);
+        if (found != slots.end()) return found->second;
+        size_t slot = ids.size();
+        slots.emplace(id, slot);
+        ids.push_back(id);
+        names.emplace_back(name);
+        return slot;
     }
     
-    /**
-     * Агрегація по тижнях
-     */
-    static map<string, double> aggregateByWeek(const vector<Sale>& sales) {
-        map<string, double> weeklyTotals;
-        
-        for (const auto& sale : sales) {
-            int year, month, day;
-            if (!DateParser::parseYMD(sale.getDate(), year, month, day)) {
-                continue;
-            }
-            
-            int week = (month - 1) * 4 + (day - 1) / 7 + 1;
-            string weekKey = to_string(year) + "-W" + (week < 10 ? "0" : "") + to_string(week);
-            weeklyTotals[weekKey] += sale.getTotalAmount();
-        }
-        
-        return weeklyTotals;
-    }
+    size_t size() const { return ids.size(); }
+    int getId(size_t slot) const { return ids[slot]; }
+    const string& getName(size_t slot) const { return names[slot]; }
     
     /**
-     * Агрегація по місяцях
+     * Порівняння для стабільного порядку: за назвою, потім за id
      */
-    static map<string, double> aggregateByMonth(const vector<Sale>& sales) {
-        map<string, double> monthlyTotals;
-        for (const auto& sale : sales) {
-            string monthKey = sale.getDate().substr(0, 7); // YYYY-MM
-            monthlyTotals[monthKey] += sale.getTotalAmount();
-        }
-        return monthlyTotals;
+    bool nameLess(size_t a, size_t b) const {
+        int byName = names[a].compare(names[b]);
+        if (byName != 0) return byName < 0;
+        return ids[a] < ids[b];
     }
 };
 
 
-// ========== КЛАС ДЛЯ ТОП ТОВАРІВ ==========
+/**
+ * Грошова сума у копійках: суми в цілих числах не залежать від порядку
+ * додавання, тому результат однаковий при будь-якому розбитті на потоки
+ */
+inline long long toCents(double amount) {
+    return llround(amount * 100.0);
+}
+
+inline double fromCents(long long cents) {
+    return cents / 100.0;
+}
+
 
 /**
- * Клас для обчислення топ товарів
- * Інкапсулює логіку розрахунку топ товарів
+ * Клас для агрегатів позицій по товарах та категоріях
+ * Заповнюється одним проходом по позиціях; частини, зібрані
+ * різними потоками, об'єднуються через merge()
  */
-class TopProductsCalculator {
+class ItemAggregates {
+private:
+    DenseIdIndex products;
+    DenseIdIndex categories;
+    vector<long long> productRevenue;
+    vector<int> productQuantity;
+    vector<long long> categoryRevenue;
+    long long totalRevenue;
+    
+    template <typename Name>
+    size_t productSlot(int id, const Name& name) {
+        size_t product = products.slotFor(id, name);
+        if (product == productRevenue.size()) {
+            productRevenue.push_back(0);
+            productQuantity.push_back(0);
+        }
+        return product;
+    }
+    
+    template <typename Name>
+    size_t categorySlot(int id, const Name& name) {
+        size_t category = categories.slotFor(id, name);
+        if (category == categoryRevenue.size()) {
+            categoryRevenue.push_back(0);
+        }
+        return category;
+    }
+
 public:
+    ItemAggregates() : totalRevenue(0) {}
+    
+    void add(const SaleItem& item) {
+        add(item.getProductId(), item.getProductName(), item.getCategoryId(), item.getCategoryName(),
+            item.getQuantity(), item.getSubtotal());
+    }
+    
     /**
-     * Топ товарів за виручкою
+     * Позиція без об'єкта SaleItem (рядки, прочитані напряму з БД)
      */
-    static vector<TopProduct> byRevenue(const vector<Sale>& sales) {
-        map<string, pair<double, int>> productData; // revenue, quantity
+    template <typename Name>
+    void add(int productId, const Name& productName, int categoryId, const Name& categoryName,
+             int quantity, double amount) {
+        size_t product = productSlot(productId, productName);
+        size_t category = categorySlot(categoryId, categoryName);
+        long long subtotal = toCents(amount);
         
-        for (const auto& sale : sales) {
-            for (const auto& item : sale.getItems()) {
-                productData[item.getProductName()].first += item.getSubtotal();
-                productData[item.getProductName()].second += item.getQuantity();
-            }
+        productRevenue[product] += subtotal;
+        productQuantity[product] += quantity;
+        categoryRevenue[category] += subtotal;
+        totalRevenue += subtotal;
+    }
+    
+    /**
+     * Додати агрегати іншої частини (нові товари та категорії отримують
+     * наступні індекси, як при послідовному проході)
+     */
+    void merge(const ItemAggregates& other) {
+        for (size_t slot = 0; slot < other.products.size(); ++slot) {
+            size_t product = productSlot(other.products.getId(slot), other.products.getName(slot));
+            productRevenue[product] += other.productRevenue[slot];
+            productQuantity[product] += other.productQuantity[slot];
         }
-        
-        vector<TopProduct> result;
-        for (const auto& p : productData) {
-            TopProduct tp(p.first, p.second.first, p.second.second);
-            result.push_back(tp);
+        for (size_t slot = 0; slot < other.categories.size(); ++slot) {
+            size_t category = categorySlot(other.categories.getId(slot), other.categories.getName(slot));
+            categoryRevenue[category] += other.categoryRevenue[slot];
         }
-        
-        sort(result.begin(), result.end(), TopProduct::compareByRevenue);
-        return result;
+        totalRevenue += other.totalRevenue;
     }
     
+    const DenseIdIndex& getProducts() const { return products; }
+    const DenseIdIndex& getCategories() const { return categories; }
+    double getProductRevenue(size_t slot) const { return fromCents(productRevenue[slot]); }
+    int getProductQuantity(size_t slot) const { return productQuantity[slot]; }
+    double getCategoryRevenue(size_t slot) const { return fromCents(categoryRevenue[slot]); }
+    double getTotalRevenue() const { return fromCents(totalRevenue); }
+    
     /**
-     * Топ товарів за кількістю
+     * Індекси товарів за спаданням виручки (або кількості);
+     * при рівності - за назвою та id, щоб порядок не залежав від вхідних даних.
+     * З limit сортуються тільки перші limit позицій (partial_sort).
      */
-    static vector<TopProduct> byQuantity(const vector<Sale>& sales) {
-        map<string, pair<int, double>> productData; // quantity, revenue
-        
-        for (const auto& sale : sales) {
-            for (const auto& item : sale.getItems()) {
-                productData[item.getProductName()].first += item.getQuantity();
-                productData[item.getProductName()].second += item.getSubtotal();
+    vector<size_t> rankProducts(bool byQuantity, size_t limit = SIZE_MAX) const {
+        vector<size_t> order(products.size());
+        iota(order.begin(), order.end(), 0);
+        auto before = [&](size_t a, size_t b) {
+            if (byQuantity) {
+                if (productQuantity[a] != productQuantity[b]) return productQuantity[a] > productQuantity[b];
+            } else if (productRevenue[a] != productRevenue[b]) {
+                return productRevenue[a] > productRevenue[b];
             }
+            return products.nameLess(a, b);
+        };
+        if (limit < order.size()) {
+            partial_sort(order.begin(), order.begin() + limit, order.end(), before);
+            order.resize(limit);
+        } else {
+            sort(order.begin(), order.end(), before);
         }
-        
-        vector<TopProduct> result;
-        for (const auto& p : productData) {
-            TopProduct tp(p.first, p.second.second, p.second.first);
-            result.push_back(tp);
-        }
-        
-        sort(result.begin(), result.end(), TopProduct::compareByQuantity);
-        return result;
+        return order;
     }
 };
 
@@ -703,25 +1006,22 @@ public:
 class CategorySharesCalculator {
 public:
     /**
-     * Обчислення часток продажів по категоріях
+     * Обчислення часток продажів по категоріях (у порядку назв)
      */
-    static map<string, double> calculate(const vector<Sale>& sales) {
-        double totalRevenue = 0;
-        map<string, double> categoryRevenue;
+    static vector<CategoryShare> calculate(const ItemAggregates& aggregates) {
+        const DenseIdIndex& categories = aggregates.getCategories();
+        double totalRevenue = aggregates.getTotalRevenue();
         
-        for (const auto& sale : sales) {
-            for (const auto& item : sale.getItems()) {
-                categoryRevenue[item.getCategoryName()] += item.getSubtotal();
-                totalRevenue += item.getSubtotal();
-            }
-        }
+        vector<size_t> order(categories.size());
+        iota(order.begin(), order.end(), 0);
+        sort(order.begin(), order.end(), [&](size_t a, size_t b) { return categories.nameLess(a, b); });
         
-        // Конвертуємо в відсотки
-        map<string, double> shares;
-        for (const auto& p : categoryRevenue) {
-            shares[p.first] = (totalRevenue > 0) ? (p.second / totalRevenue * 100.0) : 0.0;
+        vector<CategoryShare> shares;
+        shares.reserve(order.size());
+        for (size_t slot : order) {
+            double share = (totalRevenue > 0) ? (aggregates.getCategoryRevenue(slot) / totalRevenue * 100.0) : 0.0;
+            shares.emplace_back(categories.getId(slot), categories.getName(slot), share);
         }
-        
         return shares;
     }
 };
@@ -736,53 +1036,31 @@ public:
 class ABCAnalyzer {
 public:
     /**
-     * Виконання ABC-аналізу
+     * ABC-аналіз за вже відсортованими (за виручкою) індексами товарів
      */
-    static vector<ABCResult> analyze(const vector<Sale>& sales) {
-        // Збираємо виручку по товарах
-        map<string, double> productRevenue;
-        double totalRevenue = 0;
-        
-        for (const auto& sale : sales) {
-            for (const auto& item : sale.getItems()) {
-                productRevenue[item.getProductName()] += item.getSubtotal();
-                totalRevenue += item.getSubtotal();
-            }
-        }
-        
-        // Сортуємо за виручкою
-        vector<pair<string, double>> sorted;
-        for (const auto& p : productRevenue) {
-            sorted.push_back(p);
-        }
-        sort(sorted.begin(), sorted.end(), 
-             [](const pair<string, double>& a, const pair<string, double>& b) {
-                 return a.second > b.second;
-             });
+    static vector<ABCResult> analyze(const ItemAggregates& aggregates, const vector<size_t>& byRevenue) {
+        const DenseIdIndex& products = aggregates.getProducts();
+        double totalRevenue = aggregates.getTotalRevenue();
         
         // Розраховуємо кумулятивний відсоток та категорії
         vector<ABCResult> result;
+        result.reserve(products.size());
         double cumulative = 0.0;
         
-        for (const auto& p : sorted) {
-            cumulative += p.second;
+        for (size_t slot : byRevenue) {
+            double revenue = aggregates.getProductRevenue(slot);
+            cumulative += revenue;
             double cumulativePercent = (totalRevenue > 0) ? (cumulative / totalRevenue * 100.0) : 0.0;
             
-            ABCResult abc;
-            abc.setProductName(p.first);
-            abc.setRevenue(p.second);
-            abc.setCumulativePercent(cumulativePercent);
-            
             // Категорії: A (0-80%), B (80-95%), C (95-100%)
+            char abcClass = 'C';
             if (cumulativePercent <= 80.0) {
-                abc.setCategory('A');
+                abcClass = 'A';
             } else if (cumulativePercent <= 95.0) {
-                abc.setCategory('B');
-            } else {
-                abc.setCategory('C');
+                abcClass = 'B';
             }
             
-            result.push_back(abc);
+            result.emplace_back(products.getId(slot), products.getName(slot), revenue, cumulativePercent, abcClass);
         }
         
         return result;
@@ -790,134 +1068,600 @@ public:
 };
 
 
-// ========== КЛАС ДЛЯ ВИВОДУ JSON ==========
+// ========== ОДНОПРОХІДНЕ ЯДРО АГРЕГАЦІЇ ==========
+
+// Кількість записів у топах товарів
+const size_t TOP_PRODUCTS_LIMIT = 20;
 
 /**
- * Клас для форматування та виводу JSON
- * Інкапсулює логіку форматування результатів
+ * Клас для результату аналітики (всі показники перед виводом)
  */
-class JSONOutputFormatter {
+class AnalyticsResult {
 public:
+    vector<pair<string, double>> dailyRevenue;
+    vector<pair<string, double>> weeklyRevenue;
+    vector<pair<string, double>> monthlyRevenue;
+    vector<TopProduct> topByRevenue;
+    vector<TopProduct> topByQuantity;
+    vector<CategoryShare> categoryShares;
+    vector<ABCResult> abcAnalysis;
+    Statistics statistics;
+    double totalRevenue;
+    size_t totalSales;
+    
+    AnalyticsResult() : totalRevenue(0.0), totalSales(0) {}
+};
+
+
+/**
+ * Кількість потоків агрегації: значення --threads або змінної ANALYTICS_THREADS;
+ * за замовчуванням - кількість ядер
+ */
+inline unsigned resolveThreadCount(const char* value) {
+    if (value == nullptr || *value == '\0') value = getenv("ANALYTICS_THREADS");
+    if (value != nullptr && *value != '\0') {
+        long parsed = strtol(value, nullptr, 10);
+        if (parsed > 0) return static_cast<unsigned>(min(parsed, 256L));
+    }
+    unsigned cores = thread::hardware_concurrency();
+    return cores > 0 ? cores : 1;
+}
+
+
+/**
+ * Клас для часткових агрегатів одного діапазону продажів
+ * Кожен потік заповнює власну частину, після чого частини об'єднуються
+ * у порядку діапазонів. Гроші накопичуються у копійках, суми чеків
+ * зберігають порядок продажів - результат не залежить від кількості потоків.
+ */
+class PartialAggregate {
+public:
+    typedef map<int, long long> Buckets;
+    
+    Buckets days, weeks, months;
+    ItemAggregates items;
+    vector<double> positiveAmounts;
+    long long totalRevenue;
+    
+    PartialAggregate()
+        : totalRevenue(0), dayBucket(nullptr), weekBucket(nullptr), monthBucket(nullptr), hasLastDate(false) {}
+    
     /**
-     * Вивід агрегованих даних
+     * Сума продажу у кошики періодів, загальну виручку та суми чеків
+     * (позиції додаються окремо через items)
      */
-    static void outputAggregatedData(const map<string, double>& data, const string& keyName, const string& valueKey) {
-        cout << "\"" << keyName << "\":[";
-        bool first = true;
-        for (const auto& pair : data) {
-            if (pair.first.empty()) continue; // Пропускаємо порожні ключі
-            if (!first) cout << ",";
-            cout << "{\"" << valueKey << "\":\"" << pair.first 
-                 << "\",\"revenue\":" << fixed << setprecision(2) << pair.second << "}";
-            first = false;
+    void addSale(const string& date, double amount) {
+        long long cents = toCents(amount);
+        totalRevenue += cents;
+        
+        // Дата розбирається тільки при зміні (продажі одного дня йдуть поспіль)
+        if (!hasLastDate || lastDate != date) {
+            selectBuckets(date);
+        }
+        if (dayBucket != nullptr) {
+            *dayBucket += cents;
+            *weekBucket += cents;
+            *monthBucket += cents;
+        }
+        
+        if (amount > 0) {
+            positiveAmounts.push_back(amount);
         }
-        cout << "]";
     }
     
-    /**
-     * Вивід топ товарів
-     */
-    static void outputTopProducts(const vector<TopProduct>& products, const string& keyName, size_t limit = 20) {
-        cout << "\"" << keyName << "\":[";
-        bool first = true;
-        for (size_t i = 0; i < min(products.size(), limit); ++i) {
-            if (!first) cout << ",";
-            cout << "{\"product_name\":\"" << JSONEscaper::escape(products[i].getName()) 
-                 << "\",\"revenue\":" << fixed << setprecision(2) << products[i].getRevenue()
-                 << ",\"quantity\":" << products[i].getQuantity() << "}";
-            first = false;
+    void scan(vector<Sale>::const_iterator begin, vector<Sale>::const_iterator end) {
+        positiveAmounts.reserve(end - begin);
+        for (auto sale = begin; sale != end; ++sale) {
+            addSale(sale->getDate(), sale->getTotalAmount());
+            for (const auto& item : sale->getItems()) {
+                items.add(item);
+            }
         }
-        cout << "]";
     }
     
-    /**
-     * Вивід часток категорій
-     */
-    static void outputCategoryShares(const map<string, double>& shares) {
-        cout << "\"category_shares\":[";
-        bool first = true;
-        for (const auto& p : shares) {
-            if (!first) cout << ",";
-            cout << "{\"category\":\"" << JSONEscaper::escape(p.first) 
-                 << "\",\"share\":" << fixed << setprecision(2) << p.second << "}";
-            first = false;
+    void merge(const PartialAggregate& other) {
+        mergeBuckets(days, other.days);
+        mergeBuckets(weeks, other.weeks);
+        mergeBuckets(months, other.months);
+        items.merge(other.items);
+        positiveAmounts.insert(positiveAmounts.end(), other.positiveAmounts.begin(), other.positiveAmounts.end());
+        totalRevenue += other.totalRevenue;
+    }
+
+private:
+    // Кошики поточної дати (вузли map не переміщуються при вставках)
+    long long* dayBucket;
+    long long* weekBucket;
+    long long* monthBucket;
+    string lastDate;
+    bool hasLastDate;
+    
+    void selectBuckets(const string& date) {
+        lastDate = date;
+        hasLastDate = true;
+        int year, month, day;
+        if (!DateParser::parseYMD(date, year, month, day)) {
+            // Продажі з некоректною датою не потрапляють у кошики періодів
+            dayBucket = weekBucket = monthBucket = nullptr;
+            return;
+        }
+        dayBucket = &days[year * 10000 + month * 100 + day];
+        weekBucket = &weeks[year * 100 + (month - 1) * 4 + (day - 1) / 7 + 1];
+        monthBucket = &months[year * 100 + month];
+    }
+    
+    static void mergeBuckets(Buckets& target, const Buckets& source) {
+        for (const auto& bucket : source) {
+            target[bucket.first] += bucket.second;
+        }
+    }
+};
+
+
+/**
+ * Клас для обчислення всіх показників одним проходом по продажах
+ * Продажі діляться на суцільні діапазони, кожен обробляється окремим потоком
+ * (PartialAggregate), далі частини об'єднуються; топи будуються через
+ * partial_sort, медіана - через nth_element. Продажі з некоректною датою
+ * не потрапляють у кошики періодів, але враховуються у решті показників.
+ */
+class FusedAggregator {
+public:
+    typedef vector<Sale>::const_iterator SaleIterator;
+
+private:
+    // Менші діапазони не окуповують запуск потоку
+    static const size_t MIN_SALES_PER_THREAD = 20000;
+    
+    static string twoDigits(int value) {
+        return (value < 10 ? "0" : "") + to_string(value);
+    }
+    
+    static vector<pair<string, double>> formatDays(const PartialAggregate::Buckets& buckets) {
+        vector<pair<string, double>> result;
+        for (const auto& bucket : buckets) {
+            int key = bucket.first;
+            result.emplace_back(to_string(key / 10000) + "-" + twoDigits(key / 100 % 100) + "-" + twoDigits(key % 100),
+                                fromCents(bucket.second));
+        }
+        return result;
+    }
+    
+    static vector<pair<string, double>> formatYearParts(const PartialAggregate::Buckets& buckets, const string& separator) {
+        vector<pair<string, double>> result;
+        for (const auto& bucket : buckets) {
+            result.emplace_back(to_string(bucket.first / 100) + separator + twoDigits(bucket.first % 100),
+                                fromCents(bucket.second));
+        }
+        return result;
+    }
+    
+    static PartialAggregate aggregate(SaleIterator begin, SaleIterator end, unsigned threads) {
+        size_t count = end - begin;
+        size_t parts = min<size_t>(max(1u, threads), max<size_t>(1, count / MIN_SALES_PER_THREAD));
+        vector<PartialAggregate> partials(parts);
+        if (parts == 1) {
+            partials[0].scan(begin, end);
+            return std::move(partials[0]);
+        }
+        
+        vector<exception_ptr> errors(parts);
+        vector<thread> workers;
+        auto bound = [&](size_t part) { return begin + count * part / parts; };
+        auto work = [&](size_t part) {
+            try {
+                partials[part].scan(bound(part), bound(part + 1));
+            } catch (...) {
+                errors[part] = current_exception();
+            }
+        };
+        
+        // Перша частина обробляється поточним потоком
+        for (size_t part = 1; part < parts; ++part) {
+            workers.emplace_back(work, part);
+        }
+        work(0);
+        for (auto& worker : workers) {
+            worker.join();
+        }
+        for (const auto& error : errors) {
+            if (error) rethrow_exception(error);
+        }
+        
+        for (size_t part = 1; part < parts; ++part) {
+            partials[0].merge(partials[part]);
         }
-        cout << "]";
+        return std::move(partials[0]);
+    }
+
+public:
+    static AnalyticsResult run(const vector<Sale>& sales, unsigned threads = 1) {
+        return run(sales.begin(), sales.end(), threads);
     }
     
     /**
-     * Вивід статистик
+     * Показники для діапазону продажів (резидентні дані демона)
      */
-    static void outputStatistics(const Statistics& stats, double totalRevenue, int totalSales) {
-        cout << "\"statistics\":{";
-        cout << "\"total_revenue\":" << fixed << setprecision(2) << totalRevenue << ",";
-        cout << "\"mean\":" << fixed << setprecision(2) << stats.getMean() << ",";
-        cout << "\"median\":" << fixed << setprecision(2) << stats.getMedian() << ",";
-        cout << "\"std_dev\":" << fixed << setprecision(2) << stats.getStdDev() << ",";
-        cout << "\"min\":" << fixed << setprecision(2) << stats.getMin() << ",";
-        cout << "\"max\":" << fixed << setprecision(2) << stats.getMax() << ",";
-        cout << "\"total_sales\":" << totalSales;
-        cout << "}";
+    static AnalyticsResult run(SaleIterator begin, SaleIterator end, unsigned threads = 1) {
+        PartialAggregate total = aggregate(begin, end, threads);
+        return finish(total, end - begin);
     }
     
     /**
-     * Вивід ABC-аналізу
+     * Показники з уже зібраних агрегатів (позиції та суми накопичено
+     * напряму, без вектора продажів - див. SQLiteSalesSource)
      */
-    static void outputABCAnalysis(const vector<ABCResult>& abcResults) {
-        cout << "\"abc_analysis\":[";
-        bool first = true;
-        for (const auto& abc : abcResults) {
-            if (!first) cout << ",";
-            cout << "{\"product_name\":\"" << JSONEscaper::escape(abc.getProductName()) 
-                 << "\",\"revenue\":" << fixed << setprecision(2) << abc.getRevenue()
-                 << ",\"cumulative_percent\":" << fixed << setprecision(2) << abc.getCumulativePercent()
-                 << ",\"category\":\"" << abc.getCategory() << "\"}";
-            first = false;
-        }
-        cout << "]";
+    static AnalyticsResult finish(PartialAggregate& total, size_t salesCount) {
+        AnalyticsResult result;
+        result.totalSales = salesCount;
+        const ItemAggregates& items = total.items;
+        result.totalRevenue = fromCents(total.totalRevenue);
+        
+        result.dailyRevenue = formatDays(total.days);
+        result.weeklyRevenue = formatYearParts(total.weeks, "-W");
+        result.monthlyRevenue = formatYearParts(total.months, "-");
+        
+        // ABC потребує повного порядку за виручкою - топ за виручкою береться з нього
+        const DenseIdIndex& products = items.getProducts();
+        vector<size_t> byRevenue = items.rankProducts(false);
+        result.abcAnalysis = ABCAnalyzer::analyze(items, byRevenue);
+        for (size_t i = 0; i < min(byRevenue.size(), TOP_PRODUCTS_LIMIT); ++i) {
+            size_t slot = byRevenue[i];
+            result.topByRevenue.emplace_back(products.getId(slot), products.getName(slot),
+                                             items.getProductRevenue(slot), items.getProductQuantity(slot));
+        }
+        
+        for (size_t slot : items.rankProducts(true, TOP_PRODUCTS_LIMIT)) {
+            result.topByQuantity.emplace_back(products.getId(slot), products.getName(slot),
+                                              items.getProductRevenue(slot), items.getProductQuantity(slot));
+        }
+        
+        result.categoryShares = CategorySharesCalculator::calculate(items);
+        result.statistics = StatisticsCalculator::fromPositive(total.positiveAmounts);
+        return result;
     }
 };
 
 
-// ========== ГОЛОВНИЙ КЛАС АНАЛІТИКИ ==========
+// ========== ВИВІД РЕЗУЛЬТАТУ (JSON / MESSAGEPACK) ==========
+
+// Формат результату: JSON (за замовчуванням) або MessagePack
+enum OutputFormat { OUTPUT_JSON = 0, OUTPUT_MSGPACK = 1 };
 
 /**
- * Головний клас для аналітики
- * Координує всі обчислення та вивід результатів
- * Використовує принципи ООП: інкапсуляцію, композицію
+ * Клас для запису JSON у попередньо виділений буфер
+ * Числа форматуються через to_chars (без iostream і локалі), рядки
+ * екрануються одразу в буфер; розділювачі ставляться автоматично.
  */
-class AnalyticsEngine {
+class JSONWriter {
 private:
-    vector<Sale> sales;
+    string buffer;
+    vector<bool> firstInScope;
+    bool afterKey;
     
-    // Приватні методи для обчислень
-    double calculateTotalRevenue() const {
-        double total = 0.0;
-        for (const auto& sale : sales) {
-            total += sale.getTotalAmount();
+    void separate() {
+        if (afterKey) {
+            afterKey = false;
+            return;
         }
-        return total;
+        if (!firstInScope.back()) buffer += ',';
+        firstInScope.back() = false;
     }
     
-    vector<double> extractSaleAmounts() const {
-        vector<double> amounts;
-        for (const auto& sale : sales) {
-            if (sale.getTotalAmount() > 0) {
-                amounts.push_back(sale.getTotalAmount());
+    template <typename... Args>
+    void appendNumber(Args... args) {
+        char digits[64];
+        auto converted = to_chars(digits, digits + sizeof(digits), args...);
+        buffer.append(digits, converted.ptr);
+    }
+
+public:
+    JSONWriter(size_t capacity = 4096) : firstInScope(1, true), afterKey(false) {
+        buffer.reserve(capacity);
+    }
+    
+    void beginObject(size_t) { separate(); buffer += '{'; firstInScope.push_back(true); }
+    void endObject() { firstInScope.pop_back(); buffer += '}'; }
+    void beginArray(size_t) { separate(); buffer += '['; firstInScope.push_back(true); }
+    void endArray() { firstInScope.pop_back(); buffer += ']'; }
+    
+    void key(const char* name) {
+        separate();
+        buffer += '"';
+        buffer += name;
+        buffer += "\":";
+        afterKey = true;
+    }
+    
+    void value(const string& text) {
+        separate();
+        buffer += '"';
+        for (char c : text) {
+            switch (c) {
+                case '"': buffer += "\\\""; break;
+                case '\\': buffer += "\\\\"; break;
+                case '\n': buffer += "\\n"; break;
+                case '\r': buffer += "\\r"; break;
+                case '\t': buffer += "\\t"; break;
+                default:
+                    if (static_cast<unsigned char>(c) < 0x20) {
+                        static const char hex[] = "0123456789abcdef";
+                        buffer += "\\u00";
+                        buffer += hex[(c >> 4) & 0xF];
+                        buffer += hex[c & 0xF];
+                    } else {
+                        buffer += c;
+                    }
             }
         }
-        return amounts;
+        buffer += '"';
+    }
+    
+    void value(long long number) {
+        separate();
+        appendNumber(number);
+    }
+    
+    // Грошові значення та відсотки - два знаки після коми (як fixed << setprecision(2))
+    void money(double number) {
+        separate();
+        appendNumber(number, chars_format::fixed, 2);
+    }
+    
+    string take() { return std::move(buffer); }
+};
+
+
+/**
+ * Клас для запису MessagePack (розміри масивів і словників відомі заздалегідь)
+ * Грошові значення - float64, округлені до копійок, як у JSON виводі.
+ */
+class MsgPackWriter {
+private:
+    string buffer;
+    
+    void bigEndian(unsigned long long number, int bytes) {
+        for (int shift = (bytes - 1) * 8; shift >= 0; shift -= 8) {
+            buffer += static_cast<char>((number >> shift) & 0xFF);
+        }
+    }
+    
+    void header(size_t size, unsigned char fixBase, size_t fixLimit, unsigned char code16) {
+        if (size < fixLimit) {
+            buffer += static_cast<char>(fixBase | size);
+        } else if (size <= 0xFFFF) {
+            buffer += static_cast<char>(code16);
+            bigEndian(size, 2);
+        } else {
+            buffer += static_cast<char>(code16 + 1);
+            bigEndian(size, 4);
+        }
     }
 
+public:
+    MsgPackWriter(size_t capacity = 4096) {
+        buffer.reserve(capacity);
+    }
+    
+    void beginObject(size_t size) { header(size, 0x80, 16, 0xde); }
+    void endObject() {}
+    void beginArray(size_t size) { header(size, 0x90, 16, 0xdc); }
+    void endArray() {}
+    
+    void key(const char* name) {
+        value(string(name));
+    }
+    
+    void value(const string& text) {
+        size_t size = text.size();
+        if (size < 32) {
+            buffer += static_cast<char>(0xa0 | size);
+        } else if (size <= 0xFF) {
+            buffer += static_cast<char>(0xd9);
+            bigEndian(size, 1);
+        } else if (size <= 0xFFFF) {
+            buffer += static_cast<char>(0xda);
+            bigEndian(size, 2);
+        } else {
+            buffer += static_cast<char>(0xdb);
+            bigEndian(size, 4);
+        }
+        buffer += text;
+    }
+    
+    void value(long long number) {
+        if (number >= 0 && number < 128) {
+            buffer += static_cast<char>(number);
+        } else if (number >= -32 && number < 0) {
+            buffer += static_cast<char>(number & 0xFF);
+        } else {
+            buffer += static_cast<char>(0xd3);
+            bigEndian(static_cast<unsigned long long>(number), 8);
+        }
+    }
+    
+    void money(double number) {
+        double rounded = llround(number * 100.0) / 100.0;
+        unsigned long long bits;
+        memcpy(&bits, &rounded, sizeof(bits));
+        buffer += static_cast<char>(0xcb);
+        bigEndian(bits, 8);
+    }
+    
+    string take() { return std::move(buffer); }
+};
+
+
+/**
+ * Орієнтовний розмір результату - буфер виділяється один раз
+ */
+inline size_t estimateOutputSize(const AnalyticsResult& result) {
+    size_t periods = result.dailyRevenue.size() + result.weeklyRevenue.size() + result.monthlyRevenue.size();
+    size_t products = result.topByRevenue.size() + result.topByQuantity.size() + result.abcAnalysis.size();
+    return 1024 + periods * 48 + products * 128 + result.categoryShares.size() * 96;
+}
+
+template <typename Writer>
+void writePeriods(Writer& writer, const char* name, const char* keyName,
+                  const vector<pair<string, double>>& periods) {
+    writer.key(name);
+    writer.beginArray(periods.size());
+    for (const auto& period : periods) {
+        writer.beginObject(2);
+        writer.key(keyName);
+        writer.value(period.first);
+        writer.key("revenue");
+        writer.money(period.second);
+        writer.endObject();
+    }
+    writer.endArray();
+}
+
+template <typename Writer>
+void writeTopProducts(Writer& writer, const char* name, const vector<TopProduct>& products, bool quantityFirst) {
+    writer.key(name);
+    writer.beginArray(products.size());
+    for (const auto& product : products) {
+        writer.beginObject(4);
+        writer.key("product_id");
+        writer.value(static_cast<long long>(product.getProductId()));
+        writer.key("product_name");
+        writer.value(product.getName());
+        if (quantityFirst) {
+            writer.key("quantity");
+            writer.value(static_cast<long long>(product.getQuantity()));
+            writer.key("revenue");
+            writer.money(product.getRevenue());
+        } else {
+            writer.key("revenue");
+            writer.money(product.getRevenue());
+            writer.key("quantity");
+            writer.value(static_cast<long long>(product.getQuantity()));
+        }
+        writer.endObject();
+    }
+    writer.endArray();
+}
+
+/**
+ * Запис усіх показників (одна структура для JSON і MessagePack)
+ */
+template <typename Writer>
+void writeAnalytics(const AnalyticsResult& result, Writer& writer) {
+    writer.beginObject(8);
+    writePeriods(writer, "daily_revenue", "date", result.dailyRevenue);
+    writePeriods(writer, "weekly_revenue", "week", result.weeklyRevenue);
+    writePeriods(writer, "monthly_revenue", "month", result.monthlyRevenue);
+    writeTopProducts(writer, "top_products_by_revenue", result.topByRevenue, false);
+    writeTopProducts(writer, "top_products_by_quantity", result.topByQuantity, true);
+    
+    writer.key("category_shares");
+    writer.beginArray(result.categoryShares.size());
+    for (const auto& share : result.categoryShares) {
+        writer.beginObject(3);
+        writer.key("category_id");
+        writer.value(static_cast<long long>(share.getCategoryId()));
+        writer.key("category");
+        writer.value(share.getName());
+        writer.key("share");
+        writer.money(share.getShare());
+        writer.endObject();
+    }
+    writer.endArray();
+    
+    const Statistics& stats = result.statistics;
+    writer.key("statistics");
+    writer.beginObject(7);
+    writer.key("total_revenue");
+    writer.money(result.totalRevenue);
+    writer.key("mean");
+    writer.money(stats.getMean());
+    writer.key("median");
+    writer.money(stats.getMedian());
+    writer.key("std_dev");
+    writer.money(stats.getStdDev());
+    writer.key("min");
+    writer.money(stats.getMin());
+    writer.key("max");
+    writer.money(stats.getMax());
+    writer.key("total_sales");
+    writer.value(static_cast<long long>(result.totalSales));
+    writer.endObject();
+    
+    writer.key("abc_analysis");
+    writer.beginArray(result.abcAnalysis.size());
+    for (const auto& abc : result.abcAnalysis) {
+        writer.beginObject(5);
+        writer.key("product_id");
+        writer.value(static_cast<long long>(abc.getProductId()));
+        writer.key("product_name");
+        writer.value(abc.getProductName());
+        writer.key("revenue");
+        writer.money(abc.getRevenue());
+        writer.key("cumulative_percent");
+        writer.money(abc.getCumulativePercent());
+        writer.key("category");
+        writer.value(string(1, abc.getCategory()));
+        writer.endObject();
+    }
+    writer.endArray();
+    writer.endObject();
+}
+
+/**
+ * Повідомлення про помилку у вибраному форматі ({"error": ...})
+ */
+inline string errorOutput(const string& message, OutputFormat format) {
+    if (format == OUTPUT_MSGPACK) {
+        MsgPackWriter writer;
+        writer.beginObject(1);
+        writer.key("error");
+        writer.value(message);
+        return writer.take();
+    }
+    JSONWriter writer;
+    writer.beginObject(1);
+    writer.key("error");
+    writer.value(message);
+    writer.endObject();
+    return writer.take();
+}
+
+
+// ========== ГОЛОВНИЙ КЛАС АНАЛІТИКИ ==========
+
+/**
+ * Головний клас для аналітики
+ * Координує всі обчислення та вивід результатів
+ * Використовує принципи ООП: інкапсуляцію, композицію
+ */
+class AnalyticsEngine {
+private:
+    vector<Sale> sales;
+    unsigned threads;
+    
 public:
     /**
      * Конструктор - приймає JSON рядок
+     * При синтаксичній помилці кидає JSONParseError
      */
-    AnalyticsEngine(const string& jsonInput) {
+    AnalyticsEngine(const string& jsonInput) : threads(1) {
         JSONParser parser(jsonInput);
         sales = parser.parseSales();
     }
     
+    /**
+     * Конструктор - приймає вже зібрані продажі (колонковий вхід з Python)
+     */
+    AnalyticsEngine(vector<Sale>&& parsedSales) : sales(std::move(parsedSales)), threads(1) {}
+    
+    /**
+     * Кількість потоків агрегації (результат від неї не залежить)
+     */
+    void setThreads(unsigned count) {
+        threads = max(1u, count);
+    }
+    
     /**
      * Перевірка чи є дані
      */
@@ -925,167 +1669,876 @@ public:
         return !sales.empty();
     }
     
+    /**
+     * Всі показники одним проходом (FusedAggregator)
+     */
+    AnalyticsResult compute() const {
+        return FusedAggregator::run(sales, threads);
+    }
+    
+    /**
+     * Вивід результату у JSON (буфер формується повністю і пишеться одним викликом)
+     */
+    static void output(const AnalyticsResult& result, ostream& out) {
+        string json = serialize(result, OUTPUT_JSON);
+        out.write(json.data(), json.size());
+    }
+    
+    /**
+     * Результат у JSON або MessagePack
+     */
+    static string serialize(const AnalyticsResult& result, OutputFormat format) {
+        if (format == OUTPUT_MSGPACK) {
+            MsgPackWriter writer(estimateOutputSize(result));
+            writeAnalytics(result, writer);
+            return writer.take();
+        }
+        JSONWriter writer(estimateOutputSize(result));
+        writeAnalytics(result, writer);
+        return writer.take();
+    }
+    
     /**
      * Виконання всіх обчислень та вивід результатів
-     * Інкапсулює всю логіку аналітики
      */
-    void processAndOutput() {
+    void processAndOutput(ostream& out) {
         if (sales.empty()) {
-            cout << "{\"error\":\"No sales found\"}";
+            out << "{\"error\":\"No sales found\"}";
             return;
         }
+        output(compute(), out);
+    }
+};
+
+
+// ========== ПРЯМЕ ЧИТАННЯ SQLITE ==========
+
+// Заголовок запиту режиму прямого читання БД (stdin виконуваного файлу)
+const string SQLITE_HEADER = "#ASQL 1";
+
+/**
+ * Клас для читання продажів напряму з db.sqlite3 (тільки читання)
+ *
+ * Один запит з JOIN продажів, позицій, товарів і категорій за діапазоном
+ * created_at (індекс sale_created_at_idx; порядок (created_at, id) збігається
+ * з порядком індексу, тому сортування не потрібне). Рядки агрегуються по мірі
+ * читання, без вектора продажів. Локальна дата продажу визначається за межами
+ * днів у UTC, переданими з Python (часовий пояс враховує Django).
+ */
+class SQLiteSalesSource {
+private:
+    string path;
+    string error;
+    // Локальні дати та початки днів у UTC ("YYYY-MM-DD HH:MM:SS"), за зростанням
+    vector<string> dayDates;
+    vector<string> dayStarts;
+    string rangeEnd;
+    
+    static const char* query() {
+        return "SELECT s.id, s.created_at, s.total_amount,"
+               " i.product_id, p.name, p.category_id, c.name, i.quantity, i.subtotal"
+               " FROM store_sale s"
+               " LEFT JOIN store_saleitem i ON i.sale_id = s.id"
+               " LEFT JOIN store_product p ON p.id = i.product_id"
+               " LEFT JOIN store_category c ON c.id = p.category_id"
+               " WHERE s.created_at >= ?1 AND s.created_at < ?2"
+               " ORDER BY s.created_at, s.id";
+    }
+    
+    static const char* text(sqlite3_stmt* statement, int column) {
+        const unsigned char* value = sqlite3_column_text(statement, column);
+        return value ? reinterpret_cast<const char*>(value) : "";
+    }
+    
+    bool fail(sqlite3* db, const string& context) {
+        error = context + ": " + (db ? sqlite3_errmsg(db) : "out of memory");
+        return false;
+    }
+
+public:
+    SQLiteSalesSource(const string& databasePath) : path(databasePath) {}
+    
+    const string& getError() const { return error; }
+    bool hasDays() const { return !dayStarts.empty(); }
+    
+    void addDay(const string& date, const string& utcStart) {
+        dayDates.push_back(date);
+        dayStarts.push_back(utcStart);
+    }
+    
+    void setRangeEnd(const string& utcEnd) {
+        rangeEnd = utcEnd;
+    }
+    
+    /**
+     * Агрегація всіх продажів діапазону; повертає кількість продажів через salesCount
+     */
+    bool aggregate(PartialAggregate& total, size_t& salesCount) {
+        salesCount = 0;
+        if (dayStarts.empty() || rangeEnd.empty()) {
+            error = "Date range is empty";
+            return false;
+        }
         
-        // 1. Агрегація по днях/тижнях/місяцях
-        map<string, double> dailyRevenue = DataAggregator::aggregateByDay(sales);
-        map<string, double> weeklyRevenue = DataAggregator::aggregateByWeek(sales);
-        map<string, double> monthlyRevenue = DataAggregator::aggregateByMonth(sales);
-        
-        // 2. Топ товарів
-        vector<TopProduct> topByRevenue = TopProductsCalculator::byRevenue(sales);
-        vector<TopProduct> topByQuantity = TopProductsCalculator::byQuantity(sales);
-        
-        // 3. Частки по категоріях
-        map<string, double> categorySharesData = CategorySharesCalculator::calculate(sales);
-        
-        // 4. Статистики
-        vector<double> saleAmounts = extractSaleAmounts();
-        Statistics stats = StatisticsCalculator::calculate(saleAmounts);
-        
-        // 5. ABC-аналіз
-        vector<ABCResult> abcResults = ABCAnalyzer::analyze(sales);
-        
-        // 6. Загальна виручка
-        double totalRevenue = calculateTotalRevenue();
-        
-        // ========== ВИВІД РЕЗУЛЬТАТІВ ==========
+        sqlite3* db = nullptr;
+        if (sqlite3_open_v2(path.c_str(), &db, SQLITE_OPEN_READONLY, nullptr) != SQLITE_OK) {
+            bool result = fail(db, path);
+            sqlite3_close(db);
+            return result;
+        }
+        // Запис з Django може тримати блокування - коротке очікування
+        sqlite3_busy_timeout(db, 5000);
         
-        cout << "{";
+        sqlite3_stmt* statement = nullptr;
+        if (sqlite3_prepare_v2(db, query(), -1, &statement, nullptr) != SQLITE_OK) {
+            bool result = fail(db, "prepare");
+            sqlite3_close(db);
+            return result;
+        }
+        sqlite3_bind_text(statement, 1, dayStarts.front().c_str(), -1, SQLITE_STATIC);
+        sqlite3_bind_text(statement, 2, rangeEnd.c_str(), -1, SQLITE_STATIC);
         
-        // Агрегація по днях
-        cout << "\"daily_revenue\":[";
-        bool first = true;
-        for (const auto& p : dailyRevenue) {
-            if (p.first.empty()) continue;
-            if (!first) cout << ",";
-            cout << "{\"date\":\"" << p.first << "\",\"revenue\":" 
-                 << fixed << setprecision(2) << p.second << "}";
-            first = false;
-        }
-        cout << "],";
+        sqlite3_int64 lastSale = 0;
+        bool hasSale = false;
+        size_t day = 0;
+        int status;
+        while ((status = sqlite3_step(statement)) == SQLITE_ROW) {
+            sqlite3_int64 saleId = sqlite3_column_int64(statement, 0);
+            if (!hasSale || saleId != lastSale) {
+                // Рядки впорядковані за created_at - межа дня тільки зсувається вперед
+                const char* createdAt = text(statement, 1);
+                while (day + 1 < dayStarts.size() && dayStarts[day + 1].compare(createdAt) <= 0) {
+                    ++day;
+                }
+                total.addSale(dayDates[day], sqlite3_column_double(statement, 2));
+                lastSale = saleId;
+                hasSale = true;
+                ++salesCount;
+            }
+            
+            // Продаж без позицій (LEFT JOIN)
+            if (sqlite3_column_type(statement, 3) == SQLITE_NULL) continue;
+            total.items.add(sqlite3_column_int(statement, 3), text(statement, 4),
+                            sqlite3_column_int(statement, 5), text(statement, 6),
+                            sqlite3_column_int(statement, 7), sqlite3_column_double(statement, 8));
+        }
         
-        // Агрегація по тижнях
-        cout << "\"weekly_revenue\":[";
-        first = true;
-        for (const auto& p : weeklyRevenue) {
-            if (!first) cout << ",";
-            cout << "{\"week\":\"" << p.first << "\",\"revenue\":" 
-                 << fixed << setprecision(2) << p.second << "}";
-            first = false;
-        }
-        cout << "],";
+        bool ok = (status == SQLITE_DONE) || fail(db, "query");
+        sqlite3_finalize(statement);
+        sqlite3_close(db);
+        return ok;
+    }
+    
+    /**
+     * Результат у JSON або MessagePack (помилки - {"error": ...}, як в інших режимах)
+     */
+    string run(OutputFormat format = OUTPUT_JSON) {
+        PartialAggregate total;
+        size_t salesCount = 0;
+        if (!aggregate(total, salesCount)) {
+            return errorOutput(error, format);
+        }
+        if (salesCount == 0) {
+            error = "No sales found";
+            return errorOutput(error, format);
+        }
+        return AnalyticsEngine::serialize(FusedAggregator::finish(total, salesCount), format);
+    }
+};
+
+
+// ========== РЕЗИДЕНТНІ ДАНІ ДЕМОНА ==========
+
+/**
+ * Клас для набору продажів, що зберігається в пам'яті демона
+ * Продажі впорядковані за датою, тому запит за діапазоном дат - це два
+ * бінарні пошуки та один прохід ядра по суцільному діапазону.
+ * Нові продажі додаються інкрементально (append), повторні id ігноруються.
+ */
+class ResidentDataset {
+private:
+    vector<Sale> sales;
+    unordered_set<int> knownIds;
+    // Продажі, додані до завантаження повного набору (зливаються при load)
+    vector<Sale> pending;
+    bool loaded;
+    unsigned long long epoch;
+    
+    static bool dateLess(const Sale& a, const Sale& b) {
+        return a.getDate() < b.getDate();
+    }
+    
+    void insertSorted(Sale&& sale) {
+        if (sales.empty() || !(sale.getDate() < sales.back().getDate())) {
+            sales.push_back(std::move(sale));
+        } else {
+            sales.insert(upper_bound(sales.begin(), sales.end(), sale, dateLess), std::move(sale));
+        }
+    }
+
+public:
+    ResidentDataset() : loaded(false), epoch(1) {}
+    
+    bool isLoaded() const { return loaded; }
+    size_t size() const { return sales.size(); }
+    unsigned long long getEpoch() const { return epoch; }
+    
+    /**
+     * Повний набір продажів (замінює поточний)
+     */
+    void load(vector<Sale>&& loadedSales) {
+        sales = std::move(loadedSales);
+        if (!is_sorted(sales.begin(), sales.end(), dateLess)) {
+            stable_sort(sales.begin(), sales.end(), dateLess);
+        }
+        knownIds.clear();
+        for (const auto& sale : sales) {
+            knownIds.insert(sale.getId());
+        }
         
-        // Агрегація по місяцях
-        cout << "\"monthly_revenue\":[";
-        first = true;
-        for (const auto& p : monthlyRevenue) {
-            if (p.first.empty()) continue;
-            if (!first) cout << ",";
-            cout << "{\"month\":\"" << p.first << "\",\"revenue\":" 
-                 << fixed << setprecision(2) << p.second << "}";
-            first = false;
-        }
-        cout << "],";
+        // Продажі, зафіксовані після знімка, з якого зібрано набір
+        for (auto& sale : pending) {
+            if (knownIds.insert(sale.getId()).second) {
+                insertSorted(std::move(sale));
+            }
+        }
+        pending.clear();
+        loaded = true;
+    }
+    
+    /**
+     * Додавання нових продажів; повертає кількість прийнятих
+     */
+    size_t append(vector<Sale>&& batch) {
+        size_t accepted = 0;
+        for (auto& sale : batch) {
+            if (loaded) {
+                if (!knownIds.insert(sale.getId()).second) continue;
+                insertSorted(std::move(sale));
+            } else {
+                pending.push_back(std::move(sale));
+            }
+            ++accepted;
+        }
+        return accepted;
+    }
+    
+    /**
+     * Скидання після змін, що не є додаванням (редагування, видалення):
+     * нова епоха відхиляє набори, зібрані до скидання
+     */
+    void reset() {
+        sales.clear();
+        knownIds.clear();
+        pending.clear();
+        loaded = false;
+        ++epoch;
+    }
+    
+    /**
+     * Продажі з датою в межах [dateFrom, dateTo] (рядки YYYY-MM-DD)
+     */
+    pair<FusedAggregator::SaleIterator, FusedAggregator::SaleIterator> range(const string& dateFrom,
+                                                                            const string& dateTo) const {
+        auto begin = lower_bound(sales.begin(), sales.end(), dateFrom,
+                                 [](const Sale& sale, const string& date) { return sale.getDate() < date; });
+        auto end = upper_bound(begin, sales.end(), dateTo,
+                               [](const string& date, const Sale& sale) { return date < sale.getDate(); });
+        return make_pair(begin, end);
+    }
+};
+
+
+/**
+ * Клас для обробки запитів демона (без роботи з сокетами)
+ *
+ * Запит - текст, перший рядок якого є командою:
+ *   QUERY <YYYY-MM-DD> <YYYY-MM-DD>  - аналітика за період з резидентних даних
+ *   LOAD <епоха>\n<записи #ACOL>      - повний набір продажів (тільки поки дані
+ *                                       не завантажено і епоха поточна)
+ *   APPEND\n<записи #ACOL>            - нові продажі
+ *   RESET                             - скинути дані (потрібне повторне LOAD)
+ *   PING                              - стан демона
+ * Відповідь - JSON; поки дані не завантажено, QUERY повертає
+ * {"loaded":false,"epoch":N}.
+ */
+class DaemonProtocol {
+private:
+    ResidentDataset dataset;
+    unsigned threads;
+    
+    static string errorJson(const string& message) {
+        return errorOutput(message, OUTPUT_JSON);
+    }
+    
+    string state() const {
+        ostringstream out;
+        out << "{\"ok\":true,\"loaded\":" << (dataset.isLoaded() ? "true" : "false")
+            << ",\"sales\":" << dataset.size() << ",\"epoch\":" << dataset.getEpoch() << "}";
+        return out.str();
+    }
+    
+    static bool readRecords(const string& request, size_t bodyStart, vector<Sale>& sales, string& error) {
+        istringstream body(bodyStart < request.size() ? request.substr(bodyStart) : string());
+        ColumnarStreamReader reader;
+        if (!reader.read(body, sales)) {
+            error = reader.getError();
+            return false;
+        }
+        return true;
+    }
+
+public:
+    DaemonProtocol(unsigned threadCount) : threads(threadCount) {}
+    
+    string handle(const string& request) {
+        size_t lineEnd = request.find('\n');
+        istringstream command(request.substr(0, lineEnd));
+        size_t bodyStart = (lineEnd == string::npos) ? request.size() : lineEnd + 1;
+        string name;
+        command >> name;
         
-        // Топ товарів за виручкою
-        cout << "\"top_products_by_revenue\":[";
-        first = true;
-        for (size_t i = 0; i < min(topByRevenue.size(), size_t(20)); ++i) {
-            if (!first) cout << ",";
-            cout << "{\"product_name\":\"" << JSONEscaper::escape(topByRevenue[i].getName()) 
-                 << "\",\"revenue\":" << fixed << setprecision(2) << topByRevenue[i].getRevenue()
-                 << ",\"quantity\":" << topByRevenue[i].getQuantity() << "}";
-            first = false;
-        }
-        cout << "],";
+        if (name == "QUERY") {
+            string dateFrom, dateTo;
+            if (!(command >> dateFrom >> dateTo)) return errorJson("QUERY expects two dates");
+            if (!dataset.isLoaded()) {
+                return "{\"loaded\":false,\"epoch\":" + to_string(dataset.getEpoch()) + "}";
+            }
+            auto found = dataset.range(dateFrom, dateTo);
+            if (found.first == found.second) return errorJson("No sales found");
+            return AnalyticsEngine::serialize(FusedAggregator::run(found.first, found.second, threads), OUTPUT_JSON);
+        }
+        if (name == "LOAD") {
+            unsigned long long epoch = 0;
+            if (!(command >> epoch)) return errorJson("LOAD expects an epoch");
+            // Повторне LOAD тієї ж епохи (паралельні клієнти) замінило б набір разом
+            // з продажами, прийнятими через APPEND після першого завантаження
+            if (epoch != dataset.getEpoch() || dataset.isLoaded()) {
+                return "{\"ok\":false,\"loaded\":" + string(dataset.isLoaded() ? "true" : "false")
+                    + ",\"epoch\":" + to_string(dataset.getEpoch()) + "}";
+            }
+            vector<Sale> sales;
+            string error;
+            if (!readRecords(request, bodyStart, sales, error)) return errorJson(error);
+            dataset.load(std::move(sales));
+            return state();
+        }
+        if (name == "APPEND") {
+            vector<Sale> sales;
+            string error;
+            if (!readRecords(request, bodyStart, sales, error)) return errorJson(error);
+            size_t accepted = dataset.append(std::move(sales));
+            return "{\"ok\":true,\"accepted\":" + to_string(accepted) + "}";
+        }
+        if (name == "RESET") {
+            dataset.reset();
+            return state();
+        }
+        if (name == "PING") {
+            return state();
+        }
+        return errorJson("Unknown command '" + name + "'");
+    }
+};
+
+
+// ========== C API ДЛЯ ВИКЛИКУ З PYTHON (ctypes) ==========
+
+/**
+ * Колонковий вхід без JSON: масиви продажів та позицій передаються напряму.
+ * Позиція посилається на продаж індексом у масивах продажів (item_sale_index).
+ * Результат - JSON рядок, виділений malloc; звільняти через analytics_free.
+ * Після analytics_set_output_format(1) результат - MessagePack з 4-байтною
+ * довжиною (big-endian) перед даними.
+ */
+static OutputFormat libraryOutputFormat = OUTPUT_JSON;
+
+static char* toBuffer(const string& result) {
+    size_t prefix = (libraryOutputFormat == OUTPUT_MSGPACK) ? 4 : 0;
+    char* buffer = static_cast<char*>(malloc(prefix + result.size() + 1));
+    if (!buffer) return nullptr;
+    for (size_t i = 0; i < prefix; ++i) {
+        buffer[i] = static_cast<char>((result.size() >> (8 * (prefix - 1 - i))) & 0xFF);
+    }
+    memcpy(buffer + prefix, result.data(), result.size());
+    buffer[prefix + result.size()] = '\0';
+    return buffer;
+}
+
+extern "C" {
+
+void analytics_set_output_format(int format) {
+    libraryOutputFormat = (format == OUTPUT_MSGPACK) ? OUTPUT_MSGPACK : OUTPUT_JSON;
+}
+
+char* analytics_run_columnar(
+    int n_sales, const int* sale_ids, const char* const* sale_dates, const double* sale_totals,
+    int n_items, const int* item_sale_index,
+    const int* item_product_ids, const char* const* item_product_names,
+    const int* item_category_ids, const char* const* item_category_names,
+    const int* item_quantities, const double* item_prices, const double* item_subtotals)
+{
+    try {
+        vector<Sale> sales;
+        sales.reserve(n_sales);
+        for (int i = 0; i < n_sales; ++i) {
+            sales.emplace_back(sale_ids[i], sale_dates[i] ? sale_dates[i] : "", sale_totals[i]);
+        }
         
-        // Топ товарів за кількістю
-        cout << "\"top_products_by_quantity\":[";
-        first = true;
-        for (size_t i = 0; i < min(topByQuantity.size(), size_t(20)); ++i) {
-            if (!first) cout << ",";
-            cout << "{\"product_name\":\"" << JSONEscaper::escape(topByQuantity[i].getName()) 
-                 << "\",\"quantity\":" << topByQuantity[i].getQuantity()
-                 << ",\"revenue\":" << fixed << setprecision(2) << topByQuantity[i].getRevenue() << "}";
-            first = false;
-        }
-        cout << "],";
+        for (int i = 0; i < n_items; ++i) {
+            int idx = item_sale_index[i];
+            if (idx < 0 || idx >= n_sales) continue;
+            Sale& sale = sales[idx];
+            sale.addItem(SaleItem(
+                item_product_ids[i], item_product_names[i] ? item_product_names[i] : "",
+                item_category_ids[i], item_category_names[i] ? item_category_names[i] : "",
+                item_quantities[i], item_prices[i], item_subtotals[i], sale.getDate()));
+        }
         
-        // Частки по категоріях
-        cout << "\"category_shares\":[";
-        first = true;
-        for (const auto& p : categorySharesData) {
-            if (!first) cout << ",";
-            cout << "{\"category\":\"" << JSONEscaper::escape(p.first) 
-                 << "\",\"share\":" << fixed << setprecision(2) << p.second << "}";
-            first = false;
-        }
-        cout << "],";
+        AnalyticsEngine engine(std::move(sales));
+        engine.setThreads(resolveThreadCount(nullptr));
+        if (!engine.hasData()) {
+            return toBuffer(errorOutput("No sales found", libraryOutputFormat));
+        }
+        return toBuffer(AnalyticsEngine::serialize(engine.compute(), libraryOutputFormat));
+    } catch (...) {
+        return nullptr;
+    }
+}
+
+/**
+ * Пряме читання db.sqlite3: шлях до БД, локальні дати днів діапазону з їх
+ * початками у UTC та кінець діапазону у UTC ("YYYY-MM-DD HH:MM:SS")
+ */
+char* analytics_run_sqlite(
+    const char* db_path, int n_days, const char* const* day_dates, const char* const* day_starts,
+    const char* range_end)
+{
+    try {
+        SQLiteSalesSource source(db_path ? db_path : "");
+        for (int i = 0; i < n_days; ++i) {
+            source.addDay(day_dates[i], day_starts[i]);
+        }
+        source.setRangeEnd(range_end ? range_end : "");
         
-        // Статистики
-        cout << "\"statistics\":{";
-        cout << "\"total_revenue\":" << fixed << setprecision(2) << totalRevenue << ",";
-        cout << "\"mean\":" << fixed << setprecision(2) << stats.getMean() << ",";
-        cout << "\"median\":" << fixed << setprecision(2) << stats.getMedian() << ",";
-        cout << "\"std_dev\":" << fixed << setprecision(2) << stats.getStdDev() << ",";
-        cout << "\"min\":" << fixed << setprecision(2) << stats.getMin() << ",";
-        cout << "\"max\":" << fixed << setprecision(2) << stats.getMax() << ",";
-        cout << "\"total_sales\":" << sales.size();
-        cout << "},";
+        return toBuffer(source.run(libraryOutputFormat));
+    } catch (...) {
+        return nullptr;
+    }
+}
+
+void analytics_free(char* buffer) {
+    free(buffer);
+}
+
+}
+
+
+// ========== ГОЛОВНА ФУНКЦІЯ ==========
+
+#ifndef ANALYTICS_LIBRARY
+
+// ========== КАДРИ ДЕМОНА ТА ВОРКЕРА ==========
+
+// Захист від некоректної довжини кадру
+static const uint32_t MAX_FRAME_SIZE = 1u << 30;
+
+// 4 байти довжини (big-endian) перед тілом кадру
+static string encodeFrameLength(size_t length) {
+    string header(4, '\0');
+    for (int i = 3; i >= 0; --i) {
+        header[i] = static_cast<char>(length & 0xFF);
+        length >>= 8;
+    }
+    return header;
+}
+
+static uint32_t decodeFrameLength(const unsigned char* header) {
+    return (uint32_t(header[0]) << 24) | (uint32_t(header[1]) << 16)
+         | (uint32_t(header[2]) << 8) | uint32_t(header[3]);
+}
+
+// Довжина кадру, після якої тіло йде частинами: кадри частин до порожнього кадру
+static const uint32_t CHUNKED_FRAME = 0xFFFFFFFFu;
+
+/**
+ * Потік тіла запиту, переданого частинами (CHUNKED_FRAME): частини читаються
+ * з джерела по мірі розбору, тому запит не збирається в пам'яті цілком.
+ */
+class ChunkedFrameBuffer : public streambuf {
+public:
+    explicit ChunkedFrameBuffer(istream& source) : source(source) {}
+    
+    // Дочитати частини, що лишилися після завершення розбору; false - обрив потоку
+    bool drain() {
+        while (nextChunk()) {}
+        return !broken;
+    }
+    
+protected:
+    int_type underflow() override {
+        if (gptr() == egptr() && !nextChunk()) {
+            return traits_type::eof();
+        }
+        return traits_type::to_int_type(*gptr());
+    }
+    
+private:
+    bool nextChunk() {
+        if (finished || broken) return false;
+        unsigned char header[4];
+        if (!source.read(reinterpret_cast<char*>(header), sizeof(header))) {
+            broken = true;
+            return false;
+        }
+        uint32_t length = decodeFrameLength(header);
+        if (length == 0) {
+            finished = true;
+            return false;
+        }
+        if (length > MAX_FRAME_SIZE) {
+            broken = true;
+            return false;
+        }
+        chunk.resize(length);
+        if (!source.read(&chunk[0], length)) {
+            broken = true;
+            return false;
+        }
+        setg(&chunk[0], &chunk[0], &chunk[0] + length);
+        return true;
+    }
+    
+    istream& source;
+    string chunk;
+    bool finished = false;
+    bool broken = false;
+};
+
+// ========== ДЕМОН (UNIX DOMAIN SOCKET) ==========
+
+static volatile sig_atomic_t daemonStopRequested = 0;
+
+static void requestDaemonStop(int) {
+    daemonStopRequested = 1;
+}
+
+/**
+ * Клас для демона аналітики на Unix domain socket
+ * Кадр (запит і відповідь) - 4 байти довжини (big-endian) та тіло.
+ * Один потік обслуговує всі з'єднання через poll(); кожен кадр
+ * обробляється повністю до наступного, тому команди не перемежовуються.
+ */
+class AnalyticsDaemon {
+private:
+    struct Connection {
+        int fd;
+        string input;
+        string output;
+    };
+    
+    string socketPath;
+    DaemonProtocol protocol;
+    int listener;
+    vector<Connection> connections;
+    
+    // Обробка всіх повних кадрів з буфера; false - з'єднання треба закрити
+    bool processFrames(Connection& connection) {
+        size_t offset = 0;
+        while (connection.input.size() - offset >= 4) {
+            uint32_t length = decodeFrameLength(
+                reinterpret_cast<const unsigned char*>(connection.input.data() + offset));
+            if (length > MAX_FRAME_SIZE) return false;
+            if (connection.input.size() - offset - 4 < length) break;
+            
+            string response;
+            try {
+                response = protocol.handle(connection.input.substr(offset + 4, length));
+            } catch (const exception& e) {
+                response = errorOutput(e.what(), OUTPUT_JSON);
+            }
+            connection.output += encodeFrameLength(response.size());
+            connection.output += response;
+            offset += 4 + length;
+        }
+        connection.input.erase(0, offset);
+        return true;
+    }
+    
+    bool readFrom(Connection& connection) {
+        char buffer[65536];
+        ssize_t received = recv(connection.fd, buffer, sizeof(buffer), 0);
+        if (received <= 0) return received < 0 && (errno == EINTR || errno == EAGAIN);
+        connection.input.append(buffer, received);
+        return processFrames(connection);
+    }
+    
+    bool writeTo(Connection& connection) {
+        ssize_t sent = send(connection.fd, connection.output.data(), connection.output.size(), MSG_NOSIGNAL);
+        if (sent < 0) return errno == EINTR || errno == EAGAIN;
+        connection.output.erase(0, sent);
+        return true;
+    }
+
+public:
+    AnalyticsDaemon(const string& path, unsigned threads)
+        : socketPath(path), protocol(threads), listener(-1) {}
+    
+    ~AnalyticsDaemon() {
+        for (const auto& connection : connections) close(connection.fd);
+        if (listener >= 0) {
+            close(listener);
+            unlink(socketPath.c_str());
+        }
+    }
+    
+    bool listen(string& error) {
+        sockaddr_un address;
+        memset(&address, 0, sizeof(address));
+        address.sun_family = AF_UNIX;
+        if (socketPath.size() >= sizeof(address.sun_path)) {
+            error = "Socket path is too long";
+            return false;
+        }
+        strcpy(address.sun_path, socketPath.c_str());
         
-        // ABC-аналіз
-        cout << "\"abc_analysis\":[";
-        first = true;
-        for (const auto& abc : abcResults) {
-            if (!first) cout << ",";
-            cout << "{\"product_name\":\"" << JSONEscaper::escape(abc.getProductName()) 
-                 << "\",\"revenue\":" << fixed << setprecision(2) << abc.getRevenue()
-                 << ",\"cumulative_percent\":" << fixed << setprecision(2) << abc.getCumulativePercent()
-                 << ",\"category\":\"" << abc.getCategory() << "\"}";
-            first = false;
-        }
-        cout << "]";
+        listener = socket(AF_UNIX, SOCK_STREAM, 0);
+        if (listener < 0) {
+            error = strerror(errno);
+            return false;
+        }
+        // Файл від попереднього запуску
+        unlink(socketPath.c_str());
+        if (::bind(listener, reinterpret_cast<sockaddr*>(&address), sizeof(address)) < 0
+                || ::listen(listener, 64) < 0) {
+            error = strerror(errno);
+            return false;
+        }
+        return true;
+    }
+    
+    void serve() {
+        signal(SIGPIPE, SIG_IGN);
+        signal(SIGINT, requestDaemonStop);
+        signal(SIGTERM, requestDaemonStop);
         
-        cout << "}";
+        vector<pollfd> polled;
+        while (!daemonStopRequested) {
+            polled.clear();
+            polled.push_back(pollfd{listener, POLLIN, 0});
+            for (const auto& connection : connections) {
+                short events = POLLIN;
+                if (!connection.output.empty()) events |= POLLOUT;
+                polled.push_back(pollfd{connection.fd, events, 0});
+            }
+            
+            if (poll(polled.data(), polled.size(), -1) < 0) {
+                if (errno == EINTR) continue;
+                break;
+            }
+            
+            // Обробка з кінця, щоб видалення не зсувало індекси
+            for (size_t i = polled.size() - 1; i >= 1; --i) {
+                Connection& connection = connections[i - 1];
+                bool alive = !(polled[i].revents & (POLLERR | POLLNVAL));
+                if (alive && (polled[i].revents & (POLLIN | POLLHUP))) alive = readFrom(connection);
+                if (alive && (polled[i].revents & POLLOUT)) alive = writeTo(connection);
+                if (!alive) {
+                    close(connection.fd);
+                    connections.erase(connections.begin() + (i - 1));
+                }
+            }
+            
+            if (polled[0].revents & POLLIN) {
+                int client = accept(listener, nullptr, nullptr);
+                if (client >= 0) {
+                    // Повільний клієнт не блокує відповіді іншим з'єднанням
+                    fcntl(client, F_SETFL, fcntl(client, F_GETFL) | O_NONBLOCK);
+                    connections.push_back(Connection{client, string(), string()});
+                }
+            }
+        }
     }
 };
 
+// ========== ОБРОБКА ЗАПИТУ ТА РЕЖИМ ВОРКЕРА ==========
 
-// ========== ГОЛОВНА ФУНКЦІЯ ==========
-
-int main() {
-    // Читання JSON з stdin
-    string input;
+/**
+ * Обробка одного вхідного документа: #ASQL 1, #ACOL 1 або JSON {"sales": [...]}
+ * ok = false - помилка (в одноразовому режимі код завершення 1)
+ */
+static string processInput(istream& in, OutputFormat format, unsigned threads, bool& ok) {
+    ok = false;
     string line;
-    while (getline(cin, line)) {
-        input += line;
+    if (!getline(in, line)) {
+        return errorOutput("No input data", format);
+    }
+    if (!line.empty() && line[line.size() - 1] == '\r') {
+        line.erase(line.size() - 1);
+    }
+    
+    if (line == SQLITE_HEADER) {
+        // Пряме читання БД: DB <шлях>, D <дата> <початок дня UTC>..., E <кінець UTC>
+        string databasePath, rangeEnd;
+        vector<pair<string, string>> days;
+        while (getline(in, line)) {
+            if (!line.empty() && line[line.size() - 1] == '\r') line.erase(line.size() - 1);
+            vector<string> fields;
+            size_t start = 0, tab;
+            while ((tab = line.find('\t', start)) != string::npos) {
+                fields.push_back(line.substr(start, tab - start));
+                start = tab + 1;
+            }
+            fields.push_back(line.substr(start));
+            
+            if (fields[0] == "DB" && fields.size() == 2) databasePath = fields[1];
+            else if (fields[0] == "D" && fields.size() == 3) days.emplace_back(fields[1], fields[2]);
+            else if (fields[0] == "E" && fields.size() == 2) rangeEnd = fields[1];
+        }
+        
+        SQLiteSalesSource source(databasePath);
+        for (const auto& day : days) source.addDay(day.first, day.second);
+        source.setRangeEnd(rangeEnd);
+        string result = source.run(format);
+        ok = source.getError().empty();
+        return result;
     }
     
-    if (input.empty()) {
-        cout << "{\"error\":\"No input data\"}";
-        return 1;
+    vector<Sale> sales;
+    if (line == COLUMNAR_HEADER) {
+        // Потоковий колонковий формат: записи обробляються по мірі читання
+        ColumnarStreamReader reader;
+        if (!reader.read(in, sales)) {
+            return errorOutput(reader.getError(), format);
+        }
+    } else {
+        // JSON документ {"sales": [...]}; переводи рядків зберігаються для позиції помилки
+        ostringstream buffer;
+        buffer << line << '\n' << in.rdbuf();
+        string input = buffer.str();
+        try {
+            JSONParser parser(input);
+            sales = parser.parseSales();
+        } catch (const JSONParseError& e) {
+            return errorOutput(e.describe(), format);
+        }
     }
     
     // Створення об'єкта аналітики та обробка
-    AnalyticsEngine engine(input);
+    AnalyticsEngine engine(std::move(sales));
+    engine.setThreads(threads);
     
     if (!engine.hasData()) {
-        cout << "{\"error\":\"No sales found\"}";
-        return 1;
+        return errorOutput("No sales found", format);
     }
     
     // Виконання обчислень та вивід результатів
-    engine.processAndOutput();
-    
+    ok = true;
+    return AnalyticsEngine::serialize(engine.compute(), format);
+}
+
+/**
+ * Режим воркера пулу (--worker): кадри запитів у stdin, відповіді у stdout.
+ * Тіло запиту - документ одноразового режиму; "PING" - перевірка стану.
+ * Великі запити (колонковий потік) надходять частинами (CHUNKED_FRAME).
+ * Процес обслуговує запити до закриття stdin, тому exec, динамічне
+ * зв'язування та підкачування сторінок не входять у час запиту.
+ */
+static int serveWorker(OutputFormat format, unsigned threads) {
+    unsigned long long served = 0;
+    unsigned char header[4];
+    string request;
+    while (cin.read(reinterpret_cast<char*>(header), sizeof(header))) {
+        uint32_t length = decodeFrameLength(header);
+        string response;
+        if (length == CHUNKED_FRAME) {
+            ChunkedFrameBuffer buffer(cin);
+            istream input(&buffer);
+            bool ok;
+            try {
+                response = processInput(input, format, threads, ok);
+            } catch (const exception& e) {
+                response = errorOutput(e.what(), format);
+            }
+            // Помилка розбору могла зупинити читання до кінця тіла - решта частин пропускається
+            if (!buffer.drain()) return 1;
+            ++served;
+            string frame = encodeFrameLength(response.size());
+            cout.write(frame.data(), frame.size());
+            cout.write(response.data(), response.size());
+            cout.flush();
+            if (!cout) return 1;
+            continue;
+        }
+        if (length > MAX_FRAME_SIZE) return 1;
+        request.resize(length);
+        if (length > 0 && !cin.read(&request[0], length)) return 1;
+        
+        if (request == "PING") {
+            response = "{\"ok\":true,\"served\":" + to_string(served) + "}";
+        } else {
+            istringstream input(request);
+            bool ok;
+            try {
+                response = processInput(input, format, threads, ok);
+            } catch (const exception& e) {
+                response = errorOutput(e.what(), format);
+            }
+            ++served;
+        }
+        string frame = encodeFrameLength(response.size());
+        cout.write(frame.data(), frame.size());
+        cout.write(response.data(), response.size());
+        cout.flush();
+        if (!cout) return 1;
+    }
     return 0;
 }
 
+int main(int argc, char** argv) {
+    // --threads N / --threads=N; без прапорця - ANALYTICS_THREADS або кількість ядер
+    // --daemon PATH - резидентний режим на Unix domain socket
+    // --worker - воркер пулу: кадри запитів у stdin, відповідей у stdout
+    // --format msgpack - результат у MessagePack замість JSON
+    const char* threadsOption = nullptr;
+    const char* daemonSocket = nullptr;
+    bool worker = false;
+    OutputFormat format = OUTPUT_JSON;
+    for (int i = 1; i < argc; ++i) {
+        string arg = argv[i];
+        if (arg == "--threads" && i + 1 < argc) {
+            threadsOption = argv[++i];
+        } else if (arg.compare(0, 10, "--threads=") == 0) {
+            threadsOption = argv[i] + 10;
+        } else if (arg == "--daemon" && i + 1 < argc) {
+            daemonSocket = argv[++i];
+        } else if (arg == "--worker") {
+            worker = true;
+        } else if (arg == "--format=msgpack" || (arg == "--format" && i + 1 < argc && string(argv[++i]) == "msgpack")) {
+            format = OUTPUT_MSGPACK;
+        }
+    }
+    
+    if (daemonSocket != nullptr) {
+        AnalyticsDaemon daemon(daemonSocket, resolveThreadCount(threadsOption));
+        string error;
+        if (!daemon.listen(error)) {
+            cerr << "analytics: " << daemonSocket << ": " << error << endl;
+            return 1;
+        }
+        daemon.serve();
+        return 0;
+    }
+    
+    if (worker) {
+        return serveWorker(format, resolveThreadCount(threadsOption));
+    }
+    
+    // Результат або помилка пишуться одним записом
+    bool ok;
+    string result = processInput(cin, format, resolveThreadCount(threadsOption), ok);
+    cout.write(result.data(), result.size());
+    cout.flush();
+    return ok ? 0 : 1;
+}
+#endif
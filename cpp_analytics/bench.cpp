@@ -0,0 +1,844 @@
+/**
+ * Бенчмарки аналітичного модуля
+ *
+ *   ./bench parse [МБ]      - пропускна здатність JSON парсера (MB/s) на синтетичних
+ *                             документах {"sales": [...]} від МБ/8 до МБ (за замовчуванням 100);
+ *                             при лінійній складності MB/s не залежить від розміру входу
+ *   ./bench kernel [позицій] - багатопрохідна агрегація проти однопрохідного ядра
+ *                             (за замовчуванням 10 000 000 позицій), з перевіркою
+ *                             ідентичності JSON результату
+ *   ./bench threads [позицій] - масштабування ядра на 1/2/4/8/16 потоках
+ *                             (той самий результат при будь-якій кількості потоків)
+ *   ./bench output [товарів]  - вивід результату: iostream проти буферного JSONWriter
+ *                             та MessagePack (за замовчуванням 200 000 товарів)
+ *   ./bench phases [--days N] [--sales-per-day N] [--items-per-sale N] [--skus N]
+ *                  [--categories N] [--seed N] [--repeat N]
+ *                           - час фаз AnalyticsEngine (розбір JSON і колонкового потоку,
+ *                             агрегація, вивід JSON/MessagePack) на детермінованих
+ *                             синтетичних даних; результат - JSON для порівняння між комітами
+ *
+ * Збірка: make bench
+ */
+#define ANALYTICS_LIBRARY
+#include "analytics.cpp"
+
+#include <chrono>
+#include <sstream>
+
+// ========== ЕТАЛОННА БАГАТОПРОХІДНА РЕАЛІЗАЦІЯ ==========
+// Тільки для ./bench kernel: рушій використовує однопрохідне ядро FusedAggregator
+
+/**
+ * Клас для агрегації даних по періодах
+ * Інкапсулює логіку агрегації по днях/тижнях/місяцях
+ */
+class DataAggregator {
+public:
+    /**
+     * Агрегація по днях
+     */
+    static map<string, double> aggregateByDay(const vector<Sale>& sales) {
+        map<string, double> dailyTotals;
+        for (const auto& sale : sales) {
+            dailyTotals[sale.getDate()] += sale.getTotalAmount();
+        }
+        return dailyTotals;
+    }
+    
+    /**
+     * Агрегація по тижнях
+     */
+    static map<string, double> aggregateByWeek(const vector<Sale>& sales) {
+        map<string, double> weeklyTotals;
+        
+        for (const auto& sale : sales) {
+            int year, month, day;
+            if (!DateParser::parseYMD(sale.getDate(), year, month, day)) {
+                continue;
+            }
+            
+            int week = (month - 1) * 4 + (day - 1) / 7 + 1;
+            string weekKey = to_string(year) + "-W" + (week < 10 ? "0" : "") + to_string(week);
+            weeklyTotals[weekKey] += sale.getTotalAmount();
+        }
+        
+        return weeklyTotals;
+    }
+    
+    /**
+     * Агрегація по місяцях
+     */
+    static map<string, double> aggregateByMonth(const vector<Sale>& sales) {
+        map<string, double> monthlyTotals;
+        for (const auto& sale : sales) {
+            string monthKey = sale.getDate().substr(0, 7); // YYYY-MM
+            monthlyTotals[monthKey] += sale.getTotalAmount();
+        }
+        return monthlyTotals;
+    }
+};
+
+
+/**
+ * Клас для обчислення топ товарів
+ * Інкапсулює логіку розрахунку топ товарів
+ */
+class TopProductsCalculator {
+private:
+    static vector<TopProduct> build(const ItemAggregates& aggregates, bool byQuantity) {
+        const DenseIdIndex& products = aggregates.getProducts();
+        vector<TopProduct> result;
+        result.reserve(products.size());
+        for (size_t slot : aggregates.rankProducts(byQuantity)) {
+            result.emplace_back(products.getId(slot), products.getName(slot),
+                                aggregates.getProductRevenue(slot), aggregates.getProductQuantity(slot));
+        }
+        return result;
+    }
+
+public:
+    /**
+     * Топ товарів за виручкою
+     */
+    static vector<TopProduct> byRevenue(const ItemAggregates& aggregates) {
+        return build(aggregates, false);
+    }
+    
+    /**
+     * Топ товарів за кількістю
+     */
+    static vector<TopProduct> byQuantity(const ItemAggregates& aggregates) {
+        return build(aggregates, true);
+    }
+};
+
+
+/**
+ * Статистики з вектору значень (повне сортування)
+ */
+static Statistics referenceStatistics(const vector<double>& values) {
+    Statistics stats;
+    
+    if (values.empty()) {
+        stats.reset();
+        return stats;
+    }
+    
+    // Фільтруємо нульові значення
+    vector<double> nonZeroValues;
+    for (double val : values) {
+        if (val > 0) {
+            nonZeroValues.push_back(val);
+        }
+    }
+    
+    if (nonZeroValues.empty()) {
+        stats.reset();
+        return stats;
+    }
+    
+    vector<double> sorted = nonZeroValues;
+    sort(sorted.begin(), sorted.end());
+    
+    // Мінімум і максимум
+    stats.setMin(sorted.front());
+    stats.setMax(sorted.back());
+    
+    // Середнє
+    double sum = accumulate(sorted.begin(), sorted.end(), 0.0);
+    stats.setMean(sum / sorted.size());
+    
+    // Медіана
+    size_t n = sorted.size();
+    if (n % 2 == 0) {
+        stats.setMedian((sorted[n/2 - 1] + sorted[n/2]) / 2.0);
+    } else {
+        stats.setMedian(sorted[n/2]);
+    }
+    
+    // Стандартне відхилення
+    double mean = stats.getMean();
+    double variance = 0.0;
+    for (double val : sorted) {
+        variance += (val - mean) * (val - mean);
+    }
+    variance /= sorted.size();
+    stats.setStdDev(sqrt(variance));
+    
+    return stats;
+}
+
+
+static vector<pair<string, double>> nonEmptyKeys(const map<string, double>& data) {
+    vector<pair<string, double>> result;
+    for (const auto& p : data) {
+        if (!p.first.empty()) result.push_back(p);
+    }
+    return result;
+}
+
+/**
+ * Кожен калькулятор окремо обходить дані; результат має збігатися
+ * з FusedAggregator::run байт у байт
+ */
+static AnalyticsResult computeReference(const vector<Sale>& sales) {
+    AnalyticsResult result;
+    
+    // 1. Агрегація по днях/тижнях/місяцях
+    result.dailyRevenue = nonEmptyKeys(DataAggregator::aggregateByDay(sales));
+    result.weeklyRevenue = nonEmptyKeys(DataAggregator::aggregateByWeek(sales));
+    result.monthlyRevenue = nonEmptyKeys(DataAggregator::aggregateByMonth(sales));
+    
+    // 2. Агрегати позицій за id товарів/категорій
+    ItemAggregates itemAggregates;
+    for (const auto& sale : sales) {
+        for (const auto& item : sale.getItems()) {
+            itemAggregates.add(item);
+        }
+    }
+    
+    // 3. Топ товарів
+    result.topByRevenue = TopProductsCalculator::byRevenue(itemAggregates);
+    result.topByQuantity = TopProductsCalculator::byQuantity(itemAggregates);
+    if (result.topByRevenue.size() > TOP_PRODUCTS_LIMIT) result.topByRevenue.resize(TOP_PRODUCTS_LIMIT);
+    if (result.topByQuantity.size() > TOP_PRODUCTS_LIMIT) result.topByQuantity.resize(TOP_PRODUCTS_LIMIT);
+    
+    // 4. Частки по категоріях
+    result.categoryShares = CategorySharesCalculator::calculate(itemAggregates);
+    
+    // 5. Статистики
+    vector<double> amounts;
+    for (const auto& sale : sales) {
+        if (sale.getTotalAmount() > 0) amounts.push_back(sale.getTotalAmount());
+    }
+    result.statistics = referenceStatistics(amounts);
+    
+    // 6. ABC-аналіз
+    result.abcAnalysis = ABCAnalyzer::analyze(itemAggregates, itemAggregates.rankProducts(false));
+    
+    // 7. Загальна виручка
+    double total = 0.0;
+    for (const auto& sale : sales) {
+        total += sale.getTotalAmount();
+    }
+    result.totalRevenue = total;
+    result.totalSales = sales.size();
+    return result;
+}
+
+
+/**
+ * Генерація документа приблизно заданого розміру
+ * (рядки з екрануванням та кирилицею, як у реальних назвах товарів)
+ */
+static string generatePayload(size_t targetBytes) {
+    static const char* const products[] = {
+        "Ноутбук HP", "Холодильник", "Кавоварка \\\"Espresso\\\"", "Навушники", "Смартфон Samsung",
+    };
+    static const char* const categories[] = {"Електроніка", "Побутова техніка", "Аксесуари"};
+
+    string json;
+    json.reserve(targetBytes + 4096);
+    json += "{\"sales\": [\n";
+
+    unsigned seed = 42;
+    int saleId = 0;
+    while (json.size() < targetBytes) {
+        if (saleId > 0) json += ",\n";
+        ++saleId;
+        int day = saleId % 28 + 1;
+        json += "{\"id\": " + to_string(saleId) + ", \"date\": \"2026-02-";
+        json += (day < 10 ? "0" : "") + to_string(day);
+        json += "\", \"total_amount\": 1234.50, \"items\": [";
+        for (int i = 0; i < 3; ++i) {
+            seed = seed * 1103515245 + 12345;
+            int product = (seed >> 16) % 5;
+            if (i > 0) json += ", ";
+            json += "{\"product_id\": " + to_string(product + 1);
+            json += ", \"product_name\": \"" + string(products[product]) + "\"";
+            json += ", \"category_id\": " + to_string(product % 3 + 1);
+            json += ", \"category_name\": \"" + string(categories[product % 3]) + "\"";
+            json += ", \"quantity\": 2, \"price\": 205.75, \"subtotal\": 411.50}";
+        }
+        json += "]}";
+    }
+    json += "\n]}";
+    return json;
+}
+
+/**
+ * Синтетичні продажі: ~3 позиції на продаж, 5000 товарів у 50 категоріях, 3 роки
+ */
+static vector<Sale> generateSales(size_t itemsCount) {
+    const int productsCount = 5000;
+    const int categoriesCount = 50;
+    vector<string> productNames, categoryNames;
+    for (int i = 0; i < productsCount; ++i) productNames.push_back("Товар " + to_string(i + 1));
+    for (int i = 0; i < categoriesCount; ++i) categoryNames.push_back("Категорія " + to_string(i + 1));
+
+    vector<Sale> sales;
+    sales.reserve(itemsCount / 3 + 1);
+    unsigned seed = 42;
+    auto next = [&seed]() { seed = seed * 1103515245 + 12345; return seed >> 8; };
+
+    size_t produced = 0;
+    int saleId = 0;
+    char date[32];
+    while (produced < itemsCount) {
+        ++saleId;
+        int dayIndex = static_cast<int>(static_cast<long long>(saleId) * 365 * 3 / (itemsCount / 3 + 1));
+        snprintf(date, sizeof(date), "%04d-%02d-%02d", 2024 + dayIndex / 365, dayIndex % 365 / 31 % 12 + 1, dayIndex % 28 + 1);
+
+        Sale sale(saleId, date, 0.0);
+        double total = 0.0;
+        for (int i = 0; i < 3 && produced < itemsCount; ++i, ++produced) {
+            int product = next() % productsCount;
+            int category = product % categoriesCount;
+            int quantity = next() % 5 + 1;
+            double price = (next() % 100000) / 100.0 + 1.0;
+            total += price * quantity;
+            sale.addItem(SaleItem(product + 1, productNames[product], category + 1, categoryNames[category],
+                                  quantity, price, price * quantity, date));
+        }
+        sale.setTotalAmount(total);
+        sales.push_back(std::move(sale));
+    }
+    return sales;
+}
+
+/**
+ * Параметри синтетичного набору (однакові параметри - однакові дані)
+ */
+struct SyntheticConfig {
+    int days = 365;
+    int salesPerDay = 100;
+    int itemsPerSale = 3;
+    int skus = 1000;
+    int categories = 20;
+    unsigned seed = 42;
+    int repeat = 3;
+};
+
+/**
+ * Дата YYYY-MM-DD через dayIndex днів від 2024-01-01 (civil from days)
+ */
+static string syntheticDate(int dayIndex) {
+    long long z = 19723 + dayIndex + 719468;  // 2024-01-01 = 19723 днів від 1970-01-01
+    long long era = z / 146097;
+    long long doe = z - era * 146097;
+    long long yoe = (doe - doe / 1460 + doe / 36524 - doe / 146096) / 365;
+    long long doy = doe - (365 * yoe + yoe / 4 - yoe / 100);
+    long long mp = (5 * doy + 2) / 153;
+    int day = static_cast<int>(doy - (153 * mp + 2) / 5 + 1);
+    int month = static_cast<int>(mp < 10 ? mp + 3 : mp - 9);
+    int year = static_cast<int>(yoe + era * 400 + (month <= 2));
+    char date[32];
+    snprintf(date, sizeof(date), "%04d-%02d-%02d", year, month, day);
+    return date;
+}
+
+static vector<Sale> generateDataset(const SyntheticConfig& config) {
+    vector<string> productNames, categoryNames;
+    vector<double> prices;
+    unsigned seed = config.seed;
+    auto next = [&seed]() { seed = seed * 1103515245 + 12345; return seed >> 8; };
+    for (int i = 0; i < config.skus; ++i) {
+        productNames.push_back("Товар " + to_string(i + 1));
+        prices.push_back((next() % 100000) / 100.0 + 1.0);
+    }
+    for (int i = 0; i < config.categories; ++i) {
+        categoryNames.push_back("Категорія " + to_string(i + 1));
+    }
+
+    vector<Sale> sales;
+    sales.reserve(static_cast<size_t>(config.days) * config.salesPerDay);
+    int saleId = 0;
+    for (int day = 0; day < config.days; ++day) {
+        string date = syntheticDate(day);
+        for (int i = 0; i < config.salesPerDay; ++i) {
+            Sale sale(++saleId, date, 0.0);
+            long long totalCents = 0;
+            for (int j = 0; j < config.itemsPerSale; ++j) {
+                int product = next() % config.skus;
+                int category = product % config.categories;
+                int quantity = next() % 5 + 1;
+                long long subtotalCents = llround(prices[product] * 100.0) * quantity;
+                totalCents += subtotalCents;
+                sale.addItem(SaleItem(product + 1, productNames[product], category + 1, categoryNames[category],
+                                      quantity, prices[product], subtotalCents / 100.0, date));
+            }
+            sale.setTotalAmount(totalCents / 100.0);
+            sales.push_back(std::move(sale));
+        }
+    }
+    return sales;
+}
+
+/**
+ * Документ {"sales": [...]} для JSON парсера
+ */
+static string toJSONDocument(const vector<Sale>& sales) {
+    JSONWriter writer(sales.size() * 400);
+    writer.beginObject(1);
+    writer.key("sales");
+    writer.beginArray(sales.size());
+    for (const auto& sale : sales) {
+        writer.beginObject(4);
+        writer.key("id");
+        writer.value(static_cast<long long>(sale.getId()));
+        writer.key("date");
+        writer.value(sale.getDate());
+        writer.key("total_amount");
+        writer.money(sale.getTotalAmount());
+        writer.key("items");
+        writer.beginArray(sale.getItems().size());
+        for (const auto& item : sale.getItems()) {
+            writer.beginObject(7);
+            writer.key("product_id");
+            writer.value(static_cast<long long>(item.getProductId()));
+            writer.key("product_name");
+            writer.value(item.getProductName());
+            writer.key("category_id");
+            writer.value(static_cast<long long>(item.getCategoryId()));
+            writer.key("category_name");
+            writer.value(item.getCategoryName());
+            writer.key("quantity");
+            writer.value(static_cast<long long>(item.getQuantity()));
+            writer.key("price");
+            writer.money(item.getPrice());
+            writer.key("subtotal");
+            writer.money(item.getSubtotal());
+            writer.endObject();
+        }
+        writer.endArray();
+        writer.endObject();
+    }
+    writer.endArray();
+    writer.endObject();
+    return writer.take();
+}
+
+/**
+ * Колонковий потік #ACOL 1 (як store/analytics/stream.py, позиції - фактичні)
+ */
+static string toColumnarStream(const vector<Sale>& sales) {
+    map<int, string> products, categories;
+    for (const auto& sale : sales) {
+        for (const auto& item : sale.getItems()) {
+            products.emplace(item.getProductId(), item.getProductName());
+            categories.emplace(item.getCategoryId(), item.getCategoryName());
+        }
+    }
+
+    string stream = string(COLUMNAR_HEADER) + "\n";
+    char amount[64];
+    auto money = [&amount](double value) {
+        return string(amount, to_chars(amount, amount + sizeof(amount), value, chars_format::fixed, 2).ptr);
+    };
+    for (const auto& product : products) stream += "P\t" + to_string(product.first) + "\t" + product.second + "\n";
+    for (const auto& category : categories) stream += "C\t" + to_string(category.first) + "\t" + category.second + "\n";
+    for (const auto& sale : sales) {
+        stream += "S\t" + to_string(sale.getId()) + "\t" + sale.getDate() + "\t" + money(sale.getTotalAmount()) + "\n";
+        for (const auto& item : sale.getItems()) {
+            stream += "I\t" + to_string(sale.getId()) + "\t" + to_string(item.getProductId()) + "\t"
+                    + to_string(item.getCategoryId()) + "\t" + to_string(item.getQuantity()) + "\t"
+                    + money(item.getPrice()) + "\t" + money(item.getSubtotal()) + "\n";
+        }
+    }
+    return stream;
+}
+
+static int benchPhases(const SyntheticConfig& config) {
+    vector<Sale> dataset = generateDataset(config);
+    size_t itemsCount = 0;
+    for (const auto& sale : dataset) itemsCount += sale.getItems().size();
+    string document = toJSONDocument(dataset);
+    string stream = toColumnarStream(dataset);
+
+    // Найкращий з config.repeat запусків, мс
+    auto timeIt = [&config](auto&& phase) {
+        double best = 1e18;
+        for (int run = 0; run < max(1, config.repeat); ++run) {
+            auto started = chrono::steady_clock::now();
+            phase();
+            best = min(best, chrono::duration<double, milli>(chrono::steady_clock::now() - started).count());
+        }
+        return best;
+    };
+
+    size_t salesCount = dataset.size();
+    bool parsed = true;
+    double jsonParse = timeIt([&]() {
+        JSONParser parser(document);
+        parsed = parsed && parser.parseSales().size() == salesCount;
+    });
+    double columnarParse = timeIt([&]() {
+        istringstream input(stream);
+        string header;
+        getline(input, header);
+        vector<Sale> sales;
+        ColumnarStreamReader reader;
+        parsed = parsed && reader.read(input, sales) && sales.size() == salesCount;
+    });
+    if (!parsed) {
+        cerr << "Розібрано не всі продажі синтетичного набору" << endl;
+        return 1;
+    }
+
+    AnalyticsEngine engine(std::move(dataset));
+    AnalyticsResult result;
+    double aggregate = timeIt([&]() { result = engine.compute(); });
+    size_t jsonBytes = 0, msgpackBytes = 0;
+    double outputJson = timeIt([&]() { jsonBytes = AnalyticsEngine::serialize(result, OUTPUT_JSON).size(); });
+    double outputMsgpack = timeIt([&]() { msgpackBytes = AnalyticsEngine::serialize(result, OUTPUT_MSGPACK).size(); });
+
+    JSONWriter writer;
+    writer.beginObject(5);
+    writer.key("config");
+    writer.beginObject(7);
+    writer.key("days");
+    writer.value(static_cast<long long>(config.days));
+    writer.key("sales_per_day");
+    writer.value(static_cast<long long>(config.salesPerDay));
+    writer.key("items_per_sale");
+    writer.value(static_cast<long long>(config.itemsPerSale));
+    writer.key("skus");
+    writer.value(static_cast<long long>(config.skus));
+    writer.key("categories");
+    writer.value(static_cast<long long>(config.categories));
+    writer.key("seed");
+    writer.value(static_cast<long long>(config.seed));
+    writer.key("repeat");
+    writer.value(static_cast<long long>(config.repeat));
+    writer.endObject();
+    writer.key("dataset");
+    writer.beginObject(4);
+    writer.key("sales");
+    writer.value(static_cast<long long>(salesCount));
+    writer.key("items");
+    writer.value(static_cast<long long>(itemsCount));
+    writer.key("json_bytes");
+    writer.value(static_cast<long long>(document.size()));
+    writer.key("stream_bytes");
+    writer.value(static_cast<long long>(stream.size()));
+    writer.endObject();
+    writer.key("phases_ms");
+    writer.beginObject(5);
+    writer.key("parse_json");
+    writer.money(jsonParse);
+    writer.key("parse_columnar");
+    writer.money(columnarParse);
+    writer.key("aggregate");
+    writer.money(aggregate);
+    writer.key("output_json");
+    writer.money(outputJson);
+    writer.key("output_msgpack");
+    writer.money(outputMsgpack);
+    writer.endObject();
+    writer.key("output_bytes");
+    writer.beginObject(2);
+    writer.key("json");
+    writer.value(static_cast<long long>(jsonBytes));
+    writer.key("msgpack");
+    writer.value(static_cast<long long>(msgpackBytes));
+    writer.endObject();
+    writer.key("checksum");
+    writer.money(result.totalRevenue);
+    writer.endObject();
+
+    cout << writer.take() << endl;
+    return 0;
+}
+
+static int benchParse(double maxMegabytes) {
+    cout << "size_mb,sales,seconds,mb_per_s" << endl;
+    for (double megabytes = maxMegabytes / 8; megabytes <= maxMegabytes + 1e-9; megabytes *= 2) {
+        string payload = generatePayload(static_cast<size_t>(megabytes * 1024 * 1024));
+
+        // Найкращий з трьох запусків
+        double best = 1e9;
+        size_t salesCount = 0;
+        for (int run = 0; run < 3; ++run) {
+            auto started = chrono::steady_clock::now();
+            JSONParser parser(payload);
+            vector<Sale> sales = parser.parseSales();
+            double elapsed = chrono::duration<double>(chrono::steady_clock::now() - started).count();
+            best = min(best, elapsed);
+            salesCount = sales.size();
+        }
+
+        double size = payload.size() / (1024.0 * 1024.0);
+        cout << fixed << setprecision(1) << size << "," << salesCount << ","
+             << setprecision(3) << best << "," << setprecision(1) << size / best << endl;
+    }
+    return 0;
+}
+
+static int benchKernel(size_t itemsCount) {
+    vector<Sale> sales = generateSales(itemsCount);
+
+    auto timeIt = [](auto&& compute, AnalyticsResult& result) {
+        double best = 1e9;
+        for (int run = 0; run < 3; ++run) {
+            auto started = chrono::steady_clock::now();
+            result = compute();
+            best = min(best, chrono::duration<double>(chrono::steady_clock::now() - started).count());
+        }
+        return best;
+    };
+
+    AnalyticsResult reference, fused;
+    double referenceSeconds = timeIt([&]() { return computeReference(sales); }, reference);
+    double fusedSeconds = timeIt([&]() { return FusedAggregator::run(sales); }, fused);
+
+    ostringstream referenceJson, fusedJson;
+    AnalyticsEngine::output(reference, referenceJson);
+    AnalyticsEngine::output(fused, fusedJson);
+    bool identical = referenceJson.str() == fusedJson.str();
+
+    cout << "kernel,items,seconds,items_per_s" << endl;
+    cout << "multi_pass," << itemsCount << "," << fixed << setprecision(3) << referenceSeconds << ","
+         << setprecision(0) << itemsCount / referenceSeconds << endl;
+    cout << "fused," << itemsCount << "," << setprecision(3) << fusedSeconds << ","
+         << setprecision(0) << itemsCount / fusedSeconds << endl;
+    cout << "speedup " << setprecision(2) << referenceSeconds / fusedSeconds
+         << "x, output " << (identical ? "identical" : "DIFFERS") << endl;
+    return identical ? 0 : 1;
+}
+
+static int benchThreads(size_t itemsCount) {
+    AnalyticsEngine engine(generateSales(itemsCount));
+    string expected;
+    double baseline = 0.0;
+    bool identical = true;
+
+    cout << "threads,items,seconds,speedup,output" << endl;
+    for (unsigned threads : {1u, 2u, 4u, 8u, 16u}) {
+        engine.setThreads(threads);
+        AnalyticsResult result;
+        double best = 1e9;
+        for (int run = 0; run < 3; ++run) {
+            auto started = chrono::steady_clock::now();
+            result = engine.compute();
+            best = min(best, chrono::duration<double>(chrono::steady_clock::now() - started).count());
+        }
+
+        ostringstream json;
+        AnalyticsEngine::output(result, json);
+        if (threads == 1) {
+            expected = json.str();
+            baseline = best;
+        }
+        bool same = json.str() == expected;
+        identical = identical && same;
+        cout << threads << "," << itemsCount << "," << fixed << setprecision(3) << best << ","
+             << setprecision(2) << baseline / best << "," << (same ? "identical" : "DIFFERS") << endl;
+    }
+    cout << "hardware threads: " << thread::hardware_concurrency() << endl;
+    return identical ? 0 : 1;
+}
+
+static string legacyEscape(const string& str) {
+    string result;
+    for (char c : str) {
+        if (c == '"') result += "\\\"";
+        else if (c == '\\') result += "\\\\";
+        else if (c == '\n') result += "\\n";
+        else if (c == '\r') result += "\\r";
+        else if (c == '\t') result += "\\t";
+        else result += c;
+    }
+    return result;
+}
+
+static void legacyPeriods(ostream& out, const char* name, const char* key,
+                          const vector<pair<string, double>>& periods) {
+    out << "\"" << name << "\":[";
+    bool first = true;
+    for (const auto& p : periods) {
+        if (!first) out << ",";
+        out << "{\"" << key << "\":\"" << p.first << "\",\"revenue\":" 
+            << fixed << setprecision(2) << p.second << "}";
+        first = false;
+    }
+    out << "]";
+}
+
+
+/**
+ * Попередній вивід через iostream (fixed << setprecision(2) на кожне число) - база для порівняння
+ */
+static void legacyOutput(const AnalyticsResult& result, ostream& out) {
+    out << "{";
+    
+    // Агрегація по днях/тижнях/місяцях
+    legacyPeriods(out, "daily_revenue", "date", result.dailyRevenue);
+    out << ",";
+    legacyPeriods(out, "weekly_revenue", "week", result.weeklyRevenue);
+    out << ",";
+    legacyPeriods(out, "monthly_revenue", "month", result.monthlyRevenue);
+    out << ",";
+    
+    // Топ товарів за виручкою
+    out << "\"top_products_by_revenue\":[";
+    bool first = true;
+    for (const auto& product : result.topByRevenue) {
+        if (!first) out << ",";
+        out << "{\"product_id\":" << product.getProductId()
+            << ",\"product_name\":\"" << legacyEscape(product.getName()) 
+            << "\",\"revenue\":" << fixed << setprecision(2) << product.getRevenue()
+            << ",\"quantity\":" << product.getQuantity() << "}";
+        first = false;
+    }
+    out << "],";
+    
+    // Топ товарів за кількістю
+    out << "\"top_products_by_quantity\":[";
+    first = true;
+    for (const auto& product : result.topByQuantity) {
+        if (!first) out << ",";
+        out << "{\"product_id\":" << product.getProductId()
+            << ",\"product_name\":\"" << legacyEscape(product.getName()) 
+            << "\",\"quantity\":" << product.getQuantity()
+            << ",\"revenue\":" << fixed << setprecision(2) << product.getRevenue() << "}";
+        first = false;
+    }
+    out << "],";
+    
+    // Частки по категоріях
+    out << "\"category_shares\":[";
+    first = true;
+    for (const auto& share : result.categoryShares) {
+        if (!first) out << ",";
+        out << "{\"category_id\":" << share.getCategoryId()
+            << ",\"category\":\"" << legacyEscape(share.getName()) 
+            << "\",\"share\":" << fixed << setprecision(2) << share.getShare() << "}";
+        first = false;
+    }
+    out << "],";
+    
+    // Статистики
+    const Statistics& stats = result.statistics;
+    out << "\"statistics\":{";
+    out << "\"total_revenue\":" << fixed << setprecision(2) << result.totalRevenue << ",";
+    out << "\"mean\":" << fixed << setprecision(2) << stats.getMean() << ",";
+    out << "\"median\":" << fixed << setprecision(2) << stats.getMedian() << ",";
+    out << "\"std_dev\":" << fixed << setprecision(2) << stats.getStdDev() << ",";
+    out << "\"min\":" << fixed << setprecision(2) << stats.getMin() << ",";
+    out << "\"max\":" << fixed << setprecision(2) << stats.getMax() << ",";
+    out << "\"total_sales\":" << result.totalSales;
+    out << "},";
+    
+    // ABC-аналіз
+    out << "\"abc_analysis\":[";
+    first = true;
+    for (const auto& abc : result.abcAnalysis) {
+        if (!first) out << ",";
+        out << "{\"product_id\":" << abc.getProductId()
+            << ",\"product_name\":\"" << legacyEscape(abc.getProductName()) 
+            << "\",\"revenue\":" << fixed << setprecision(2) << abc.getRevenue()
+            << ",\"cumulative_percent\":" << fixed << setprecision(2) << abc.getCumulativePercent()
+            << ",\"category\":\"" << abc.getCategory() << "\"}";
+        first = false;
+    }
+    out << "]";
+    
+    out << "}";
+}
+
+static int benchOutput(size_t productsCount) {
+    // Результат з ABC-аналізом на кожен товар (5000 продажів на товар не потрібні -
+    // вимірюється тільки вивід)
+    AnalyticsResult result;
+    unsigned seed = 7;
+    auto next = [&seed]() { seed = seed * 1103515245 + 12345; return seed >> 8; };
+    double cumulative = 0.0;
+    for (size_t i = 0; i < productsCount; ++i) {
+        double revenue = (next() % 10000000) / 100.0;
+        cumulative += 100.0 / productsCount;
+        string name = "Товар \"" + to_string(i + 1) + "\"";
+        result.abcAnalysis.emplace_back(static_cast<int>(i + 1), name, revenue, cumulative,
+                                        cumulative <= 80.0 ? 'A' : (cumulative <= 95.0 ? 'B' : 'C'));
+        if (i < TOP_PRODUCTS_LIMIT) {
+            result.topByRevenue.emplace_back(static_cast<int>(i + 1), name, revenue, static_cast<int>(next() % 100));
+            result.topByQuantity.emplace_back(static_cast<int>(i + 1), name, revenue, static_cast<int>(next() % 100));
+        }
+    }
+    for (int day = 0; day < 365 * 3; ++day) {
+        result.dailyRevenue.emplace_back(to_string(2024 + day / 365) + "-01-01", (next() % 10000000) / 100.0);
+    }
+    result.totalRevenue = 123456789.25;
+    result.totalSales = productsCount;
+
+    auto timeIt = [](auto&& write) {
+        double best = 1e9;
+        size_t size = 0;
+        for (int run = 0; run < 5; ++run) {
+            auto started = chrono::steady_clock::now();
+            size = write();
+            best = min(best, chrono::duration<double>(chrono::steady_clock::now() - started).count());
+        }
+        return make_pair(best, size);
+    };
+
+    string legacyJson;
+    auto legacy = timeIt([&]() {
+        ostringstream out;
+        legacyOutput(result, out);
+        legacyJson = out.str();
+        return legacyJson.size();
+    });
+    string json;
+    auto buffered = timeIt([&]() {
+        json = AnalyticsEngine::serialize(result, OUTPUT_JSON);
+        return json.size();
+    });
+    auto packed = timeIt([&]() { return AnalyticsEngine::serialize(result, OUTPUT_MSGPACK).size(); });
+
+    cout << "writer,products,seconds,bytes" << endl;
+    cout << "iostream," << productsCount << "," << fixed << setprecision(4) << legacy.first << "," << legacy.second << endl;
+    cout << "json_buffer," << productsCount << "," << buffered.first << "," << buffered.second << endl;
+    cout << "msgpack," << productsCount << "," << packed.first << "," << packed.second << endl;
+    bool identical = legacyJson == json;
+    cout << "json speedup " << setprecision(2) << legacy.first / buffered.first
+         << "x, output " << (identical ? "identical" : "DIFFERS") << endl;
+    return identical ? 0 : 1;
+}
+
+int main(int argc, char** argv) {
+    string mode = argc > 1 ? argv[1] : "parse";
+    if (mode == "parse") {
+        return benchParse(argc > 2 ? atof(argv[2]) : 100.0);
+    }
+    if (mode == "kernel") {
+        return benchKernel(argc > 2 ? static_cast<size_t>(atof(argv[2])) : 10000000);
+    }
+    if (mode == "threads") {
+        return benchThreads(argc > 2 ? static_cast<size_t>(atof(argv[2])) : 10000000);
+    }
+    if (mode == "phases") {
+        SyntheticConfig config;
+        for (int i = 2; i + 1 < argc; i += 2) {
+            string option = argv[i];
+            int value = atoi(argv[i + 1]);
+            if (option == "--days") config.days = max(1, value);
+            else if (option == "--sales-per-day") config.salesPerDay = max(1, value);
+            else if (option == "--items-per-sale") config.itemsPerSale = max(1, value);
+            else if (option == "--skus") config.skus = max(1, value);
+            else if (option == "--categories") config.categories = max(1, value);
+            else if (option == "--seed") config.seed = static_cast<unsigned>(value);
+            else if (option == "--repeat") config.repeat = max(1, value);
+            else {
+                cerr << "Невідомий параметр " << option << endl;
+                return 2;
+            }
+        }
+        return benchPhases(config);
+    }
+    if (mode == "output") {
+        return benchOutput(argc > 2 ? static_cast<size_t>(atof(argv[2])) : 200000);
+    }
+    cerr << "Використання: bench parse [МБ] | bench kernel [позицій] | bench threads [позицій] | bench output [товарів]"
+         << " | bench phases [--days N ...]" << endl;
+    return 2;
+}
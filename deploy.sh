@@ -46,6 +46,6 @@ echo ""
 echo "Для запуску сервера:"
 echo "  python manage.py runserver"
 echo ""
-echo "Або для production:"
-echo "  gunicorn inventory_system.wsgi:application"
+echo "Або для production (ASGI - асинхронне API аналітики не блокує воркер):"
+echo "  gunicorn -k uvicorn.workers.UvicornWorker inventory_system.asgi:application"
 
@@ -69,6 +69,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'store.context_processors.roles',
             ],
         },
     },
@@ -84,10 +85,62 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Тестова БД у файлі: паралельні checkout у тестах чекають блокування (busy timeout),
+        # а спільна in-memory БД відповідає на них "database table is locked"
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+
+# Кеш результатів аналітики: locmem (окремий на кожен процес) за замовчуванням;
+# для кількох воркерів gunicorn задайте ANALYTICS_CACHE_DIR - спільний файловий кеш
+# (лічильники влучань у /api/analytics/cache/ тоді рахуються окремо в кожному процесі)
+ANALYTICS_CACHE_DIR = os.environ.get('ANALYTICS_CACHE_DIR', '')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'analytics': {
+        'BACKEND': (
+            'django.core.cache.backends.filebased.FileBasedCache' if ANALYTICS_CACHE_DIR
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': ANALYTICS_CACHE_DIR or 'analytics',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+
+# Сокет демона аналітики (cpp_analytics/analytics --daemon, manage.py run_analytics_daemon);
+# якщо демон не запущено, аналітика обчислюється одноразово. Порожнє значення вимикає демон
+ANALYTICS_DAEMON_SOCKET = os.environ.get(
+    'ANALYTICS_DAEMON_SOCKET', str(BASE_DIR / 'cpp_analytics' / 'analytics.sock')
+)
+
+# Асинхронний API аналітики (store/analytics/runner.py): обчислень одночасно на процес
+# та запитів у черзі; понад чергу - застарілий результат з кешу або 503
+ANALYTICS_MAX_CONCURRENT = int(os.environ.get('ANALYTICS_MAX_CONCURRENT', '2'))
+ANALYTICS_MAX_QUEUE = int(os.environ.get('ANALYTICS_MAX_QUEUE', '8'))
+
+# Пул прогрітих воркерів cpp_analytics/analytics --worker (store/analytics/pool.py), якщо немає
+# libanalytics.so: воркерів на процес (0 - запуск процесу на кожен запит) та запитів до заміни воркера
+ANALYTICS_POOL_SIZE = int(os.environ.get('ANALYTICS_POOL_SIZE', '2'))
+ANALYTICS_POOL_MAX_REQUESTS = int(os.environ.get('ANALYTICS_POOL_MAX_REQUESTS', '1000'))
+
+# Знімки залишків (StockSnapshot) для звітів "на дату": 'day' - на кінець кожного дня,
+# 'month' - на кінець місяця. Пропущений знімок дописується при першому продажі нового періоду
+STOCK_SNAPSHOT_PERIOD = os.environ.get('STOCK_SNAPSHOT_PERIOD', 'day')
+
+# Кеш ролей користувача (store/roles.py) між запитами в кеші 'default', секунд; 0 - тільки в межах
+# запиту. Зміна груп скидає запис; для кількох воркерів потрібен спільний кеш (не locmem)
+ROLE_CACHE_TIMEOUT = int(os.environ.get('ROLE_CACHE_TIMEOUT', '0'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
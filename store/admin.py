@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Category, Product, Stock, Sale, SaleItem
+from .models import (
+    Category, Product, Stock, ProductStockBalance, Sale, SaleItem, DailyProductSales, StockSnapshot,
+    StockArchive,
+)
 
 
 @admin.register(Category)
@@ -13,6 +16,14 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ['name', 'category', 'price', 'barcode', 'is_active', 'current_stock']
     list_filter = ['category', 'is_active']
     search_fields = ['name', 'barcode']
+    list_select_related = ['category']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_stock()
+
+    @admin.display(description='Залишок', ordering='stock_quantity')
+    def current_stock(self, obj):
+        return obj.stock_quantity
 
 
 @admin.register(Stock)
@@ -22,6 +33,44 @@ class StockAdmin(admin.ModelAdmin):
     search_fields = ['product__name']
 
 
+@admin.register(ProductStockBalance)
+class ProductStockBalanceAdmin(admin.ModelAdmin):
+    list_display = ['product', 'quantity', 'updated_at']
+    search_fields = ['product__name']
+    list_select_related = ['product']
+    readonly_fields = ['product', 'quantity', 'updated_at']
+
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(admin.ModelAdmin):
+    list_display = ['date', 'product', 'category', 'quantity', 'revenue', 'sale_count']
+    list_filter = ['date', 'category']
+    search_fields = ['product__name']
+    list_select_related = ['product', 'category']
+    readonly_fields = ['date', 'product', 'category', 'quantity', 'revenue', 'sale_count']
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['date', 'product', 'quantity', 'created_at']
+    list_filter = ['date']
+    search_fields = ['product__name']
+    list_select_related = ['product']
+    readonly_fields = ['date', 'product', 'quantity', 'created_at']
+
+
+@admin.register(StockArchive)
+class StockArchiveAdmin(admin.ModelAdmin):
+    list_display = ['product', 'quantity', 'transaction_type', 'created_at', 'archived_before']
+    list_filter = ['transaction_type', 'archived_before']
+    search_fields = ['product__name']
+    list_select_related = ['product']
+    readonly_fields = [
+        'original_id', 'product', 'quantity', 'transaction_type', 'notes',
+        'created_by', 'created_at', 'archived_before', 'archived_at',
+    ]
+
+
 @admin.register(Sale)
 class SaleAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'total_amount', 'created_at']
@@ -33,3 +82,12 @@ class SaleAdmin(admin.ModelAdmin):
 class SaleItemAdmin(admin.ModelAdmin):
     list_display = ['sale', 'product', 'quantity', 'price', 'subtotal']
     list_filter = ['sale__created_at']
+
+    def save_model(self, request, obj, form, change):
+        # Ручне редагування позиції - перераховуємо суму продажу
+        obj.save(update_sale_total=True)
+
+    def delete_model(self, request, obj):
+        sale = obj.sale
+        super().delete_model(request, obj)
+        Sale.objects.filter(pk=sale.pk).update(total_amount=sale.calculate_total())
@@ -0,0 +1,6 @@
+"""
+Пакет аналітики продажів: підготовка даних для C++ модуля та його виклик
+"""
+from .columns import SalesColumns, fetch_sales_columns
+
+__all__ = ['SalesColumns', 'fetch_sales_columns']
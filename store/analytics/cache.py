@@ -0,0 +1,200 @@
+"""
+Кеш результатів аналітики за діапазоном дат.
+
+Ключ запису складається з діапазону дат, версії бекенду (час зміни зібраного
+C++ модуля) та "поколінь" кожного дня діапазону. Запис Sale/SaleItem змінює
+покоління свого дня, тому інвалідуються тільки ті діапазони, що містять
+змінений день. Покоління беруться тільки для днів від першого до останнього
+продажу діапазону (межі входять у ключ), тому кількість ключів поколінь не
+залежить від ширини запитаного діапазону. Закриті (минулі) діапазони зберігаються без терміну дії,
+діапазони з поточним днем - з коротким TTL як страховка від записів в обхід
+сигналів (queryset.update, bulk_create).
+
+Останній обчислений результат діапазону також зберігається окремо від
+поколінь - його віддає асинхронний view, коли черга C++ модуля заповнена.
+"""
+from datetime import timedelta
+import hashlib
+import os
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from . import native, numpy_backend
+from ..models import Sale
+from ..utils import date_range_filter
+
+CACHE_ALIAS = 'analytics'
+
+# Збільшувати при зміні структури результату
+CACHE_SCHEMA = 1
+
+# TTL для діапазонів, що включають сьогоднішній день
+OPEN_RANGE_TIMEOUT = 300
+
+HITS_KEY = 'analytics:stats:hits'
+MISSES_KEY = 'analytics:stats:misses'
+
+# Лічильники влучань живуть у кеші тільки там, де incr атомарний (LocMemCache -
+# у межах процесу, Redis - між процесами). FileBasedCache робить incr читанням
+# і перезаписом файлу, паралельні процеси губили б інкременти - з ним лічильники
+# рахуються в пам'яті кожного процесу
+_ATOMIC_INCR_BACKENDS = (LocMemCache, RedisCache)
+_process_counters = {HITS_KEY: 0, MISSES_KEY: 0}
+_process_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def backend_version():
+    """Версія бекенду: змінюється після перезбирання C++ модуля"""
+    parts = [str(CACHE_SCHEMA)]
+    cpp_dir = os.path.join(settings.BASE_DIR, 'cpp_analytics')
+    for path in (native.library_path(), os.path.join(cpp_dir, 'analytics')):
+        try:
+            parts.append(str(os.stat(path).st_mtime_ns))
+        except OSError:
+            parts.append('-')
+    parts.append('np' if numpy_backend.is_available() else '-')
+    return ':'.join(parts)
+
+
+def _day_key(day):
+    return f'analytics:day:{day.isoformat()}'
+
+
+def _sales_span(date_from, date_to):
+    """Перший і останній день діапазону з продажами (None, None - продажів немає)"""
+    span = Sale.objects.filter(
+        **date_range_filter('created_at', date_from, date_to)
+    ).order_by().aggregate(first=Min('created_at'), last=Max('created_at'))
+    if span['first'] is None:
+        return None, None
+    return timezone.localdate(span['first']), timezone.localdate(span['last'])
+
+
+def _day_generations(first_day, last_day):
+    """Покоління кожного дня first_day..last_day (відсутні створюються заново)"""
+    if first_day is None:
+        return []
+    cache = get_cache()
+    days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+    keys = [_day_key(day) for day in days]
+    known = cache.get_many(keys)
+
+    generations = []
+    for key in keys:
+        token = known.get(key)
+        if token is None:
+            # Покоління могло бути витіснене - новий токен робить старі записи недосяжними
+            cache.add(key, uuid.uuid4().hex, None)
+            token = cache.get(key)
+        generations.append(token or '')
+    return generations
+
+
+def cache_key(date_from, date_to):
+    digest = hashlib.sha1()
+    digest.update(backend_version().encode())
+    # Дні без продажів не мають покоління: продаж поза поточними межами змінює межі,
+    # а видалення крайнього продажу - звужує їх, тому межі входять у ключ
+    first_day, last_day = _sales_span(date_from, date_to)
+    digest.update(f'{first_day}:{last_day}'.encode())
+    for token in _day_generations(first_day, last_day):
+        digest.update(token.encode())
+    return f'analytics:result:{date_from.isoformat()}:{date_to.isoformat()}:{digest.hexdigest()}'
+
+
+def _stale_key(date_from, date_to):
+    return f'analytics:stale:{date_from.isoformat()}:{date_to.isoformat()}'
+
+
+def _shared_counters():
+    return isinstance(get_cache(), _ATOMIC_INCR_BACKENDS)
+
+
+def _count(key):
+    if not _shared_counters():
+        with _process_lock:
+            _process_counters[key] += 1
+        return
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def lookup(date_from, date_to):
+    """(ключ, результат або None); ключ передається у store() після обчислення"""
+    key = cache_key(date_from, date_to)
+    result = get_cache().get(key)
+    _count(HITS_KEY if result is not None else MISSES_KEY)
+    return key, result
+
+
+def store(key, date_from, date_to, result):
+    """Збереження результату (помилки не кешуються) та його копії для stale()"""
+    if 'error' in result:
+        return
+    cache = get_cache()
+    timeout = None if date_to < timezone.localdate() else OPEN_RANGE_TIMEOUT
+    cache.set(key, result, timeout)
+    cache.set(_stale_key(date_from, date_to), result, None)
+
+
+def stale(date_from, date_to):
+    """Останній обчислений результат діапазону, навіть якщо дані вже змінилися"""
+    return get_cache().get(_stale_key(date_from, date_to))
+
+
+def get_or_compute(date_from, date_to, compute):
+    """Результат з кешу або обчислення через compute() з подальшим збереженням"""
+    if date_from > date_to:
+        return compute()
+
+    key, result = lookup(date_from, date_to)
+    if result is not None:
+        return result
+
+    result = compute()
+    store(key, date_from, date_to, result)
+    return result
+
+
+def invalidate_day(day):
+    """Нове покоління дня - всі кешовані діапазони з цим днем стають недосяжними"""
+    get_cache().set(_day_key(day), uuid.uuid4().hex, None)
+
+
+def stats():
+    """
+    Влучання та промахи кешу. counters: 'cache' - спільні лічильники в кеші,
+    'process' - тільки цього процесу (файловий кеш)
+    """
+    if _shared_counters():
+        counters = get_cache().get_many([HITS_KEY, MISSES_KEY])
+        scope = 'cache'
+    else:
+        with _process_lock:
+            counters = dict(_process_counters)
+        scope = 'process'
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0.0,
+        'counters': scope,
+        'backend_version': backend_version(),
+    }
@@ -0,0 +1,107 @@
+"""
+Колонкове представлення продажів для аналітичного модуля
+"""
+from django.db.models.functions import TruncDate
+
+from ..models import Sale, DailyProductSales
+from ..utils import date_range_filter
+
+
+class SalesColumns:
+    """
+    Продажі та позиції у вигляді паралельних масивів (без екземплярів моделей).
+    Позиція посилається на свій продаж індексом item_sale_index.
+    """
+
+    def __init__(self):
+        self.sale_ids = []
+        self.sale_dates = []
+        self.sale_totals = []
+
+        self.item_sale_index = []
+        self.item_product_ids = []
+        self.item_product_names = []
+        self.item_category_ids = []
+        self.item_category_names = []
+        self.item_quantities = []
+        self.item_prices = []
+        self.item_subtotals = []
+
+    @property
+    def sales_count(self):
+        return len(self.sale_ids)
+
+    @property
+    def items_count(self):
+        return len(self.item_sale_index)
+
+    def to_payload(self):
+        """Вхідний JSON документ для C++ модуля у форматі {'sales': [...]}"""
+        sales = [
+            {
+                'id': sale_id,
+                'date': date,
+                'total_amount': total,
+                'items': [],
+            }
+            for sale_id, date, total in zip(self.sale_ids, self.sale_dates, self.sale_totals)
+        ]
+        for i, sale_index in enumerate(self.item_sale_index):
+            sales[sale_index]['items'].append({
+                'product_id': self.item_product_ids[i],
+                'product_name': self.item_product_names[i],
+                'category_id': self.item_category_ids[i],
+                'category_name': self.item_category_names[i],
+                'quantity': self.item_quantities[i],
+                'price': self.item_prices[i],
+                'subtotal': self.item_subtotals[i],
+            })
+        return {'sales': sales}
+
+
+def fetch_sales_columns(date_from, date_to):
+    """
+    Вибірка продажів за період двома запитами values_list (без гідрації моделей).
+
+    Суми чеків беруться з Sale (потрібні для статистик і виручки по днях),
+    а позиції - з денних підсумків DailyProductSales: один рядок на товар
+    за день замість кожної позиції. Показники по товарах і категоріях не
+    залежать від того, до якого чека належить позиція, тому підсумок дня
+    прив'язується до першого продажу цього дня.
+    """
+    columns = SalesColumns()
+
+    sales = Sale.objects.filter(
+        **date_range_filter('created_at', date_from, date_to)
+    ).order_by('created_at', 'id').annotate(day=TruncDate('created_at'))
+
+    first_sale_of_day = {}
+    for sale_id, day, total in sales.values_list('id', 'day', 'total_amount'):
+        first_sale_of_day.setdefault(day, len(columns.sale_ids))
+        columns.sale_ids.append(sale_id)
+        columns.sale_dates.append(day.strftime('%Y-%m-%d'))
+        columns.sale_totals.append(float(total))
+
+    rollups = DailyProductSales.objects.filter(
+        date__gte=date_from,
+        date__lte=date_to
+    ).order_by('date', 'product_id').values_list(
+        'date', 'product_id', 'product__name',
+        'category_id', 'category__name',
+        'quantity', 'revenue',
+    )
+    for day, product_id, product_name, category_id, category_name, quantity, revenue in rollups:
+        # День без продажів у першому запиті (записаний між запитами) пропускаємо
+        index = first_sale_of_day.get(day)
+        if index is None or not quantity:
+            continue
+        columns.item_sale_index.append(index)
+        columns.item_product_ids.append(product_id)
+        columns.item_product_names.append(product_name)
+        columns.item_category_ids.append(category_id)
+        columns.item_category_names.append(category_name)
+        columns.item_quantities.append(quantity)
+        columns.item_prices.append(float(revenue / quantity))
+        columns.item_subtotals.append(float(revenue))
+
+    return columns
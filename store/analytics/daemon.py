@@ -0,0 +1,166 @@
+"""
+Клієнт демона аналітики (cpp_analytics/analytics --daemon <сокет>).
+
+Демон тримає продажі в пам'яті та відповідає на запити за будь-який період
+без читання БД і запуску процесу. Протокол - кадри з 4-байтною довжиною
+(big-endian) та текстовим тілом, перший рядок якого є командою
+(QUERY/LOAD/APPEND/RESET/PING, див. DaemonProtocol в analytics.cpp).
+
+Повний набір завантажується ліниво при першому запиті після старту демона
+або після RESET; нові продажі надсилаються дельтами після оформлення.
+Якщо демон не запущено, викликається DaemonUnavailable - view переходить
+до одноразового режиму (бібліотека/процес).
+"""
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+
+from django.conf import settings
+
+from . import stream
+
+logger = logging.getLogger(__name__)
+
+# Таймаут операцій з сокетом, с (повне завантаження історії - найдовша)
+SOCKET_TIMEOUT = 30
+
+# Кількість простоюючих з'єднань, що зберігаються на процес
+POOL_SIZE = 4
+
+_HEADER = struct.Struct('>I')
+
+_pool = []
+_pool_lock = threading.Lock()
+
+
+class DaemonUnavailable(Exception):
+    """Демон не запущено або з'єднання обірвалося"""
+
+
+def socket_path():
+    return getattr(settings, 'ANALYTICS_DAEMON_SOCKET', '')
+
+
+def is_configured():
+    path = socket_path()
+    return bool(path) and os.path.exists(path)
+
+
+def _connect():
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout(SOCKET_TIMEOUT)
+    try:
+        connection.connect(socket_path())
+    except OSError:
+        connection.close()
+        raise
+    return connection
+
+
+def _recv_exact(connection, size):
+    chunks = []
+    while size:
+        chunk = connection.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ConnectionError('Демон закрив з\'єднання')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _exchange(connection, body):
+    connection.sendall(_HEADER.pack(len(body)))
+    connection.sendall(body)
+    (length,) = _HEADER.unpack(_recv_exact(connection, _HEADER.size))
+    return _recv_exact(connection, length)
+
+
+def _acquire():
+    with _pool_lock:
+        if _pool:
+            return _pool.pop(), True
+    return _connect(), False
+
+
+def _release(connection):
+    with _pool_lock:
+        if len(_pool) < POOL_SIZE:
+            _pool.append(connection)
+            return
+    connection.close()
+
+
+def close_pool():
+    """Закрити простоюючі з'єднання (зміна сокета, завершення процесу)"""
+    with _pool_lock:
+        connections = _pool[:]
+        _pool.clear()
+    for connection in connections:
+        connection.close()
+
+
+def request(body):
+    """Один запит-відповідь через з'єднання з пулу; результат - dict"""
+    if not is_configured():
+        raise DaemonUnavailable('Сокет демона не знайдено')
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+
+    # З'єднання з пулу може бути закрите перезапуском демона - одна повторна спроба
+    for attempt in range(2):
+        try:
+            connection, pooled = _acquire()
+        except OSError as e:
+            raise DaemonUnavailable(str(e))
+        try:
+            response = _exchange(connection, body)
+        except OSError as e:
+            connection.close()
+            if pooled and attempt == 0:
+                continue
+            raise DaemonUnavailable(str(e))
+        _release(connection)
+        return json.loads(response)
+
+
+def load(epoch):
+    """Повний набір продажів (stream.iter_history_lines - частинами, без довгої транзакції)"""
+    lines = ''.join(stream.iter_history_lines())
+    result = request(f'LOAD {epoch}\n{lines}')
+    if 'error' in result:
+        raise DaemonUnavailable(result['error'])
+    return result.get('ok', False)
+
+
+def query(date_from, date_to):
+    """Аналітика за період з резидентних даних демона"""
+    command = f'QUERY {date_from.isoformat()} {date_to.isoformat()}'
+    result = request(command)
+    attempts = 0
+    # Дані ще не завантажено (старт демона або RESET); відхилене LOAD - нова епоха
+    while result.get('loaded') is False and attempts < 2:
+        load(result['epoch'])
+        attempts += 1
+        result = request(command)
+    if result.get('loaded') is False:
+        raise DaemonUnavailable('Не вдалося завантажити дані в демон')
+    return result
+
+
+def append_sales(sale_ids):
+    """Дельта нових продажів; демон ігнорує вже відомі id"""
+    try:
+        request('APPEND\n' + ''.join(stream.iter_sale_lines(sale_ids)))
+    except DaemonUnavailable as e:
+        logger.debug(f'Демон аналітики недоступний: {e}')
+
+
+def reset():
+    """Скидання даних демона після редагування або видалення продажів"""
+    try:
+        request('RESET')
+    except DaemonUnavailable as e:
+        logger.debug(f'Демон аналітики недоступний: {e}')
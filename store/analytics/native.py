@@ -0,0 +1,165 @@
+"""
+Виклик C++ модуля аналітики в межах процесу через ctypes.
+
+Бібліотека cpp_analytics/libanalytics.so збирається з того ж analytics.cpp
+(`make` у каталозі cpp_analytics) і приймає колонкові масиви напряму -
+без запуску процесу та без JSON на вході. Якщо встановлено msgpack,
+результат повертається у MessagePack (декодується швидше за json.loads).
+"""
+import ctypes
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+from . import sqlite_source
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+LIBRARY_NAME = 'libanalytics.so'
+
+# Формат результату бібліотеки (analytics_set_output_format)
+OUTPUT_MSGPACK = 1
+
+_library = None
+_msgpack_output = False
+_load_attempted = False
+_load_lock = threading.Lock()
+
+
+def library_path():
+    return os.path.join(settings.BASE_DIR, 'cpp_analytics', LIBRARY_NAME)
+
+
+def _configure(library):
+    """Опис сигнатур C API (див. analytics_run_columnar в analytics.cpp)"""
+    int_p = ctypes.POINTER(ctypes.c_int)
+    double_p = ctypes.POINTER(ctypes.c_double)
+    str_p = ctypes.POINTER(ctypes.c_char_p)
+
+    library.analytics_run_columnar.argtypes = [
+        ctypes.c_int, int_p, str_p, double_p,
+        ctypes.c_int, int_p,
+        int_p, str_p,
+        int_p, str_p,
+        int_p, double_p, double_p,
+    ]
+    # c_void_p, а не c_char_p - щоб зберегти вказівник для analytics_free
+    library.analytics_run_columnar.restype = ctypes.c_void_p
+    # Пряме читання db.sqlite3 (у бібліотеках старших збірок відсутнє)
+    if hasattr(library, 'analytics_run_sqlite'):
+        library.analytics_run_sqlite.argtypes = [ctypes.c_char_p, ctypes.c_int, str_p, str_p, ctypes.c_char_p]
+        library.analytics_run_sqlite.restype = ctypes.c_void_p
+    library.analytics_free.argtypes = [ctypes.c_void_p]
+    library.analytics_free.restype = None
+    if hasattr(library, 'analytics_set_output_format'):
+        library.analytics_set_output_format.argtypes = [ctypes.c_int]
+        library.analytics_set_output_format.restype = None
+    return library
+
+
+def load_library():
+    """Завантажити бібліотеку один раз на процес; None, якщо її немає"""
+    global _library, _load_attempted, _msgpack_output
+    if _load_attempted:
+        return _library
+
+    with _load_lock:
+        if not _load_attempted:
+            path = library_path()
+            if os.path.exists(path):
+                try:
+                    _library = _configure(ctypes.CDLL(path))
+                    if msgpack is not None and hasattr(_library, 'analytics_set_output_format'):
+                        _library.analytics_set_output_format(OUTPUT_MSGPACK)
+                        _msgpack_output = True
+                except (OSError, AttributeError) as e:
+                    logger.warning(f'Не вдалося завантажити {path}: {e}')
+                    _library = None
+            _load_attempted = True
+    return _library
+
+
+def is_available():
+    return load_library() is not None
+
+
+def _int_array(values):
+    return (ctypes.c_int * len(values))(*values)
+
+
+def _double_array(values):
+    return (ctypes.c_double * len(values))(*values)
+
+
+def _string_array(values):
+    # Однакові назви кодуємо один раз - масив тримає посилання на ті самі bytes
+    encoded = {}
+    items = [encoded.setdefault(v, v.encode('utf-8')) for v in values]
+    return (ctypes.c_char_p * len(items))(*items)
+
+
+def supports_sqlite():
+    library = load_library()
+    return library is not None and hasattr(library, 'analytics_run_sqlite')
+
+
+def _result(library, pointer):
+    if not pointer:
+        raise RuntimeError('Помилка виконання C++ модуля')
+    try:
+        if _msgpack_output:
+            # MessagePack: 4 байти довжини (big-endian), далі дані
+            size = int.from_bytes(ctypes.string_at(pointer, 4), 'big')
+            return msgpack.unpackb(ctypes.string_at(pointer + 4, size))
+        return json.loads(ctypes.string_at(pointer).decode('utf-8'))
+    finally:
+        library.analytics_free(pointer)
+
+
+def run_sqlite(path, date_from, date_to):
+    """Аналітика з прямим читанням db.sqlite3 бібліотекою (див. sqlite_source)"""
+    if not supports_sqlite():
+        raise RuntimeError('C++ бібліотека не підтримує пряме читання SQLite')
+
+    library = load_library()
+    days, range_end = sqlite_source.day_boundaries(date_from, date_to)
+    pointer = library.analytics_run_sqlite(
+        path.encode('utf-8'),
+        len(days),
+        _string_array([date for date, _ in days]),
+        _string_array([start for _, start in days]),
+        range_end.encode('utf-8'),
+    )
+    return _result(library, pointer)
+
+
+def run_columnar(columns):
+    """Обчислення аналітики по SalesColumns; повертає dict як і JSON від C++"""
+    library = load_library()
+    if library is None:
+        raise RuntimeError('C++ бібліотеку аналітики не знайдено')
+
+    pointer = library.analytics_run_columnar(
+        columns.sales_count,
+        _int_array(columns.sale_ids),
+        _string_array(columns.sale_dates),
+        _double_array(columns.sale_totals),
+        columns.items_count,
+        _int_array(columns.item_sale_index),
+        _int_array(columns.item_product_ids),
+        _string_array(columns.item_product_names),
+        _int_array(columns.item_category_ids),
+        _string_array(columns.item_category_names),
+        _int_array(columns.item_quantities),
+        _double_array(columns.item_prices),
+        _double_array(columns.item_subtotals),
+    )
+    return _result(library, pointer)
@@ -0,0 +1,173 @@
+"""
+Векторизований NumPy-бекенд аналітики.
+
+Обчислює той самий набір показників, що й AnalyticsEngine::processAndOutput
+у cpp_analytics/analytics.cpp (виручка по днях/тижнях/місяцях, топ товарів,
+частки категорій, статистики, ABC-аналіз) і повертає dict такої ж структури.
+Використовується, коли C++ модуль не зібрано.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Кількість записів у топах (як у C++ модулі)
+TOP_LIMIT = 20
+
+
+def is_available():
+    return np is not None
+
+
+def _money(value):
+    """Округлення як у C++ (fixed << setprecision(2))"""
+    return round(float(value), 2)
+
+
+def _group_sum(keys, weights):
+    """Унікальні ключі (відсортовані) та суми ваг по кожному ключу"""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, np.bincount(inverse, weights=weights, minlength=len(unique))
+
+
+def _period_revenue(dates, totals):
+    """Виручка по днях, тижнях та місяцях (ключі як у FusedAggregator в analytics.cpp)"""
+    days = dates.astype('datetime64[D]')
+    months_since_epoch = days.astype('datetime64[M]')
+    years = days.astype('datetime64[Y]').astype(np.int64) + 1970
+    months = months_since_epoch.astype(np.int64) % 12 + 1
+    day_of_month = (days - months_since_epoch).astype(np.int64) + 1
+
+    daily_keys, daily_sums = _group_sum(dates, totals)
+    daily = [
+        {'date': str(day), 'revenue': _money(revenue)}
+        for day, revenue in zip(daily_keys, daily_sums)
+    ]
+
+    # Тиждень рахується так само, як у C++: (місяць - 1) * 4 + (день - 1) / 7 + 1
+    weeks = (months - 1) * 4 + (day_of_month - 1) // 7 + 1
+    weekly_keys, weekly_sums = _group_sum(years * 100 + weeks, totals)
+    weekly = [
+        {'week': f'{key // 100}-W{key % 100:02d}', 'revenue': _money(revenue)}
+        for key, revenue in zip(weekly_keys.tolist(), weekly_sums)
+    ]
+
+    monthly_keys, monthly_sums = _group_sum(years * 100 + months, totals)
+    monthly = [
+        {'month': f'{key // 100:04d}-{key % 100:02d}', 'revenue': _money(revenue)}
+        for key, revenue in zip(monthly_keys.tolist(), monthly_sums)
+    ]
+    return daily, weekly, monthly
+
+
+def _statistics(totals):
+    """Статистики по сумах чеків (тільки додатні суми)"""
+    stats = {
+        'total_revenue': _money(totals.sum()),
+        'mean': 0.0, 'median': 0.0, 'std_dev': 0.0, 'min': 0.0, 'max': 0.0,
+        'total_sales': int(len(totals)),
+    }
+    positive = totals[totals > 0]
+    if len(positive):
+        stats.update({
+            'mean': _money(positive.mean()),
+            'median': _money(np.median(positive)),
+            'std_dev': _money(positive.std()),
+            'min': _money(positive.min()),
+            'max': _money(positive.max()),
+        })
+    return stats
+
+
+def _group_by_id(ids, names, weights_list):
+    """
+    Агрегація за id (як DenseIdIndex у C++): унікальні id, назва першого
+    входження кожного id та суми кожного масиву ваг по id
+    """
+    unique, first, inverse = np.unique(ids, return_index=True, return_inverse=True)
+    sums = [np.bincount(inverse, weights=weights, minlength=len(unique)) for weights in weights_list]
+    return unique, names[first], sums
+
+
+def _rank(values, names, ids):
+    """Індекси за спаданням values; при рівності - за назвою, потім за id"""
+    return np.lexsort((ids, names, -values))
+
+
+def _abc(ids, names, revenues, order):
+    """ABC-аналіз: A - до 80% кумулятивної виручки, B - до 95%, C - решта"""
+    total = revenues.sum()
+    sorted_revenue = revenues[order]
+    if total > 0:
+        cumulative = np.cumsum(sorted_revenue) / total * 100.0
+    else:
+        cumulative = np.zeros(len(sorted_revenue))
+    classes = np.where(cumulative <= 80.0, 'A', np.where(cumulative <= 95.0, 'B', 'C'))
+    return [
+        {
+            'product_id': int(ids[i]),
+            'product_name': str(names[i]),
+            'revenue': _money(revenue),
+            'cumulative_percent': _money(percent),
+            'category': str(abc_class),
+        }
+        for i, revenue, percent, abc_class in zip(order, sorted_revenue, cumulative, classes)
+    ]
+
+
+def compute(columns):
+    """Повний набір показників по SalesColumns"""
+    if not columns.sales_count:
+        return {'error': 'No sales found'}
+
+    dates = np.array(columns.sale_dates, dtype='datetime64[D]')
+    totals = np.array(columns.sale_totals, dtype=np.float64)
+    daily, weekly, monthly = _period_revenue(dates, totals)
+
+    product_ids = np.array(columns.item_product_ids, dtype=np.int64)
+    product_names = np.array(columns.item_product_names, dtype=str)
+    category_ids = np.array(columns.item_category_ids, dtype=np.int64)
+    category_names = np.array(columns.item_category_names, dtype=str)
+    subtotals = np.array(columns.item_subtotals, dtype=np.float64)
+    quantities = np.array(columns.item_quantities, dtype=np.float64)
+
+    # Агрегація по товарах за id (товари з однаковою назвою не зливаються)
+    ids, names, (revenue, quantity) = _group_by_id(product_ids, product_names, [subtotals, quantities])
+    quantity = quantity.astype(np.int64)
+
+    by_revenue = _rank(revenue, names, ids)
+    by_quantity = _rank(quantity, names, ids)
+
+    categories, category_labels, (category_revenue,) = _group_by_id(category_ids, category_names, [subtotals])
+    by_category_name = np.lexsort((categories, category_labels))
+    items_total = subtotals.sum()
+
+    return {
+        'daily_revenue': daily,
+        'weekly_revenue': weekly,
+        'monthly_revenue': monthly,
+        'top_products_by_revenue': [
+            {
+                'product_id': int(ids[i]), 'product_name': str(names[i]),
+                'revenue': _money(revenue[i]), 'quantity': int(quantity[i]),
+            }
+            for i in by_revenue[:TOP_LIMIT]
+        ],
+        'top_products_by_quantity': [
+            {
+                'product_id': int(ids[i]), 'product_name': str(names[i]),
+                'quantity': int(quantity[i]), 'revenue': _money(revenue[i]),
+            }
+            for i in by_quantity[:TOP_LIMIT]
+        ],
+        'category_shares': [
+            {
+                'category_id': int(categories[i]),
+                'category': str(category_labels[i]),
+                'share': _money(category_revenue[i] / items_total * 100.0) if items_total > 0 else 0.0,
+            }
+            for i in by_category_name
+        ],
+        'statistics': _statistics(totals),
+        'abc_analysis': _abc(ids, names, revenue, by_revenue),
+    }
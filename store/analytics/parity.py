@@ -0,0 +1,66 @@
+"""
+Порівняння результатів бекендів аналітики (C++ бібліотека, процес, демон,
+NumPy) - спільне для тестів (store/tests.py) та check_analytics_parity.
+"""
+from contextlib import contextmanager
+import os
+import subprocess
+import tempfile
+import time
+
+from django.test import override_settings
+
+from . import daemon
+
+# Допустима розбіжність для грошових значень (вихід C++ округлено до копійок)
+TOLERANCE = 0.011
+
+
+def diff(expected, actual, path=''):
+    """Список розбіжностей між двома результатами аналітики"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        problems = []
+        for key in sorted(set(expected) | set(actual)):
+            if key not in expected or key not in actual:
+                problems.append(f'{path}.{key}: ключ є тільки в одному результаті')
+            else:
+                problems.extend(diff(expected[key], actual[key], f'{path}.{key}'))
+        return problems
+    if isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            return [f'{path}: довжина {len(expected)} != {len(actual)}']
+        problems = []
+        for i, (a, b) in enumerate(zip(expected, actual)):
+            problems.extend(diff(a, b, f'{path}[{i}]'))
+        return problems
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        if abs(expected - actual) > TOLERANCE:
+            return [f'{path}: {expected} != {actual}']
+        return []
+    if expected != actual:
+        return [f'{path}: {expected!r} != {actual!r}']
+    return []
+
+
+@contextmanager
+def local_daemon(executable):
+    """
+    Окремий демон на тимчасовому сокеті (не заважає робочому);
+    повертає процес демона, ANALYTICS_DAEMON_SOCKET вказує на його сокет.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'analytics.sock')
+        process = subprocess.Popen([executable, '--daemon', path])
+        try:
+            for _ in range(100):
+                if os.path.exists(path) or process.poll() is not None:
+                    break
+                time.sleep(0.05)
+            daemon.close_pool()
+            with override_settings(ANALYTICS_DAEMON_SOCKET=path):
+                yield process
+        finally:
+            daemon.close_pool()
+            if process.poll() is None:
+                process.terminate()
+            process.wait()
@@ -0,0 +1,364 @@
+"""
+Пул прогрітих воркерів виконуваного C++ модуля (analytics --worker).
+
+Для розгортань без libanalytics.so: замість запуску процесу на кожен запит
+(exec, динамічне зв'язування, підкачування сторінок) запит передається
+заздалегідь запущеному воркеру через stdin/stdout кадрами з 4-байтною
+довжиною (big-endian), як у демона. Тіло запиту - той самий документ,
+що й в одноразовому режимі (#ASQL 1 або #ACOL 1).
+
+Колонковий потік передається частинами: замість довжини - CHUNKED_FRAME,
+далі кадри частин і порожній кадр як ознака кінця, тому запит не збирається
+в пам'яті цілком. Запис і читання обмежені одним таймаутом запиту.
+
+Воркер замінюється після ANALYTICS_POOL_MAX_REQUESTS запитів, після помилки
+обміну чи таймауту та після перезбирання модуля; воркер, що довго простоював,
+перед видачею перевіряється PING. Однакові запити, що виконуються одночасно,
+об'єднуються - модуль обчислює результат один раз.
+"""
+from concurrent.futures import Future
+import atexit
+import json
+import logging
+import os
+import select
+import struct
+import subprocess
+import threading
+import time
+
+from django.conf import settings
+
+from . import sqlite_source, stream
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Таймаут запиту (разом з очікуванням вільного воркера), с
+REQUEST_TIMEOUT = 30
+
+# Воркер, що простоював довше, перевіряється PING перед видачею, с
+HEALTH_CHECK_INTERVAL = 30
+
+_HEADER = struct.Struct('>I')
+
+# Довжина кадру, після якої тіло йде частинами (див. serveWorker у analytics.cpp)
+CHUNKED_FRAME = 0xFFFFFFFF
+
+_pool = None
+_pool_lock = threading.Lock()
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class PoolUnavailable(Exception):
+    """Пул вимкнено, воркер не запустився або не відповів"""
+
+
+def executable_path():
+    return os.path.join(settings.BASE_DIR, 'cpp_analytics', 'analytics')
+
+
+def pool_size():
+    return max(0, getattr(settings, 'ANALYTICS_POOL_SIZE', 0))
+
+
+def max_requests():
+    return max(1, getattr(settings, 'ANALYTICS_POOL_MAX_REQUESTS', 1000))
+
+
+def is_enabled():
+    return pool_size() > 0 and os.path.exists(executable_path())
+
+
+class EngineWorker:
+    """Один процес analytics --worker"""
+
+    def __init__(self, executable):
+        self.version = os.stat(executable).st_mtime_ns
+        self.msgpack = msgpack is not None
+        command = [executable, '--worker']
+        if self.msgpack:
+            command.append('--format=msgpack')
+        self.process = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+        # Запис через select з тим самим дедлайном, що й читання відповіді
+        os.set_blocking(self.process.stdin.fileno(), False)
+        self.requests = 0
+        self.last_used = time.monotonic()
+
+    def _write_all(self, data, deadline):
+        descriptor = self.process.stdin.fileno()
+        view = memoryview(data)
+        while view:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([], [descriptor], [], remaining)[1]:
+                raise TimeoutError('Воркер C++ модуля не прийняв запит вчасно')
+            try:
+                written = os.write(descriptor, view)
+            except BlockingIOError:
+                continue
+            view = view[written:]
+
+    def _read_exact(self, size, deadline):
+        descriptor = self.process.stdout.fileno()
+        chunks = []
+        while size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([descriptor], [], [], remaining)[0]:
+                raise TimeoutError('Воркер C++ модуля не відповів вчасно')
+            chunk = os.read(descriptor, min(size, 1 << 20))
+            if not chunk:
+                raise ConnectionError('Воркер C++ модуля завершився')
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b''.join(chunks)
+
+    def exchange(self, body, timeout):
+        """Тіло - bytes (один кадр) або ітератор bytes (кадр частинами)"""
+        deadline = time.monotonic() + timeout
+        if isinstance(body, bytes):
+            self._write_all(_HEADER.pack(len(body)) + body, deadline)
+        else:
+            self._write_all(_HEADER.pack(CHUNKED_FRAME), deadline)
+            for chunk in body:
+                if chunk:
+                    self._write_all(_HEADER.pack(len(chunk)) + chunk, deadline)
+            self._write_all(_HEADER.pack(0), deadline)
+        (length,) = _HEADER.unpack(self._read_exact(_HEADER.size, deadline))
+        response = self._read_exact(length, deadline)
+        self.last_used = time.monotonic()
+        return response
+
+    def call(self, body, timeout):
+        """Результат модуля як dict (помилки даних - {"error": ...})"""
+        self.requests += 1
+        response = self.exchange(body, timeout)
+        if self.msgpack:
+            return msgpack.unpackb(response)
+        return json.loads(response)
+
+    def is_healthy(self, version):
+        if self.process.poll() is not None or self.version != version:
+            return False
+        if time.monotonic() - self.last_used < HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            # PING завжди повертає JSON
+            return json.loads(self.exchange(b'PING', 5)).get('ok', False)
+        except (OSError, ValueError):
+            return False
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process.stdout.close()
+
+
+class WorkerPool:
+    """Фіксована кількість воркерів; запит чекає на вільний, якщо всі зайняті"""
+
+    def __init__(self, size):
+        self.size = size
+        self.pid = os.getpid()
+        self.idle = []
+        self.started = 0
+        self.condition = threading.Condition()
+        self.counters = {'requests': 0, 'spawned': 0, 'recycled': 0, 'failed': 0, 'deduplicated': 0}
+
+    def count(self, name):
+        with self.condition:
+            self.counters[name] += 1
+
+    def _spawn(self):
+        worker = EngineWorker(executable_path())
+        self.count('spawned')
+        return worker
+
+    def prefork(self):
+        """Запуск усіх воркерів заздалегідь; PING підвантажує сторінки модуля"""
+        while True:
+            with self.condition:
+                if self.started >= self.size:
+                    return
+                self.started += 1
+            try:
+                worker = self._spawn()
+                worker.exchange(b'PING', 5)
+            except (OSError, ValueError) as e:
+                with self.condition:
+                    self.started -= 1
+                logger.warning(f'Не вдалося запустити воркер C++ модуля: {e}')
+                return
+            self._put(worker)
+
+    def _put(self, worker):
+        with self.condition:
+            self.idle.append(worker)
+            self.condition.notify()
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                if self.idle:
+                    worker = self.idle.pop()
+                    break
+                if self.started < self.size:
+                    self.started += 1
+                    worker = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolUnavailable('Усі воркери C++ модуля зайняті')
+                self.condition.wait(remaining)
+
+        try:
+            version = os.stat(executable_path()).st_mtime_ns
+            if worker is not None and not worker.is_healthy(version):
+                worker.close()
+                self.count('recycled')
+                worker = None
+            return worker or self._spawn()
+        except OSError as e:
+            with self.condition:
+                self.started -= 1
+                self.condition.notify()
+            raise PoolUnavailable(str(e))
+
+    def release(self, worker, ok):
+        """Повернення воркера; після збою або ліміту запитів - заміна у фоні"""
+        if ok and worker.requests < max_requests():
+            self._put(worker)
+            return
+        with self.condition:
+            self.counters['recycled' if ok else 'failed'] += 1
+            self.started -= 1
+        threading.Thread(target=self._replace, args=(worker,), daemon=True).start()
+
+    def _replace(self, worker):
+        worker.close()
+        self.prefork()
+
+    def close(self):
+        with self.condition:
+            workers = self.idle[:]
+            self.idle.clear()
+            self.started -= len(workers)
+        for worker in workers:
+            worker.close()
+
+    def stats(self):
+        with self.condition:
+            return {
+                'size': self.size,
+                'started': self.started,
+                'idle': len(self.idle),
+                **self.counters,
+            }
+
+
+def get_pool():
+    """Пул процесу; після fork (воркери gunicorn) - новий, канали батька не спільні"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid() or _pool.size != pool_size():
+            if _pool is not None and _pool.pid == os.getpid():
+                _pool.close()
+            _pool = WorkerPool(pool_size())
+            created = True
+        else:
+            created = False
+    if created:
+        _pool.prefork()
+    return _pool
+
+
+def close():
+    """Завершення простоюючих воркерів (вихід процесу, зміна БД у бенчмарку)"""
+    with _pool_lock:
+        if _pool is not None and _pool.pid == os.getpid():
+            _pool.close()
+
+
+atexit.register(close)
+
+
+def _call(pool, body, timeout):
+    worker = pool.acquire(timeout)
+    pool.count('requests')
+    ok = False
+    try:
+        result = worker.call(body, timeout)
+        ok = True
+    except (OSError, ValueError) as e:
+        raise PoolUnavailable(str(e))
+    finally:
+        pool.release(worker, ok)
+    return result
+
+
+def _deduplicated(key, body, timeout):
+    """Один виклик модуля на ключ; одночасні однакові запити чекають на нього"""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    pool = get_pool()
+    if not leader:
+        pool.count('deduplicated')
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            raise PoolUnavailable('Воркер C++ модуля не відповів вчасно')
+
+    try:
+        result = _call(pool, body(), timeout)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def run_sqlite(path, date_from, date_to, timeout=REQUEST_TIMEOUT):
+    """Пряме читання БД воркером (див. sqlite_source)"""
+    return _deduplicated(
+        ('sqlite', path, date_from, date_to),
+        lambda: sqlite_source.request_text(path, date_from, date_to).encode('utf-8'),
+        timeout,
+    )
+
+
+def run_stream(date_from, date_to, timeout=REQUEST_TIMEOUT):
+    """Колонковий потік з ORM (див. stream); формує його тільки перший з однакових запитів"""
+    return _deduplicated(
+        ('stream', date_from, date_to),
+        lambda: (batch.encode('utf-8') for batch in stream.iter_batches(date_from, date_to)),
+        timeout,
+    )
+
+
+def stats():
+    """Стан пулу без його запуску"""
+    pool = _pool
+    if not is_enabled() or pool is None or pool.pid != os.getpid():
+        return {'enabled': is_enabled(), 'started': 0}
+    return {'enabled': True, **pool.stats()}
@@ -0,0 +1,202 @@
+"""
+Асинхронний виклик C++ модуля з обмеженням паралельності.
+
+Звіти не мають займати всі воркери: одночасно виконується не більше
+ANALYTICS_MAX_CONCURRENT обчислень на процес, ще ANALYTICS_MAX_QUEUE
+чекають на слот, решта запитів отримує Saturated (view відповідає
+застарілим результатом з кешу або 503). Однакові діапазони, що
+запитуються одночасно, об'єднуються: обчислення виконується один раз,
+інші запити чекають на його результат.
+
+Стан спільний для всіх циклів подій процесу (concurrent.futures.Future
+та threading.Lock), тому обмеження діє і під ASGI, і під WSGI, де
+асинхронний view виконується у власному циклі на кожен запит.
+"""
+from collections import deque
+from concurrent.futures import Future
+import asyncio
+import functools
+import os
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import cache as analytics_cache
+from . import daemon, native, pool, sqlite_source, stream
+
+# Таймаут процесу модуля, с (як у синхронного виклику)
+ENGINE_TIMEOUT = 30
+
+_lock = threading.Lock()
+_running = 0
+_waiters = deque()
+_inflight = {}
+_counters = {'completed': 0, 'coalesced': 0, 'rejected': 0}
+# Посилання на задачі ведучих запитів, щоб їх не зібрав GC до завершення
+_tasks = set()
+
+
+class Saturated(Exception):
+    """Усі слоти зайняті, черга заповнена"""
+
+
+def max_concurrent():
+    return max(1, getattr(settings, 'ANALYTICS_MAX_CONCURRENT', 2))
+
+
+def max_queue():
+    return max(0, getattr(settings, 'ANALYTICS_MAX_QUEUE', 8))
+
+
+def stats():
+    """Лічильники для моніторингу: queue_depth - запити, що чекають на слот"""
+    with _lock:
+        return {
+            'running': _running,
+            'queue_depth': len(_waiters),
+            'in_flight': len(_inflight),
+            'max_concurrent': max_concurrent(),
+            'max_queue': max_queue(),
+            **_counters,
+        }
+
+
+def _acquire_locked():
+    """Під _lock: слот одразу (None), Future черги або Saturated"""
+    global _running
+    if _running < max_concurrent():
+        _running += 1
+        return None
+    if len(_waiters) >= max_queue():
+        _counters['rejected'] += 1
+        raise Saturated()
+    waiter = Future()
+    _waiters.append(waiter)
+    return waiter
+
+
+def _release():
+    """Слот передається першому живому запиту з черги"""
+    global _running
+    with _lock:
+        while _waiters:
+            waiter = _waiters.popleft()
+            if waiter.set_running_or_notify_cancel():
+                waiter.set_result(None)
+                return
+        _running -= 1
+
+
+async def _wait_for_slot(waiter):
+    try:
+        await asyncio.wrap_future(waiter)
+    except asyncio.CancelledError:
+        # Слот міг бути переданий саме перед скасуванням - повертаємо його
+        if waiter.done() and not waiter.cancelled():
+            _release()
+        raise
+
+
+def _in_thread(func):
+    """
+    sync_to_async(thread_sensitive=False) для викликів, що читають БД:
+    очікування не займає спільний синхронний потік, а з'єднання потоку
+    пулу після виклику закривається, як після запиту.
+    """
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(call, thread_sensitive=False)
+
+
+async def _run_executable(executable, database_path, date_from, date_to):
+    """Виконуваний модуль: пряме читання SQLite або потоковий ввід з ORM, прогрітий воркер пулу, якщо він увімкнений"""
+    if database_path:
+        if pool.is_enabled():
+            # Прогрітий воркер: без запуску процесу, очікування - в окремому потоці
+            return await sync_to_async(pool.run_sqlite, thread_sensitive=False)(
+                database_path, date_from, date_to, timeout=ENGINE_TIMEOUT
+            )
+        return await sqlite_source.run_executable_async(
+            executable, database_path, date_from, date_to, timeout=ENGINE_TIMEOUT
+        )
+    if pool.is_enabled():
+        return await _in_thread(pool.run_stream)(date_from, date_to, timeout=ENGINE_TIMEOUT)
+    return await stream.run_executable_async(executable, date_from, date_to, timeout=ENGINE_TIMEOUT)
+
+
+async def _compute(date_from, date_to, fallback):
+    """Демон, далі виконуваний модуль (SQLite або потік з ORM), інакше синхронний fallback у потоці"""
+    try:
+        return await _in_thread(daemon.query)(date_from, date_to)
+    except daemon.DaemonUnavailable:
+        pass
+
+    executable = os.path.join(settings.BASE_DIR, 'cpp_analytics', 'analytics')
+    database_path = sqlite_source.database_path()
+    # Без прямого читання SQLite бібліотека в процесі (ctypes) випереджає потік - її викликає fallback
+    if os.path.exists(executable) and (database_path or not native.is_available()):
+        try:
+            result = await _run_executable(executable, database_path, date_from, date_to)
+        except (RuntimeError, ValueError, asyncio.TimeoutError, pool.PoolUnavailable) as e:
+            result = {'error': str(e) or 'Перевищено час виконання C++ модуля'}
+        if result.get('error') in (None, 'No sales found'):
+            return result
+
+    return await sync_to_async(fallback)(date_from, date_to)
+
+
+async def _lead(key, cache_key, shared, waiter, fallback):
+    """Обчислення для всіх запитів діапазону; результат - у shared"""
+    date_from, date_to = key
+    try:
+        if waiter is not None:
+            await _wait_for_slot(waiter)
+        try:
+            result = await _compute(date_from, date_to, fallback)
+        finally:
+            _release()
+        await sync_to_async(analytics_cache.store)(cache_key, date_from, date_to, result)
+    except BaseException as e:
+        shared.set_exception(e)
+        if not isinstance(e, Exception):
+            raise
+    else:
+        shared.set_result(result)
+        with _lock:
+            _counters['completed'] += 1
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+
+
+async def run(date_from, date_to, fallback):
+    """
+    Результат аналітики за період: кеш, об'єднання з поточним обчисленням
+    того ж діапазону або нове обчислення в межах слотів.
+    fallback(date_from, date_to) - синхронний шлях, якщо процес модуля недоступний.
+    """
+    cache_key, result = await sync_to_async(analytics_cache.lookup)(date_from, date_to)
+    if result is not None:
+        return result
+
+    key = (date_from, date_to)
+    with _lock:
+        shared = _inflight.get(key)
+        if shared is not None:
+            _counters['coalesced'] += 1
+        else:
+            # Saturated виникає до реєстрації - наступний запит спробує знову
+            waiter = _acquire_locked()
+            shared = _inflight[key] = Future()
+            # Задача не скасовується разом із запитом: на результат чекають інші
+            task = asyncio.ensure_future(_lead(key, cache_key, shared, waiter, fallback))
+            _tasks.add(task)
+            task.add_done_callback(_tasks.discard)
+
+    return await asyncio.shield(asyncio.wrap_future(shared))
@@ -0,0 +1,96 @@
+"""
+Режим прямого читання db.sqlite3 C++ модулем.
+
+Python передає тільки шлях до БД та межі днів періоду: модуль сам виконує
+один запит з JOIN продажів і позицій за індексом created_at та агрегує рядки
+по мірі читання - без вибірки через ORM і без серіалізації даних.
+
+Django зберігає created_at у SQLite як UTC-текст "YYYY-MM-DD HH:MM:SS[.ffffff]",
+тому межі локальних днів (TIME_ZONE) передаються в тому ж форматі:
+
+    #ASQL 1
+    DB <шлях до БД>
+    D <дата YYYY-MM-DD> <початок дня в UTC>
+    E <кінець періоду в UTC>
+"""
+from datetime import timedelta, timezone as dt_timezone
+import asyncio
+import json
+import subprocess
+
+from django.db import connections
+
+from ..utils import local_day_start
+
+HEADER = '#ASQL 1'
+
+
+def database_path(alias='default'):
+    """Шлях до файлу БД або None, якщо БД не SQLite (чи в пам'яті)"""
+    connection = connections[alias]
+    if connection.vendor != 'sqlite':
+        return None
+    name = str(connection.settings_dict['NAME'])
+    if not name or name == ':memory:' or name.startswith('file:'):
+        return None
+    return name
+
+
+def _utc_text(moment):
+    return moment.astimezone(dt_timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def day_boundaries(date_from, date_to):
+    """[(дата, початок дня в UTC), ...] та кінець періоду в UTC"""
+    days = []
+    day = date_from
+    while day <= date_to:
+        days.append((day.isoformat(), _utc_text(local_day_start(day))))
+        day += timedelta(days=1)
+    return days, _utc_text(local_day_start(date_to + timedelta(days=1)))
+
+
+def request_text(path, date_from, date_to):
+    days, range_end = day_boundaries(date_from, date_to)
+    lines = [HEADER, f'DB\t{path}']
+    lines.extend(f'D\t{date}\t{start}' for date, start in days)
+    lines.append(f'E\t{range_end}')
+    return '\n'.join(lines) + '\n'
+
+
+def _parse_output(stdout, stderr, returncode):
+    if stdout.startswith('{'):
+        return json.loads(stdout)
+    raise RuntimeError(stderr or f'Помилка виконання C++ модуля (код {returncode})')
+
+
+def run_executable(executable, path, date_from, date_to, timeout=30):
+    """Запуск виконуваного модуля в режимі прямого читання БД; повертає dict"""
+    completed = subprocess.run(
+        [executable],
+        input=request_text(path, date_from, date_to),
+        capture_output=True, text=True, encoding='utf-8', timeout=timeout,
+    )
+    return _parse_output(completed.stdout, completed.stderr, completed.returncode)
+
+
+async def run_executable_async(executable, path, date_from, date_to, timeout=30):
+    """
+    Те саме без блокування потоку (asyncio.create_subprocess_exec):
+    поки модуль читає БД, цикл подій обслуговує інші запити.
+    """
+    process = await asyncio.create_subprocess_exec(
+        executable,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(
+            process.communicate(request_text(path, date_from, date_to).encode('utf-8')), timeout
+        )
+    except BaseException:
+        # Таймаут або скасування запиту - процес не має залишитися після view
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    return _parse_output(stdout.decode('utf-8'), stderr.decode('utf-8', 'replace'), process.returncode)
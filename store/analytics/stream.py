@@ -0,0 +1,254 @@
+"""
+Потоковий колонковий формат для виконуваного C++ модуля.
+
+Замість одного JSON документа з усіма продажами записи пишуться у stdin
+процесу рядками по мірі читання з БД (queryset.iterator()), тому пам'ять
+не залежить від довжини періоду. Назви товарів і категорій передаються
+один раз у словнику, позиції посилаються на них за id:
+
+    #ACOL 1
+    P <id> <назва>
+    C <id> <назва>
+    S <id продажу> <дата YYYY-MM-DD> <сума>
+    I <id продажу> <id товару> <id категорії> <кількість> <ціна> <сума>
+
+Поля розділені табуляцією; у назвах екрануються \\, табуляція та переводи рядка.
+"""
+import asyncio
+import json
+import subprocess
+
+from asgiref.sync import sync_to_async
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from ..models import Category, Product, Sale, SaleItem, DailyProductSales
+from ..utils import date_range_filter, local_day_start
+
+HEADER = '#ACOL 1'
+
+# Кількість рядків БД на одну вибірку курсора та один запис у stdin
+CHUNK_SIZE = 2000
+
+
+def _escape(name):
+    return name.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '')
+
+
+def iter_lines(date_from, date_to, chunk_size=CHUNK_SIZE):
+    """
+    Рядки потоку за період (генератор, дані читаються курсором частинами).
+    Межа None - без обмеження.
+    """
+    yield f'{HEADER}\n'
+
+    for product_id, name in Product.objects.order_by().values_list('id', 'name').iterator(chunk_size):
+        yield f'P\t{product_id}\t{_escape(name)}\n'
+    for category_id, name in Category.objects.order_by().values_list('id', 'name').iterator(chunk_size):
+        yield f'C\t{category_id}\t{_escape(name)}\n'
+
+    sales = Sale.objects.filter(
+        **date_range_filter('created_at', date_from, date_to)
+    ).order_by('created_at', 'id').annotate(day=TruncDate('created_at'))
+
+    # Підсумки дня прив'язуються до першого продажу дня (див. fetch_sales_columns)
+    first_sale_of_day = {}
+    for sale_id, day, total in sales.values_list('id', 'day', 'total_amount').iterator(chunk_size):
+        first_sale_of_day.setdefault(day, sale_id)
+        yield f'S\t{sale_id}\t{day:%Y-%m-%d}\t{total}\n'
+
+    rollups = DailyProductSales.objects.all()
+    if date_from:
+        rollups = rollups.filter(date__gte=date_from)
+    if date_to:
+        rollups = rollups.filter(date__lte=date_to)
+    rollups = rollups.order_by('date', 'product_id').values_list(
+        'date', 'product_id', 'category_id', 'quantity', 'revenue',
+    )
+    for day, product_id, category_id, quantity, revenue in rollups.iterator(chunk_size):
+        sale_id = first_sale_of_day.get(day)
+        if sale_id is None or not quantity:
+            continue
+        yield f'I\t{sale_id}\t{product_id}\t{category_id}\t{quantity}\t{revenue / quantity}\t{revenue}\n'
+
+
+def _iter_by_pk(queryset, fields, chunk_size):
+    """
+    Рядки values_list('pk', *fields) за зростанням pk. Кожна частина - окремий
+    короткий запит, тому між частинами не тримається ні курсор, ні транзакція.
+    """
+    last = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last).order_by('pk').values_list('pk', *fields)[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1][0]
+
+
+def iter_history_lines(chunk_size=CHUNK_SIZE):
+    """
+    Уся історія продажів для LOAD демона.
+
+    Межа - найбільший id продажу на початку читання; продажі після неї демон
+    отримує дельтами APPEND. Решта читається частинами за pk без спільної
+    транзакції: у SQLite довгий знімок тримав би блокування, на якому чекає
+    фіксація checkout. Редагування під час читання скидають епоху демона
+    (RESET), і таке LOAD відхиляється. Минулі дні беруться з денних підсумків,
+    поточний - з позицій продажів до межі (його підсумок уже може містити новіші).
+    """
+    yield f'{HEADER}\n'
+
+    today = timezone.localdate()
+    bound = Sale.objects.order_by('-pk').values_list('pk', flat=True).first()
+    if bound is None:
+        return
+
+    for product_id, name in _iter_by_pk(Product.objects.all(), ['name'], chunk_size):
+        yield f'P\t{product_id}\t{_escape(name)}\n'
+    for category_id, name in _iter_by_pk(Category.objects.all(), ['name'], chunk_size):
+        yield f'C\t{category_id}\t{_escape(name)}\n'
+
+    sales = Sale.objects.filter(pk__lte=bound).annotate(day=TruncDate('created_at'))
+    first_sale_of_day = {}
+    for sale_id, day, total in _iter_by_pk(sales, ['day', 'total_amount'], chunk_size):
+        first_sale_of_day.setdefault(day, sale_id)
+        yield f'S\t{sale_id}\t{day:%Y-%m-%d}\t{total}\n'
+
+    rollups = DailyProductSales.objects.filter(date__lt=today)
+    for _, day, product_id, category_id, quantity, revenue in _iter_by_pk(
+        rollups, ['date', 'product_id', 'category_id', 'quantity', 'revenue'], chunk_size
+    ):
+        sale_id = first_sale_of_day.get(day)
+        if sale_id is None or not quantity:
+            continue
+        yield f'I\t{sale_id}\t{product_id}\t{category_id}\t{quantity}\t{revenue / quantity}\t{revenue}\n'
+
+    items = SaleItem.objects.filter(sale_id__lte=bound, sale__created_at__gte=local_day_start(today))
+    for _, sale_id, product_id, category_id, quantity, price, subtotal in _iter_by_pk(
+        items, ['sale_id', 'product_id', 'product__category_id', 'quantity', 'price', 'subtotal'], chunk_size
+    ):
+        yield f'I\t{sale_id}\t{product_id}\t{category_id}\t{quantity}\t{price}\t{subtotal}\n'
+
+
+def iter_sale_lines(sale_ids):
+    """
+    Записи окремих продажів з їхніми фактичними позиціями (дельта для демона).
+    Словники містять тільки товари та категорії цих продажів.
+    """
+    sales = Sale.objects.filter(pk__in=sale_ids).order_by('created_at', 'id').annotate(
+        day=TruncDate('created_at')
+    ).values_list('id', 'day', 'total_amount')
+    items = list(SaleItem.objects.filter(sale_id__in=sale_ids).order_by('sale_id', 'id').values_list(
+        'sale_id', 'product_id', 'product__name', 'product__category_id', 'product__category__name',
+        'quantity', 'price', 'subtotal',
+    ))
+
+    products = {}
+    categories = {}
+    for _, product_id, product_name, category_id, category_name, *_ in items:
+        products[product_id] = product_name
+        categories[category_id] = category_name
+    for product_id, name in products.items():
+        yield f'P\t{product_id}\t{_escape(name)}\n'
+    for category_id, name in categories.items():
+        yield f'C\t{category_id}\t{_escape(name)}\n'
+
+    for sale_id, day, total in sales:
+        yield f'S\t{sale_id}\t{day:%Y-%m-%d}\t{total}\n'
+    for sale_id, product_id, _, category_id, _, quantity, price, subtotal in items:
+        yield f'I\t{sale_id}\t{product_id}\t{category_id}\t{quantity}\t{price}\t{subtotal}\n'
+
+
+def iter_batches(date_from, date_to, chunk_size=CHUNK_SIZE):
+    """Потік пакетами по chunk_size рядків (один пакет - один запис у канал)"""
+    batch = []
+    for line in iter_lines(date_from, date_to, chunk_size):
+        batch.append(line)
+        if len(batch) >= chunk_size:
+            yield ''.join(batch)
+            batch.clear()
+    if batch:
+        yield ''.join(batch)
+
+
+def write(stream, date_from, date_to, chunk_size=CHUNK_SIZE):
+    """Запис потоку у файловий об'єкт пакетами по chunk_size рядків"""
+    for batch in iter_batches(date_from, date_to, chunk_size):
+        stream.write(batch)
+
+
+def run_executable(executable, date_from, date_to, timeout=30):
+    """
+    Запуск виконуваного C++ модуля з потоковим вводом.
+    Повертає dict результату; RuntimeError, якщо процес завершився з помилкою.
+    """
+    process = subprocess.Popen(
+        [executable],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        text=True, encoding='utf-8',
+    )
+    try:
+        try:
+            write(process.stdin, date_from, date_to)
+        except BrokenPipeError:
+            # Процес завершився передчасно - причина буде у stdout/stderr
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            # communicate() не має повторно звертатися до закритого stdin
+            process.stdin = None
+        stdout, stderr = process.communicate(timeout=timeout)
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+
+    return _parse_output(stdout, stderr, process.returncode)
+
+
+async def run_executable_async(executable, date_from, date_to, timeout=30):
+    """
+    Те саме без блокування потоку (asyncio.create_subprocess_exec). Пакети
+    читаються з БД короткими викликами у синхронному потоці (курсор iterator()
+    лишається в одному потоці), запис у stdin чекає на drain() у циклі подій.
+    """
+    process = await asyncio.create_subprocess_exec(
+        executable,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    batches = iter_batches(date_from, date_to)
+    next_batch = sync_to_async(next)
+
+    async def feed():
+        try:
+            while (batch := await next_batch(batches, None)) is not None:
+                process.stdin.write(batch.encode('utf-8'))
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # Процес завершився передчасно - причина буде у stdout/stderr
+            pass
+        finally:
+            await sync_to_async(batches.close)()
+            process.stdin.close()
+        return await process.communicate()
+
+    try:
+        stdout, stderr = await asyncio.wait_for(feed(), timeout)
+    except BaseException:
+        # Таймаут або скасування запиту - процес не має залишитися після view
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+    return _parse_output(stdout.decode('utf-8'), stderr.decode('utf-8', 'replace'), process.returncode)
+
+
+def _parse_output(stdout, stderr, returncode):
+    if stdout.startswith('{'):
+        # Помилки даних (немає продажів, некоректний рядок) модуль повертає у JSON
+        return json.loads(stdout)
+    raise RuntimeError(stderr or f'Помилка виконання C++ модуля (код {returncode})')
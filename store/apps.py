@@ -16,6 +16,9 @@ class StoreConfig(AppConfig):
         2. Адміністратора ще немає
         3. Не запускається під час migrate
         """
+        # Підключення обробників сигналів (інвалідація кешу аналітики)
+        from . import signals  # noqa: F401
+        
         # Перевірка, чи не запускається під час migrate
         import sys
         if 'migrate' in sys.argv or 'makemigrations' in sys.argv:
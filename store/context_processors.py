@@ -0,0 +1,11 @@
+"""
+Контекст-процесори шаблонів
+"""
+from django.utils.functional import SimpleLazyObject
+
+from .roles import UserRoles
+
+
+def roles(request):
+    """Ролі поточного користувача (store/roles.py) - запит до груп тільки при першому зверненні"""
+    return {'roles': SimpleLazyObject(lambda: UserRoles(request.user))}
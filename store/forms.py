@@ -54,6 +54,11 @@ class StockForm(forms.ModelForm):
         is_manager = kwargs.pop('is_manager', False)
         super().__init__(*args, **kwargs)
         
+        # Залишок на початок створює тільки архівація журналу (archive_stock_ledger)
+        self.fields['transaction_type'].choices = [
+            choice for choice in self.fields['transaction_type'].choices if choice[0] != 'opening'
+        ]
+        
         # Для керівника - тільки надходження
         if is_manager:
             self.fields['transaction_type'].choices = [('in', 'Надходження')]
@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from store.models import StockArchive, LedgerArchiveError
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносить складські операції до дати в архів (StockArchive), замінюючи їх '
+        'рядками залишку на початок для кожного товару, та перевіряє залишки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Архівувати операції до початку дня (YYYY-MM-DD)')
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Тільки перевірити архів і залишки без архівації',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            if not options['before']:
+                raise CommandError('Вкажіть --before YYYY-MM-DD або --verify')
+            try:
+                day = datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Невірний формат дати, очікується YYYY-MM-DD')
+
+            try:
+                archived, openings = StockArchive.archive_before(day)
+            except (ValueError, LedgerArchiveError) as e:
+                raise CommandError(str(e))
+            self.stdout.write(
+                f'Перенесено в архів операцій до {day}: {archived}, рядків залишку на початок: {openings}'
+            )
+
+        self._verify()
+
+    def _verify(self):
+        drift = StockArchive.verify()
+        for product_id, (opening, archived) in sorted(drift.items()):
+            self.stdout.write(f'Товар #{product_id}: залишок на початок {opening}, сума архіву {archived}')
+        if drift:
+            raise CommandError(f'Архів не збігається з журналом для {len(drift)} товарів')
+        self.stdout.write(self.style.SUCCESS('Архів збігається з рядками залишку на початок'))
+
+        # Матеріалізовані залишки проти журналу (рядки 'opening' + операції після межі)
+        call_command('rebuild_stock_balances', check=True, stdout=self.stdout)
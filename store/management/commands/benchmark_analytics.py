@@ -0,0 +1,230 @@
+from datetime import date, timedelta
+from decimal import Decimal
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+
+from store.analytics import daemon, fetch_sales_columns, native, numpy_backend, pool, sqlite_source, stream
+from store.management.commands.check_analytics_parity import _local_daemon
+from store.models import Category, Product, Sale, SaleItem, DailyProductSales
+from store.utils import local_day_start
+
+# Перший день синтетичних даних (як у cpp_analytics/bench.cpp phases)
+START_DATE = date(2024, 1, 1)
+
+# Окремий кеш аналітики, щоб вимірювання не змішувалися з робочим
+BENCHMARK_CACHES = {
+    **settings.CACHES,
+    'analytics': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'},
+}
+
+
+class SyntheticRandom:
+    """LCG з bench.cpp: однаковий seed - однакові товари, ціни та продажі"""
+
+    def __init__(self, seed):
+        self.state = seed & 0xFFFFFFFF
+
+    def next(self):
+        self.state = (self.state * 1103515245 + 12345) & 0xFFFFFFFF
+        return self.state >> 8
+
+
+class Command(BaseCommand):
+    help = (
+        'Бенчмарк аналітики на детермінованих синтетичних даних в окремій тимчасовій БД: '
+        'вибірка ORM, бекенди C++ модуля, NumPy та call_cpp_analytics; результат - JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help='Кількість днів продажів')
+        parser.add_argument('--sales-per-day', type=int, default=100, help='Продажів на день')
+        parser.add_argument('--items-per-sale', type=int, default=3, help='Позицій у продажу')
+        parser.add_argument('--skus', type=int, default=1000, help='Кількість товарів')
+        parser.add_argument('--categories', type=int, default=20, help='Кількість категорій')
+        parser.add_argument('--seed', type=int, default=42, help='Початкове значення генератора')
+        parser.add_argument('--repeat', type=int, default=3, help='Повторів кожного вимірювання (береться найкраще)')
+        parser.add_argument('--output', help='Файл для JSON результату (за замовчуванням stdout)')
+
+    def handle(self, *args, **options):
+        for name in ('days', 'sales_per_day', 'items_per_sale', 'skus', 'categories', 'repeat'):
+            if options[name] < 1:
+                raise CommandError(f'--{name.replace("_", "-")} має бути додатним')
+
+        config = {
+            name: options[name]
+            for name in ('days', 'sales_per_day', 'items_per_sale', 'skus', 'categories', 'seed', 'repeat')
+        }
+        report = {'config': config}
+
+        # Тимчасова файлова БД: прямий режим SQLite і демон читають зафіксовані дані
+        directory = tempfile.mkdtemp(prefix='analytics-benchmark-')
+        old_name = connection.settings_dict['NAME']
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            started = time.perf_counter()
+            report['dataset'] = self._generate(options)
+            report['dataset']['generate_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                report['python_ms'] = self._measure(options)
+        finally:
+            pool.close()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(directory, ignore_errors=True)
+
+        report['engine'] = self._engine_phases(options)
+
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(text + '\n')
+            self.stderr.write(f'Результат записано у {options["output"]}')
+        else:
+            self.stdout.write(text)
+
+    def _generate(self, options):
+        """Товари, категорії та продажі в порядку генератора bench.cpp"""
+        rng = SyntheticRandom(options['seed'])
+        skus, categories_count = options['skus'], options['categories']
+        prices = [Decimal(rng.next() % 100000) / 100 + 1 for _ in range(skus)]
+
+        categories = Category.objects.bulk_create([
+            Category(name=f'Категорія {i + 1}') for i in range(categories_count)
+        ])
+        products = Product.objects.bulk_create([
+            Product(name=f'Товар {i + 1}', category=categories[i % categories_count], price=prices[i])
+            for i in range(skus)
+        ], batch_size=1000)
+        user = User.objects.create(username='benchmark')
+
+        sales_total = items_total = 0
+        revenue = Decimal(0)
+        for offset in range(options['days']):
+            day = START_DATE + timedelta(days=offset)
+            with transaction.atomic():
+                sales = Sale.objects.bulk_create([
+                    Sale(user=user) for _ in range(options['sales_per_day'])
+                ])
+                items = []
+                for sale in sales:
+                    total = Decimal(0)
+                    for _ in range(options['items_per_sale']):
+                        product = rng.next() % skus
+                        quantity = rng.next() % 5 + 1
+                        subtotal = prices[product] * quantity
+                        total += subtotal
+                        items.append(SaleItem(
+                            sale=sale, product=products[product], quantity=quantity,
+                            price=prices[product], subtotal=subtotal,
+                        ))
+                    sale.total_amount = total
+                    revenue += total
+                SaleItem.objects.bulk_create(items, batch_size=2000)
+                Sale.objects.bulk_update(sales, ['total_amount'], batch_size=1000)
+
+                # auto_now_add ігнорує передане значення - дата дня виставляється окремим UPDATE
+                Sale.objects.filter(pk__in=[sale.pk for sale in sales]).update(
+                    created_at=local_day_start(day) + timedelta(hours=12)
+                )
+            sales_total += len(sales)
+            items_total += len(items)
+
+        DailyProductSales.rebuild()
+        return {
+            'date_from': START_DATE.isoformat(),
+            'date_to': (START_DATE + timedelta(days=options['days'] - 1)).isoformat(),
+            'sales': sales_total,
+            'items': items_total,
+            # Має збігатися з engine.checksum - дані bench.cpp ті самі
+            'checksum': float(revenue),
+        }
+
+    def _best(self, run, repeat):
+        """Найкращий час з repeat запусків, мс; помилка результату - рядком"""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = run()
+            timings.append(time.perf_counter() - started)
+            if isinstance(result, dict) and 'error' in result:
+                return f'error: {result["error"]}'
+        return round(min(timings) * 1000, 2)
+
+    def _measure(self, options):
+        # Імпорт тут: views тягне форми та шаблони, які не потрібні іншим вимірюванням
+        from store import views
+
+        repeat = options['repeat']
+        date_from = START_DATE
+        date_to = START_DATE + timedelta(days=options['days'] - 1)
+        executable = os.path.join(settings.BASE_DIR, 'cpp_analytics', 'analytics')
+        database_path = sqlite_source.database_path()
+        columns = fetch_sales_columns(date_from, date_to)
+
+        timings = {'orm_fetch': self._best(lambda: fetch_sales_columns(date_from, date_to), repeat)}
+        if numpy_backend.is_available():
+            timings['numpy'] = self._best(lambda: numpy_backend.compute(columns), repeat)
+        if native.is_available():
+            timings['native_columnar'] = self._best(lambda: native.run_columnar(columns), repeat)
+            timings['orm_fetch+native_columnar'] = self._best(
+                lambda: native.run_columnar(fetch_sales_columns(date_from, date_to)), repeat
+            )
+            if native.supports_sqlite():
+                timings['native_sqlite'] = self._best(
+                    lambda: native.run_sqlite(database_path, date_from, date_to), repeat
+                )
+        if os.path.exists(executable):
+            timings['executable_stream'] = self._best(
+                lambda: stream.run_executable(executable, date_from, date_to, timeout=600), repeat
+            )
+            timings['executable_sqlite'] = self._best(
+                lambda: sqlite_source.run_executable(executable, database_path, date_from, date_to, timeout=600),
+                repeat,
+            )
+            if pool.is_enabled():
+                timings['pool_stream'] = self._best(
+                    lambda: pool.run_stream(date_from, date_to, timeout=600), repeat
+                )
+                timings['pool_sqlite'] = self._best(
+                    lambda: pool.run_sqlite(database_path, date_from, date_to, timeout=600), repeat
+                )
+            with _local_daemon(executable):
+                timings['daemon_first_query'] = self._best(lambda: daemon.query(date_from, date_to), 1)
+                timings['daemon_query'] = self._best(lambda: daemon.query(date_from, date_to), repeat)
+
+        # Повний шлях view без демона: кеш скидається перед кожним запуском
+        date_from_str, date_to_str = date_from.isoformat(), date_to.isoformat()
+
+        def uncached():
+            views.analytics_cache.invalidate_day(date_from)
+            return views.call_cpp_analytics(date_from_str, date_to_str)
+
+        with override_settings(ANALYTICS_DAEMON_SOCKET=''):
+            timings['call_cpp_analytics'] = self._best(uncached, repeat)
+            timings['call_cpp_analytics_cached'] = self._best(
+                lambda: views.call_cpp_analytics(date_from_str, date_to_str), repeat
+            )
+        return timings
+
+    def _engine_phases(self, options):
+        """Фази AnalyticsEngine з cpp_analytics/bench (make bench), якщо зібрано"""
+        bench = os.path.join(settings.BASE_DIR, 'cpp_analytics', 'bench')
+        if not os.path.exists(bench):
+            return None
+        command = [bench, 'phases']
+        for name in ('days', 'sales_per_day', 'items_per_sale', 'skus', 'categories', 'seed', 'repeat'):
+            command += [f'--{name.replace("_", "-")}', str(options[name])]
+        completed = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', timeout=3600)
+        if completed.returncode != 0:
+            return {'error': completed.stderr.strip() or f'код {completed.returncode}'}
+        return json.loads(completed.stdout)
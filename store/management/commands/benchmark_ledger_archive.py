@@ -0,0 +1,116 @@
+from datetime import timedelta
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from store.models import Product, Stock, StockArchive
+from store.pagination import KeysetPaginator
+from store.utils import local_day_start
+
+
+class Command(BaseCommand):
+    help = (
+        'Час запитів залишків до і після архівації складського журналу '
+        '(archive_stock_ledger) на синтетичних даних за кілька років'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', type=int, default=3, help='Років синтетичного журналу')
+        parser.add_argument('--rows-per-day', type=int, default=200, help='Складських операцій на день')
+        parser.add_argument('--keep-days', type=int, default=90, help='Днів журналу, що лишаються після архівації')
+        parser.add_argument('--repeat', type=int, default=5, help='Кількість повторів кожного запиту')
+
+    def handle(self, *args, **options):
+        if not Product.objects.exists():
+            raise CommandError('Немає товарів - спочатку виконайте seed_data')
+
+        with transaction.atomic():
+            self._generate(options['years'], options['rows_per_day'])
+            before = self._run(options['repeat'])
+
+            day = timezone.localdate() - timedelta(days=options['keep_days'])
+            started = time.perf_counter()
+            archived, openings = StockArchive.archive_before(day)
+            self.stdout.write(
+                f'\nАрхівація до {day}: {archived} операцій -> {openings} рядків залишку '
+                f'за {time.perf_counter() - started:.1f} с'
+            )
+            drift = StockArchive.verify()
+            self.stdout.write(
+                self.style.ERROR(f'Розбіжностей з архівом: {len(drift)}') if drift
+                else self.style.SUCCESS('Перевірка архіву: розбіжностей немає')
+            )
+
+            after = self._run(options['repeat'])
+            self.stdout.write('')
+            for title, elapsed in before.items():
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f'{title}: {elapsed:.2f} мс -> {after[title]:.2f} мс'
+                ))
+            # Синтетичні дані не зберігаються
+            transaction.set_rollback(True)
+
+    def _generate(self, years, rows_per_day):
+        """Пакетна генерація журналу (без оновлення балансу - тільки для вимірювань)"""
+        user = User.objects.order_by('id').first()
+        products = list(Product.objects.values_list('id', flat=True))
+        today = timezone.localdate()
+        start = today - timedelta(days=365 * years)
+        rng = random.Random(42)
+
+        day = start
+        total = 0
+        while day <= today:
+            rows = Stock.objects.bulk_create([
+                Stock(
+                    product_id=rng.choice(products), quantity=rng.randint(1, 5),
+                    transaction_type=rng.choice(['in', 'out', 'out', 'adjustment']), created_by=user,
+                )
+                for _ in range(rows_per_day)
+            ])
+            # auto_now_add ігнорує передане значення - дата дня виставляється окремим UPDATE
+            Stock.objects.filter(pk__in=[row.pk for row in rows]).update(
+                created_at=local_day_start(day) + timedelta(hours=12)
+            )
+            total += len(rows)
+            day += timedelta(days=1)
+
+        self.stdout.write(f'Згенеровано {total} складських операцій з {start} по {today}')
+
+    def _measure(self, evaluate, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            evaluate()
+            timings.append(time.perf_counter() - started)
+        return min(timings) * 1000
+
+    def _run(self, repeat):
+        product_id = Product.objects.order_by('id').values_list('id', flat=True).first()
+        as_of = timezone.localdate() - timedelta(days=30)
+        cases = {
+            'Залишки всіх товарів за журналом': lambda: list(
+                Product.objects.order_by().with_stock(from_ledger=True).values_list('id', 'stock_quantity')
+            ),
+            'Сторінка журналу товару з наростаючим залишком': lambda: Stock.attach_running_balances(
+                KeysetPaginator(Stock.objects.filter(product_id=product_id), 50).page().object_list
+            ),
+            'Залишок після останньої операції товару': lambda: Stock.objects.filter(
+                product_id=product_id
+            ).order_by('-created_at', '-id').first().current_balance,
+            f'Вартість залишків на {as_of}': lambda: list(
+                Product.objects.with_stock(as_of=as_of).values_list('id', 'stock_value')
+            ),
+            'Фільтр адмінки за типом операції': lambda: Stock.objects.filter(transaction_type='out').count(),
+        }
+
+        self.stdout.write(f'\nОперацій у журналі: {Stock.objects.count()}')
+        results = {}
+        for title, evaluate in cases.items():
+            results[title] = self._measure(evaluate, repeat)
+            self.stdout.write(f'  {title}: {results[title]:.2f} мс')
+        return results
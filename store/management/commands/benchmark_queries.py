@@ -0,0 +1,134 @@
+from datetime import timedelta
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from store.models import Product, Stock, Sale, SaleItem
+from store.utils import date_range_filter, local_day_start
+
+
+class Command(BaseCommand):
+    help = (
+        'Порівнює фільтрацію за created_at__date з діапазонами за локальними датами: '
+        'плани запитів (EXPLAIN) та час виконання'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--years',
+            type=int,
+            default=0,
+            help='Згенерувати синтетичні продажі за N років (у транзакції, що відкочується)',
+        )
+        parser.add_argument('--sales-per-day', type=int, default=50, help='Продажів на день при генерації')
+        parser.add_argument('--repeat', type=int, default=5, help='Кількість повторів кожного запиту')
+
+    def handle(self, *args, **options):
+        if not Product.objects.exists():
+            raise CommandError('Немає товарів - спочатку виконайте seed_data')
+
+        with transaction.atomic():
+            if options['years']:
+                self._generate(options['years'], options['sales_per_day'])
+            self._run(options['repeat'])
+            # Синтетичні дані не зберігаються
+            transaction.set_rollback(True)
+
+    def _generate(self, years, sales_per_day):
+        """Пакетна генерація продажів (без сигналів та підсумків - тільки для вимірювань)"""
+        user = User.objects.order_by('id').first()
+        products = list(Product.objects.values_list('id', 'price'))
+        today = timezone.localdate()
+        start = today - timedelta(days=365 * years)
+        rng = random.Random(42)
+
+        day = start
+        sales_total = 0
+        while day <= today:
+            sales = Sale.objects.bulk_create([
+                Sale(user=user, total_amount=0) for _ in range(sales_per_day)
+            ])
+            items = []
+            for sale in sales:
+                for product_id, price in rng.sample(products, min(3, len(products))):
+                    quantity = rng.randint(1, 3)
+                    items.append(SaleItem(
+                        sale=sale, product_id=product_id, quantity=quantity,
+                        price=price, subtotal=price * quantity,
+                    ))
+            SaleItem.objects.bulk_create(items)
+            stock = Stock.objects.bulk_create([
+                Stock(product_id=item.product_id, quantity=item.quantity, transaction_type='out', created_by=user)
+                for item in items
+            ])
+
+            # auto_now_add ігнорує передане значення - дата дня виставляється окремим UPDATE
+            moment = local_day_start(day) + timedelta(hours=12)
+            Sale.objects.filter(pk__in=[sale.pk for sale in sales]).update(created_at=moment)
+            Stock.objects.filter(pk__in=[row.pk for row in stock]).update(created_at=moment)
+            sales_total += len(sales)
+            day += timedelta(days=1)
+
+        self.stdout.write(f'Згенеровано {sales_total} продажів з {start} по {today}')
+
+    def _measure(self, queryset_factory, evaluate, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            evaluate(queryset_factory())
+            timings.append(time.perf_counter() - started)
+        return min(timings) * 1000
+
+    def _run(self, repeat):
+        today = timezone.localdate()
+        date_from = today - timedelta(days=30)
+        product_id = Product.objects.order_by('id').values_list('id', flat=True).first()
+        sale_id = Sale.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+        total = lambda qs: qs.aggregate(total=Sum('total_amount'))
+        cases = [
+            (
+                'Продажі за 30 днів (created_at__date)',
+                lambda: Sale.objects.filter(created_at__date__gte=date_from, created_at__date__lte=today),
+                total,
+            ),
+            (
+                'Продажі за 30 днів (діапазон)',
+                lambda: Sale.objects.filter(**date_range_filter('created_at', date_from, today)),
+                total,
+            ),
+            (
+                'Позиції за 30 днів (sale__created_at__date)',
+                lambda: SaleItem.objects.filter(
+                    sale__created_at__date__gte=date_from, sale__created_at__date__lte=today
+                ),
+                lambda qs: qs.aggregate(total=Sum('subtotal')),
+            ),
+            (
+                'Позиції за 30 днів (діапазон)',
+                lambda: SaleItem.objects.filter(**date_range_filter('sale__created_at', date_from, today)),
+                lambda qs: qs.aggregate(total=Sum('subtotal')),
+            ),
+            (
+                'Надходження товару (product, transaction_type)',
+                lambda: Stock.objects.filter(product_id=product_id, transaction_type='in'),
+                lambda qs: qs.aggregate(total=Sum('quantity')),
+            ),
+            (
+                'Позиція продажу (sale, product)',
+                lambda: SaleItem.objects.filter(sale_id=sale_id, product_id=product_id),
+                lambda qs: list(qs),
+            ),
+        ]
+
+        self.stdout.write(f'Продажів: {Sale.objects.count()}, позицій: {SaleItem.objects.count()}\n')
+        for title, queryset_factory, evaluate in cases:
+            elapsed = self._measure(queryset_factory, evaluate, repeat)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{title}: {elapsed:.2f} мс'))
+            for line in queryset_factory().order_by().explain().splitlines():
+                self.stdout.write(f'  {line}')
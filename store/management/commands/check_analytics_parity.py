@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from store.analytics import daemon, fetch_sales_columns, native, numpy_backend, pool, sqlite_source, stream
+from store.analytics.parity import diff, local_daemon
+from store.models import Sale
+
+
+def _daemon_result(executable, date_from, date_to):
+    """Повне завантаження, повторна дельта (має ігноруватися) та запит"""
+    with local_daemon(executable):
+        result = daemon.query(date_from, date_to)
+        last_sale = Sale.objects.order_by('-id').values_list('id', flat=True)[:1]
+        daemon.append_sales(list(last_sale))
+        repeated = daemon.query(date_from, date_to)
+        if repeated != result:
+            return {'error': 'повторна дельта змінила результат'}
+        return result
+
+
+class Command(BaseCommand):
+    help = 'Порівнює результати C++ модуля аналітики з NumPy-бекендом на даних за період'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', help='Початок періоду (YYYY-MM-DD), за замовчуванням 30 днів тому')
+        parser.add_argument('--date-to', help='Кінець періоду (YYYY-MM-DD), за замовчуванням сьогодні')
+
+    def handle(self, *args, **options):
+        if not numpy_backend.is_available():
+            raise CommandError('NumPy не встановлено')
+
+        today = timezone.localdate()
+        try:
+            date_from = (
+                datetime.strptime(options['date_from'], '%Y-%m-%d').date()
+                if options['date_from'] else today - timedelta(days=30)
+            )
+            date_to = (
+                datetime.strptime(options['date_to'], '%Y-%m-%d').date()
+                if options['date_to'] else today
+            )
+        except ValueError:
+            raise CommandError('Невірний формат дати, очікується YYYY-MM-DD')
+
+        columns = fetch_sales_columns(date_from, date_to)
+        self.stdout.write(
+            f'Період {date_from} - {date_to}: продажів {columns.sales_count}, позицій {columns.items_count}'
+        )
+        reference = numpy_backend.compute(columns)
+
+        engines = {}
+        database_path = sqlite_source.database_path()
+        if native.is_available():
+            engines['libanalytics.so'] = lambda: native.run_columnar(columns)
+            if database_path and native.supports_sqlite():
+                engines['libanalytics.so (SQLite)'] = lambda: native.run_sqlite(database_path, date_from, date_to)
+        executable = os.path.join(settings.BASE_DIR, 'cpp_analytics', 'analytics')
+        if os.path.exists(executable):
+            engines['analytics'] = lambda: stream.run_executable(executable, date_from, date_to, timeout=300)
+            engines['analytics --daemon'] = lambda: _daemon_result(executable, date_from, date_to)
+            if database_path:
+                engines['analytics (SQLite)'] = lambda: sqlite_source.run_executable(
+                    executable, database_path, date_from, date_to, timeout=300
+                )
+            if pool.is_enabled():
+                engines['analytics --worker'] = lambda: pool.run_stream(date_from, date_to, timeout=300)
+
+        if not engines:
+            raise CommandError('C++ модуль не зібрано (make у cpp_analytics)')
+
+        failed = False
+        for name, run in engines.items():
+            problems = diff(run(), reference)
+            if problems:
+                failed = True
+                self.stdout.write(self.style.ERROR(f'{name}: розбіжностей {len(problems)}'))
+                for problem in problems[:20]:
+                    self.stdout.write(f'  {problem}')
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: збігається з NumPy-бекендом'))
+
+        if failed:
+            raise CommandError('Результати бекендів відрізняються')
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from store.models import DailyProductSales
+
+
+class Command(BaseCommand):
+    help = 'Перераховує щоденні підсумки продажів товарів (DailyProductSales) з позицій продажів'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Перерахувати тільки дні, починаючи з дати (YYYY-MM-DD); за замовчуванням - всю історію',
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Невірний формат дати, очікується YYYY-MM-DD')
+
+        created = DailyProductSales.rebuild(since=since)
+        period = f'з {since}' if since else 'за всю історію'
+        self.stdout.write(self.style.SUCCESS(f'Перераховано підсумків {period}: {created} рядків'))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from store.models import Product, ProductStockBalance
+
+
+class Command(BaseCommand):
+    help = 'Перераховує матеріалізовані залишки товарів зі складського журналу та перевіряє розбіжності'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Тільки перевірити розбіжності без виправлення (ненульовий код виходу при розбіжностях)',
+        )
+
+    def handle(self, *args, **options):
+        # Один запит з умовною агрегацією по всьому журналу
+        ledger = dict(
+            Product.objects.order_by().with_stock(from_ledger=True).values_list(
+                'id', 'stock_quantity'
+            )
+        )
+        stored = dict(ProductStockBalance.objects.values_list('product_id', 'quantity'))
+
+        drift = {}
+        for product_id, expected in ledger.items():
+            actual = stored.get(product_id)
+            if actual is None and expected == 0:
+                continue
+            if actual != expected:
+                drift[product_id] = (actual, expected)
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Розбіжностей не знайдено'))
+            return
+
+        for product_id, (actual, expected) in sorted(drift.items()):
+            self.stdout.write(
+                f'Товар #{product_id}: збережено {actual if actual is not None else "—"}, '
+                f'за журналом {expected}'
+            )
+
+        if options['check']:
+            raise CommandError(f'Знайдено розбіжностей: {len(drift)}')
+
+        with transaction.atomic():
+            missing = []
+            for product_id, (actual, expected) in drift.items():
+                if actual is None:
+                    missing.append(ProductStockBalance(product_id=product_id, quantity=expected))
+                else:
+                    ProductStockBalance.objects.filter(product_id=product_id).update(quantity=expected)
+            ProductStockBalance.objects.bulk_create(missing)
+
+        self.stdout.write(self.style.SUCCESS(f'Виправлено залишків: {len(drift)}'))
@@ -0,0 +1,32 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускає C++ модуль аналітики в режимі демона на ANALYTICS_DAEMON_SOCKET '
+        '(дані завантажуються при першому запиті аналітики)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', help='Шлях до сокета, за замовчуванням ANALYTICS_DAEMON_SOCKET')
+        parser.add_argument('--threads', type=int, help='Кількість потоків агрегації')
+
+    def handle(self, *args, **options):
+        path = options['socket'] or settings.ANALYTICS_DAEMON_SOCKET
+        if not path:
+            raise CommandError('ANALYTICS_DAEMON_SOCKET не задано')
+
+        executable = os.path.join(settings.BASE_DIR, 'cpp_analytics', 'analytics')
+        if not os.path.exists(executable):
+            raise CommandError('C++ модуль не зібрано (make у cpp_analytics)')
+
+        command = [executable, '--daemon', path]
+        if options['threads']:
+            command.append(f'--threads={options["threads"]}')
+        self.stdout.write(f'Демон аналітики: {path}')
+        self.stdout.flush()
+        # Процес команди замінюється демоном (сигнали зупинки отримує він)
+        os.execv(executable, command)
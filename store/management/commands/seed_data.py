@@ -2,7 +2,7 @@ from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User, Group
 from django.db.models import Sum
 from django.utils import timezone
-from store.models import Category, Product, Stock, Sale, SaleItem
+from store.models import Category, Product, Stock, Sale, SaleItem, DailyProductSales
 from decimal import Decimal
 from datetime import datetime, timedelta
 import random
@@ -224,6 +224,9 @@ class Command(BaseCommand):
         
         self.stdout.write(self.style.SUCCESS(f'Створено {total_sales} продажів за {days_count} днів з 1 грудня до сьогодні'))
 
+        # Позиції створено напряму, тому денні підсумки перераховуються одним проходом
+        DailyProductSales.rebuild()
+
         self.stdout.write(self.style.SUCCESS('Демонстраційні дані успішно створено!'))
         self.stdout.write('\nДані для входу:')
         self.stdout.write('Адміністратор: admin / admin123')
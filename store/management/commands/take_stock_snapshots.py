@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from store.models import StockSnapshot
+
+
+def _parse(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError('Невірний формат дати, очікується YYYY-MM-DD')
+
+
+class Command(BaseCommand):
+    help = 'Записує знімки залишків товарів (StockSnapshot) на кінець дня або місяця'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='День знімка (YYYY-MM-DD); за замовчуванням - кінець останнього закритого періоду',
+        )
+        parser.add_argument(
+            '--since',
+            help='Дописати знімки на кінець кожного періоду, починаючи з дати (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--period', choices=['day', 'month'],
+            help='Період знімків; за замовчуванням - STOCK_SNAPSHOT_PERIOD',
+        )
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options['since']:
+            # Кінці періодів від останнього закритого назад до since
+            since = _parse(options['since'])
+            days = []
+            day = StockSnapshot.period_end(today, options['period'])
+            while day >= since:
+                days.append(day)
+                day = StockSnapshot.period_end(day, options['period'])
+            days.reverse()
+        elif options['date']:
+            days = [_parse(options['date'])]
+        else:
+            days = [StockSnapshot.period_end(today, options['period'])]
+
+        for day in days:
+            try:
+                created = StockSnapshot.take(day)
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(f'{day}: {created} товарів')
+        self.stdout.write(self.style.SUCCESS(f'Записано знімків: {len(days)}'))
@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-16 20:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, F, Sum, When
+
+
+def populate_balances(apps, schema_editor):
+    """Початкове заповнення залишків з існуючого складського журналу"""
+    Stock = apps.get_model('store', 'Stock')
+    ProductStockBalance = apps.get_model('store', 'ProductStockBalance')
+    signed_quantity = Case(
+        When(transaction_type='out', then=-F('quantity')),
+        default=F('quantity'),
+    )
+    balances = Stock.objects.order_by().values('product').annotate(balance=Sum(signed_quantity))
+    ProductStockBalance.objects.bulk_create([
+        ProductStockBalance(product_id=row['product'], quantity=row['balance'] or 0)
+        for row in balances
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStockBalance',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_balance', serialize=False, to='store.product', verbose_name='Товар')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Залишок')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Оновлено')),
+            ],
+            options={
+                'verbose_name': 'Залишок товару',
+                'verbose_name_plural': 'Залишки товарів',
+            },
+        ),
+        migrations.AlterField(
+            model_name='stock',
+            name='quantity',
+            field=models.IntegerField(verbose_name='Кількість'),
+        ),
+        migrations.RunPython(populate_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 6.0 on 2026-10-16 20:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_rollups(apps, schema_editor):
+    """Початкове заповнення підсумків з існуючих позицій продажів"""
+    SaleItem = apps.get_model('store', 'SaleItem')
+    DailyProductSales = apps.get_model('store', 'DailyProductSales')
+    rows = SaleItem.objects.annotate(day=TruncDate('sale__created_at')).order_by().values(
+        'day', 'product_id', 'product__category_id'
+    ).annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum('subtotal'),
+        sales=Count('sale_id', distinct=True),
+    )
+    DailyProductSales.objects.bulk_create(
+        (
+            DailyProductSales(
+                date=row['day'], product_id=row['product_id'],
+                category_id=row['product__category_id'],
+                quantity=row['total_quantity'], revenue=row['total_revenue'],
+                sale_count=row['sales'],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_product_stock_balance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Кількість')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Виручка')),
+                ('sale_count', models.IntegerField(default=0, verbose_name='Кількість продажів')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='store.category', verbose_name='Категорія')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='store.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Денний підсумок продажів товару',
+                'verbose_name_plural': 'Денні підсумки продажів товарів',
+                'ordering': ['date', 'product'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'product'), name='unique_daily_product_sales')],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-16 20:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_daily_product_sales'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['created_at'], name='sale_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='saleitem',
+            index=models.Index(fields=['sale', 'product'], name='saleitem_sale_product_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['product', 'transaction_type'], name='stock_product_type_idx'),
+        ),
+    ]
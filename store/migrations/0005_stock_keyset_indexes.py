@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-16 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['created_at', 'id'], name='stock_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['product', 'created_at', 'id'], name='stock_product_created_id_idx'),
+        ),
+    ]
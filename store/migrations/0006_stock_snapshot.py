@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-16 21:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_stock_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Залишок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Створено')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='store.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Знімок залишку',
+                'verbose_name_plural': 'Знімки залишків',
+                'ordering': ['-date', 'product'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'product'), name='unique_stock_snapshot')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-16 22:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_stock_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stock',
+            name='transaction_type',
+            field=models.CharField(choices=[('in', 'Надходження'), ('out', 'Продаж'), ('adjustment', 'Корекція'), ('opening', 'Залишок на початок')], default='in', max_length=20, verbose_name='Тип операції'),
+        ),
+        migrations.CreateModel(
+            name='StockArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(verbose_name='ID операції')),
+                ('quantity', models.IntegerField(verbose_name='Кількість')),
+                ('transaction_type', models.CharField(choices=[('in', 'Надходження'), ('out', 'Продаж'), ('adjustment', 'Корекція'), ('opening', 'Залишок на початок')], max_length=20, verbose_name='Тип операції')),
+                ('notes', models.TextField(blank=True, verbose_name='Примітки')),
+                ('created_at', models.DateTimeField(verbose_name='Створено')),
+                ('archived_before', models.DateField(verbose_name='Межа архівації')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Архівовано')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Створено користувачем')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_stock', to='store.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Архівована складська операція',
+                'verbose_name_plural': 'Архівовані складські операції',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['product', 'created_at'], name='stockarchive_product_idx'), models.Index(fields=['archived_before'], name='stockarchive_before_idx')],
+            },
+        ),
+    ]
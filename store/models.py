@@ -1,9 +1,28 @@
-from django.db import models
-from django.db.models import Sum
+import logging
+
+from django.db import models, transaction, DatabaseError, IntegrityError
+from django.db.models import (
+    Sum, Count, Max, F, Q, Case, When, Value, ExpressionWrapper, OuterRef, Subquery,
+    IntegerField, DecimalField, BooleanField,
+)
+from django.db.models.functions import Coalesce, TruncDate
+from django.conf import settings
+from django.utils import timezone
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from datetime import timedelta
 from decimal import Decimal
 
+from .utils import date_range_filter, local_day_start
+
+
+logger = logging.getLogger(__name__)
+
+# Поріг "низького залишку" для дашборду та списків товарів
+LOW_STOCK_THRESHOLD = 10
+
 
 class Category(models.Model):
     """Категорія товарів"""
@@ -21,6 +40,46 @@ class Category(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    """QuerySet товарів з масовою анотацією залишків"""
+
+    def with_stock(self, from_ledger=False, as_of=None):
+        """
+        Анотує залишок (stock_quantity), вартість (stock_value) та ознаку
+        низького залишку (is_low_stock) одним запитом.
+        
+        За замовчуванням читає матеріалізований баланс; з from_ledger=True
+        рахує залишок умовною агрегацією по складському журналу; з as_of -
+        залишок на кінець дня as_of (StockSnapshot.quantity_as_of).
+        """
+        if as_of is not None and as_of < timezone.localdate():
+            quantity = StockSnapshot.quantity_as_of(as_of)
+        elif from_ledger:
+            quantity = Coalesce(
+                Sum(Stock.signed_quantity_expression(prefix='stock__')), Value(0)
+            )
+        else:
+            quantity = Coalesce(F('stock_balance__quantity'), Value(0))
+        
+        return self.annotate(
+            stock_quantity=ExpressionWrapper(quantity, output_field=IntegerField()),
+        ).annotate(
+            # Вартість рахуємо тільки для додатного залишку
+            stock_value=Case(
+                When(stock_quantity__gt=0, then=F('stock_quantity') * F('price')),
+                default=Value(Decimal('0')),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+            is_low_stock=ExpressionWrapper(
+                Q(stock_quantity__lt=LOW_STOCK_THRESHOLD), output_field=BooleanField()
+            ),
+        )
+
+    def low_stock(self):
+        """Товари з низьким залишком, від найменшого"""
+        return self.with_stock().filter(is_low_stock=True).order_by('stock_quantity', 'name')
+
+
 class Product(models.Model):
     """Товар"""
     name = models.CharField(max_length=200, verbose_name="Назва")
@@ -32,6 +91,8 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Створено")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Оновлено")
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Товар"
         verbose_name_plural = "Товари"
@@ -42,21 +103,20 @@ class Product(models.Model):
 
     @property
     def current_stock(self):
-        """Поточний залишок на складі"""
-        incoming = Stock.objects.filter(product=self, transaction_type='in').aggregate(
-            total=Sum('quantity')
-        )['total'] or 0
+        """Поточний залишок на складі (з матеріалізованої таблиці балансів)"""
+        # Анотація з ProductQuerySet.with_stock()
+        if 'stock_quantity' in self.__dict__:
+            return self.stock_quantity
         
-        outgoing = Stock.objects.filter(product=self, transaction_type='out').aggregate(
-            total=Sum('quantity')
-        )['total'] or 0
+        # Якщо баланс підтягнуто через select_related - жодного запиту
+        if Product.stock_balance.is_cached(self):
+            balance = getattr(self, 'stock_balance', None)
+            return balance.quantity if balance else 0
         
-        # Корекції можуть бути позитивними (збільшення) або негативними (зменшення)
-        adjustments = Stock.objects.filter(product=self, transaction_type='adjustment').aggregate(
-            total=Sum('quantity')
-        )['total'] or 0
-        
-        return incoming - outgoing + adjustments
+        quantity = ProductStockBalance.objects.filter(product_id=self.pk).values_list(
+            'quantity', flat=True
+        ).first()
+        return quantity or 0
 
 
 class Stock(models.Model):
@@ -65,6 +125,7 @@ class Stock(models.Model):
         ('in', 'Надходження'),
         ('out', 'Продаж'),
         ('adjustment', 'Корекція'),
+        ('opening', 'Залишок на початок'),
     ]
 
     product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="Товар")
@@ -78,17 +139,128 @@ class Stock(models.Model):
         verbose_name = "Складська операція"
         verbose_name_plural = "Складські операції"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'transaction_type'], name='stock_product_type_idx'),
+            # Курсорна пагінація журналу за (created_at, id), з фільтром товару і без
+            models.Index(fields=['created_at', 'id'], name='stock_created_id_idx'),
+            models.Index(fields=['product', 'created_at', 'id'], name='stock_product_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.quantity} ({self.get_transaction_type_display()})"
 
+    @staticmethod
+    def signed(transaction_type, quantity):
+        """Вплив операції на залишок: продаж зменшує, надходження та корекція додаються"""
+        return -quantity if transaction_type == 'out' else quantity
+
+    @staticmethod
+    def signed_quantity_expression(prefix=''):
+        """SQL-вираз для знакової кількості (для агрегацій по журналу)"""
+        return Case(
+            When(**{f'{prefix}transaction_type': 'out'}, then=-F(f'{prefix}quantity')),
+            default=F(f'{prefix}quantity'),
+        )
+
+    @property
+    def signed_quantity(self):
+        return Stock.signed(self.transaction_type, self.quantity)
+
+    def save(self, *args, **kwargs):
+        """Зберігання операції разом з оновленням матеріалізованого балансу"""
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = Stock.objects.filter(pk=self.pk).values(
+                    'product_id', 'transaction_type', 'quantity'
+                ).first()
+            super().save(*args, **kwargs)
+            
+            if previous:
+                ProductStockBalance.apply_delta(
+                    previous['product_id'],
+                    -Stock.signed(previous['transaction_type'], previous['quantity'])
+                )
+            ProductStockBalance.apply_delta(self.product_id, self.signed_quantity)
+
+    @classmethod
+    def attach_running_balances(cls, rows):
+        """
+        Заповнює running_balance - залишок товару після кожної операції - для
+        сторінки журналу rows (суцільний відрізок у порядку від нових до старих).
+        
+        Залишок після найновішої операції сторінки - матеріалізований баланс мінус
+        новіші операції (один агрегат за індексом (product, created_at, id)), далі
+        він відмотується по рядках сторінки: робота залежить від сторінки та її
+        глибини, а не від усього журналу.
+        """
+        if not rows:
+            return rows
+        newest = rows[0]
+        newer = cls.objects.filter(
+            Q(created_at__gt=newest.created_at) | Q(created_at=newest.created_at, id__gt=newest.pk),
+            product_id=OuterRef('pk'),
+        ).order_by().values('product_id').annotate(total=Sum(cls.signed_quantity_expression())).values('total')
+        balances = dict(
+            Product.objects.filter(pk__in={row.product_id for row in rows}).annotate(
+                balance=Coalesce(F('stock_balance__quantity'), Value(0))
+                - Coalesce(Subquery(newer, output_field=IntegerField()), Value(0))
+            ).values_list('id', 'balance')
+        )
+        for row in rows:
+            row.running_balance = balances[row.product_id]
+            balances[row.product_id] -= row.signed_quantity
+        return rows
+
     @property
     def current_balance(self):
-        """Поточний баланс після цієї операції"""
-        if self.transaction_type == 'in':
-            return sum(s.quantity for s in Stock.objects.filter(product=self.product, created_at__lte=self.created_at, transaction_type='in')) - \
-                   sum(s.quantity for s in Stock.objects.filter(product=self.product, created_at__lte=self.created_at, transaction_type='out'))
-        return None
+        """Залишок товару після цієї операції (надходження, продажі та корекції)"""
+        # Заповнено Stock.attach_running_balances() для сторінки журналу
+        if 'running_balance' in self.__dict__:
+            return self.running_balance
+        
+        return Stock.objects.filter(
+            Q(created_at__lt=self.created_at) | Q(created_at=self.created_at, id__lte=self.pk),
+            product_id=self.product_id,
+        ).aggregate(
+            balance=Coalesce(Sum(Stock.signed_quantity_expression()), Value(0))
+        )['balance']
+
+
+class ProductStockBalance(models.Model):
+    """Матеріалізований залишок товару, що оновлюється при кожному записі в Stock"""
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True,
+        related_name='stock_balance', verbose_name="Товар"
+    )
+    quantity = models.IntegerField(default=0, verbose_name="Залишок")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Оновлено")
+
+    class Meta:
+        verbose_name = "Залишок товару"
+        verbose_name_plural = "Залишки товарів"
+
+    def __str__(self):
+        return f"{self.product.name}: {self.quantity}"
+
+    @classmethod
+    def apply_delta(cls, product_id, delta):
+        """Атомарно змінити залишок товару на delta (UPDATE ... SET quantity = quantity + delta)"""
+        if not delta:
+            return
+        
+        with transaction.atomic():
+            updated = cls.objects.filter(product_id=product_id).update(
+                quantity=F('quantity') + delta
+            )
+            if not updated:
+                _, created = cls.objects.get_or_create(
+                    product_id=product_id, defaults={'quantity': delta}
+                )
+                if not created:
+                    cls.objects.filter(product_id=product_id).update(
+                        quantity=F('quantity') + delta
+                    )
 
 
 class Sale(models.Model):
@@ -101,13 +273,36 @@ class Sale(models.Model):
         verbose_name = "Продаж"
         verbose_name_plural = "Продажі"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='sale_created_at_idx'),
+        ]
 
     def __str__(self):
         return f"Продаж #{self.id} - {self.total_amount} грн ({self.created_at.strftime('%d.%m.%Y %H:%M')})"
 
     def calculate_total(self):
         """Розрахувати загальну суму продажу"""
-        return sum(item.subtotal for item in self.saleitem_set.all())
+        return self.saleitem_set.aggregate(total=Sum('subtotal'))['total'] or Decimal('0')
+
+    def add_items(self, items):
+        """
+        Пакетне додавання позицій продажу.
+        
+        Підсумки рахуються в пам'яті, позиції записуються одним bulk_create,
+        а загальна сума оновлюється одним UPDATE - без перечитування позицій.
+        """
+        items = list(items)
+        added = Decimal('0')
+        for item in items:
+            item.sale = self
+            item.subtotal = item.quantity * item.price
+            added += item.subtotal
+        
+        SaleItem.objects.bulk_create(items)
+        Sale.objects.filter(pk=self.pk).update(total_amount=F('total_amount') + added)
+        self.total_amount += added
+        DailyProductSales.record_items(timezone.localdate(self.created_at), items)
+        return items
 
 
 class SaleItem(models.Model):
@@ -121,14 +316,419 @@ class SaleItem(models.Model):
     class Meta:
         verbose_name = "Позиція продажу"
         verbose_name_plural = "Позиції продажу"
+        indexes = [
+            models.Index(fields=['sale', 'product'], name='saleitem_sale_product_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} x{self.quantity} = {self.subtotal} грн"
 
-    def save(self, *args, **kwargs):
-        """Автоматично розраховувати підсумок"""
+    def save(self, *args, update_sale_total=False, **kwargs):
+        """
+        Автоматично розраховувати підсумок.
+        
+        Перерахунок загальної суми продажу - тільки на вимогу (редагування
+        в адмінці); масове додавання позицій іде через Sale.add_items.
+        """
         self.subtotal = self.quantity * self.price
         super().save(*args, **kwargs)
-        # Оновлюємо загальну суму продажу
-        self.sale.total_amount = self.sale.calculate_total()
-        self.sale.save()
+        if update_sale_total:
+            Sale.objects.filter(pk=self.sale_id).update(total_amount=self.sale.calculate_total())
+
+
+class DailyProductSales(models.Model):
+    """Щоденний підсумок продажів товару (інкрементний rollup для звітів)"""
+    date = models.DateField(verbose_name="Дата")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="Товар")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name="Категорія")
+    quantity = models.IntegerField(default=0, verbose_name="Кількість")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Виручка")
+    sale_count = models.IntegerField(default=0, verbose_name="Кількість продажів")
+
+    class Meta:
+        verbose_name = "Денний підсумок продажів товару"
+        verbose_name_plural = "Денні підсумки продажів товарів"
+        ordering = ['date', 'product']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='unique_daily_product_sales'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product.name}: {self.quantity} шт, {self.revenue} грн"
+
+    @classmethod
+    def record_items(cls, day, items):
+        """
+        Додати позиції одного продажу до підсумків дня.
+        
+        Відсутні рядки дня спершу створюються нульовими одним bulk_create
+        (рядки, які встиг створити паралельний продаж, пропускаються), потім
+        усі оновлюються одним bulk_update з F-виразами - кількість запитів не
+        залежить від кількості товарів у продажі, і жоден товар не губиться.
+        """
+        totals = {}
+        for item in items:
+            quantity, revenue = totals.get(item.product_id, (0, Decimal('0')))
+            totals[item.product_id] = (quantity + item.quantity, revenue + item.subtotal)
+        if not totals:
+            return
+        
+        existing = {
+            row.product_id: row
+            for row in cls.objects.filter(date=day, product_id__in=totals.keys()).only('id', 'product_id')
+        }
+        missing = [product_id for product_id in totals if product_id not in existing]
+        if missing:
+            categories = dict(
+                Product.objects.filter(pk__in=missing).values_list('id', 'category_id')
+            )
+            cls.objects.bulk_create(
+                [cls(date=day, product_id=product_id, category_id=categories[product_id]) for product_id in missing],
+                ignore_conflicts=True,
+            )
+            existing.update(
+                (row.product_id, row)
+                for row in cls.objects.filter(date=day, product_id__in=missing).only('id', 'product_id')
+            )
+        
+        rows = []
+        for product_id, row in existing.items():
+            quantity, revenue = totals[product_id]
+            row.quantity = F('quantity') + quantity
+            row.revenue = F('revenue') + revenue
+            row.sale_count = F('sale_count') + 1
+            rows.append(row)
+        cls.objects.bulk_update(rows, ['quantity', 'revenue', 'sale_count'])
+
+    @classmethod
+    def rebuild(cls, since=None, until=None, batch_size=1000):
+        """
+        Перерахунок підсумків з позицій продажів за дні [since, until]
+        (без меж - вся історія). Повертає кількість створених рядків.
+        """
+        items = SaleItem.objects.filter(**date_range_filter('sale__created_at', since, until))
+        rows = items.annotate(day=TruncDate('sale__created_at')).order_by().values(
+            'day', 'product_id', 'product__category_id'
+        ).annotate(
+            total_quantity=Sum('quantity'),
+            total_revenue=Sum('subtotal'),
+            sales=Count('sale_id', distinct=True),
+        )
+        
+        with transaction.atomic():
+            stale = cls.objects.all()
+            if since:
+                stale = stale.filter(date__gte=since)
+            if until:
+                stale = stale.filter(date__lte=until)
+            stale.delete()
+            created = cls.objects.bulk_create(
+                (
+                    cls(
+                        date=row['day'], product_id=row['product_id'],
+                        category_id=row['product__category_id'],
+                        quantity=row['total_quantity'], revenue=row['total_revenue'],
+                        sale_count=row['sales'],
+                    )
+                    for row in rows.iterator()
+                ),
+                batch_size=batch_size,
+            )
+        return len(created)
+
+
+class StockSnapshot(models.Model):
+    """Залишок товару на кінець дня (знімок для звітів "на дату")"""
+    date = models.DateField(verbose_name="Дата")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="Товар")
+    quantity = models.IntegerField(default=0, verbose_name="Залишок")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Створено")
+
+    class Meta:
+        verbose_name = "Знімок залишку"
+        verbose_name_plural = "Знімки залишків"
+        ordering = ['-date', 'product']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='unique_stock_snapshot'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product.name}: {self.quantity}"
+
+    @staticmethod
+    def period_end(day, period=None):
+        """Останній закритий день періоду STOCK_SNAPSHOT_PERIOD, що передує day"""
+        period = period or getattr(settings, 'STOCK_SNAPSHOT_PERIOD', 'day')
+        if period == 'month':
+            return day.replace(day=1) - timedelta(days=1)
+        return day - timedelta(days=1)
+
+    @classmethod
+    def closing_balances(cls, day):
+        """
+        {product_id: залишок на кінець дня day}: матеріалізований баланс мінус
+        операції після цього дня - читається тільки журнал після day.
+        Для архівованих днів - сума архіву до кінця дня.
+        """
+        if StockArchive.covers(day):
+            rows = StockArchive.objects.detailed().filter(
+                created_at__lt=local_day_start(day + timedelta(days=1))
+            ).order_by().values('product_id').annotate(total=Sum(Stock.signed_quantity_expression()))
+            return {row['product_id']: row['total'] for row in rows}
+        
+        balances = dict(ProductStockBalance.objects.values_list('product_id', 'quantity'))
+        later = Stock.objects.filter(
+            created_at__gte=local_day_start(day + timedelta(days=1))
+        ).order_by().values('product_id').annotate(delta=Sum(Stock.signed_quantity_expression()))
+        for row in later:
+            balances[row['product_id']] = balances.get(row['product_id'], 0) - row['delta']
+        return balances
+
+    @classmethod
+    def take(cls, day):
+        """Записати (перезаписати) знімок закритого дня. Повертає кількість рядків"""
+        if day >= timezone.localdate():
+            raise ValueError('Знімок можна зробити тільки для закритого дня')
+        
+        with transaction.atomic():
+            # Спершу запис: у SQLite транзакція одразу бере блокування на запис, і паралельні
+            # знімки чекають його, а не падають з "database is locked" при підвищенні блокування
+            cls.objects.filter(date=day).delete()
+            balances = cls.closing_balances(day)
+            created = cls.objects.bulk_create(
+                cls(date=day, product_id=product_id, quantity=quantity)
+                for product_id, quantity in balances.items()
+            )
+        return len(created)
+
+    @classmethod
+    def ensure_latest(cls):
+        """Дописати знімок останнього закритого періоду, якщо його ще немає (після продажу)"""
+        day = cls.period_end(timezone.localdate())
+        if cls.objects.filter(date=day).exists():
+            return False
+        try:
+            cls.take(day)
+        except IntegrityError:
+            # Паралельний продаж уже записав цей знімок
+            return False
+        except DatabaseError:
+            # Продаж уже зафіксовано - збій знімка не має повертати помилку касиру;
+            # знімок допише наступний продаж або take_stock_snapshots
+            logger.exception('Не вдалося записати знімок залишків за %s', day)
+            return False
+        return True
+
+    @classmethod
+    def invalidate_from(cls, day):
+        """Видалити знімки, що покривають змінену в минулому операцію журналу"""
+        cls.objects.filter(date__gte=day).delete()
+
+    @classmethod
+    def quantity_as_of(cls, as_of):
+        """
+        Вираз залишку товару (для анотації Product) на кінець дня as_of.
+        
+        Береться найближчий знімок не пізніше as_of плюс операції між ними;
+        без такого знімка - поточний баланс мінус операції після as_of.
+        Обсяг журналу, що читається, обмежений відстанню до знімка, а не віком журналу.
+        Для дат до межі архіву (archive_stock_ledger) операції читаються з StockArchive.
+        """
+        boundary = StockArchive.boundary()
+        archived = StockArchive.covers(as_of, boundary)
+        snapshots = cls.objects.filter(date__lte=as_of)
+        if archived:
+            ledger = StockArchive.objects.detailed().filter(product=OuterRef('pk'))
+        else:
+            ledger = Stock.objects.filter(product=OuterRef('pk'))
+            if boundary is not None:
+                # Рядок "залишок на початок" підсумовує все до межі - знімки до неї не поєднуються з ним
+                snapshots = snapshots.filter(date__gte=boundary - timedelta(days=1))
+        
+        snapshot_day = snapshots.aggregate(day=Max('date'))['day']
+        if snapshot_day is not None:
+            base = Subquery(
+                cls.objects.filter(date=snapshot_day, product=OuterRef('pk')).values('quantity')[:1]
+            )
+            ledger = ledger.filter(
+                **date_range_filter('created_at', snapshot_day + timedelta(days=1), as_of)
+            )
+            sign = 1
+        elif archived:
+            base = Value(0)
+            ledger = ledger.filter(**date_range_filter('created_at', None, as_of))
+            sign = 1
+        else:
+            base = F('stock_balance__quantity')
+            ledger = ledger.filter(**date_range_filter('created_at', as_of + timedelta(days=1)))
+            sign = -1
+        
+        delta = Subquery(
+            ledger.order_by().values('product').annotate(
+                total=Sum(Stock.signed_quantity_expression())
+            ).values('total'),
+            output_field=IntegerField(),
+        )
+        return Coalesce(base, Value(0)) + sign * Coalesce(delta, Value(0))
+
+
+class StockArchiveQuerySet(models.QuerySet):
+
+    def detailed(self):
+        """Архівовані операції без рядків "залишок на початок" попередніх архівацій"""
+        return self.exclude(transaction_type='opening')
+
+
+class LedgerArchiveError(Exception):
+    """Архівація змінила б залишки - транзакцію відкочено"""
+
+
+class StockArchive(models.Model):
+    """
+    Архівовані складські операції (archive_stock_ledger).
+    
+    Операції до межі переносяться сюди без змін, а в журналі Stock їх
+    замінює один рядок 'opening' на товар з сумою перенесених операцій.
+    """
+    original_id = models.BigIntegerField(verbose_name="ID операції")
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='archived_stock', verbose_name="Товар"
+    )
+    quantity = models.IntegerField(verbose_name="Кількість")
+    transaction_type = models.CharField(max_length=20, choices=Stock.TRANSACTION_TYPES, verbose_name="Тип операції")
+    notes = models.TextField(blank=True, verbose_name="Примітки")
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+        verbose_name="Створено користувачем"
+    )
+    created_at = models.DateTimeField(verbose_name="Створено")
+    archived_before = models.DateField(verbose_name="Межа архівації")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="Архівовано")
+
+    objects = StockArchiveQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Архівована складська операція"
+        verbose_name_plural = "Архівовані складські операції"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='stockarchive_product_idx'),
+            models.Index(fields=['archived_before'], name='stockarchive_before_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} - {self.quantity} ({self.get_transaction_type_display()}, архів)"
+
+    @classmethod
+    def boundary(cls):
+        """Перший неархівований день (операції до нього - в архіві) або None"""
+        return cls.objects.aggregate(day=Max('archived_before'))['day']
+
+    @classmethod
+    def covers(cls, day, boundary=None):
+        """Чи залишок на кінець дня day рахується тільки з архіву"""
+        boundary = boundary or cls.boundary()
+        return boundary is not None and day < boundary - timedelta(days=1)
+
+    @staticmethod
+    def ledger_balances():
+        """{product_id: залишок за журналом Stock} одним запитом, без нульових"""
+        rows = Product.objects.order_by().with_stock(from_ledger=True).values_list('id', 'stock_quantity')
+        return {product_id: quantity for product_id, quantity in rows if quantity}
+
+    @classmethod
+    def archive_before(cls, day, batch_size=1000):
+        """
+        Перенести операції до початку дня day в архів і замінити їх рядками
+        'opening' (по одному на товар, на останню мить перед межею).
+        
+        Матеріалізований баланс не змінюється: залишки за журналом до і після
+        порівнюються в тій самій транзакції, розбіжність її відкочує.
+        Повертає (перенесено операцій, створено рядків залишку).
+        """
+        if day > timezone.localdate():
+            raise ValueError('Межа архівації не може бути в майбутньому')
+        boundary = cls.boundary()
+        if boundary is not None and day <= boundary:
+            raise ValueError(f'Журнал уже архівовано до {boundary}')
+        
+        cutoff = local_day_start(day)
+        with transaction.atomic():
+            before = cls.ledger_balances()
+            old = Stock.objects.filter(created_at__lt=cutoff)
+            totals = dict(
+                old.order_by().values('product_id').annotate(
+                    total=Sum(Stock.signed_quantity_expression())
+                ).values_list('product_id', 'total')
+            )
+            
+            archived = cls.objects.bulk_create(
+                (
+                    cls(
+                        original_id=row['id'], product_id=row['product_id'], quantity=row['quantity'],
+                        transaction_type=row['transaction_type'], notes=row['notes'],
+                        created_by_id=row['created_by_id'], created_at=row['created_at'],
+                        archived_before=day,
+                    )
+                    for row in old.order_by('created_at', 'id').values(
+                        'id', 'product_id', 'quantity', 'transaction_type',
+                        'notes', 'created_by_id', 'created_at',
+                    ).iterator(chunk_size=batch_size)
+                ),
+                batch_size=batch_size,
+            )
+            # Без сигналів post_delete: архівація не змінює залишків, тому баланс не чіпаємо
+            old._raw_delete(old.db)
+            
+            openings = Stock.objects.bulk_create([
+                Stock(
+                    product_id=product_id, quantity=total, transaction_type='opening',
+                    notes=f'Залишок на {day:%d.%m.%Y} (архів операцій до цієї дати)',
+                )
+                for product_id, total in totals.items() if total
+            ])
+            # auto_now_add ігнорує передане значення - час виставляється окремим UPDATE
+            Stock.objects.filter(pk__in=[row.pk for row in openings]).update(
+                created_at=cutoff - timedelta(microseconds=1)
+            )
+            
+            after = cls.ledger_balances()
+            if after != before:
+                raise LedgerArchiveError(
+                    f'Залишки за журналом змінились для {len(set(before.items()) ^ set(after.items()))} товарів'
+                )
+        return len(archived), len(openings)
+
+    @classmethod
+    def verify(cls):
+        """
+        Розбіжності між архівом і рядками 'opening' журналу:
+        {product_id: (залишок на початок у журналі, сума архіву)}
+        """
+        archived = dict(
+            cls.objects.detailed().order_by().values('product_id').annotate(
+                total=Sum(Stock.signed_quantity_expression())
+            ).values_list('product_id', 'total')
+        )
+        openings = dict(
+            Stock.objects.filter(transaction_type='opening').order_by().values('product_id').annotate(
+                total=Sum('quantity')
+            ).values_list('product_id', 'total')
+        )
+        drift = {}
+        for product_id in archived.keys() | openings.keys():
+            opening, total = openings.get(product_id, 0), archived.get(product_id, 0)
+            if opening != total:
+                drift[product_id] = (opening, total)
+        return drift
+
+
+@receiver(post_delete, sender=Stock)
+def release_stock_balance(sender, instance, origin=None, **kwargs):
+    """Відкат впливу видаленої операції на матеріалізований баланс"""
+    # При видаленні самого товару баланс видаляється каскадно
+    if isinstance(origin, Product):
+        return
+    if isinstance(origin, models.QuerySet) and origin.model is Product:
+        return
+    ProductStockBalance.apply_delta(instance.product_id, -instance.signed_quantity)
@@ -0,0 +1,83 @@
+"""
+Курсорна (keyset) пагінація журнальних списків.
+
+Продажі та складські операції показуються від нових до старих у порядку
+(-created_at, -id). Наступна сторінка - рядки після останнього рядка
+попередньої, тому запит кожної сторінки йде за індексом (created_at, id)
+і не залежить від її номера: без OFFSET та COUNT по всьому журналу.
+Курсор - base64 від "created_at|id" останнього рядка сторінки.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Курсор пошкоджено або сформовано вручну"""
+
+
+def encode_cursor(created_at, pk):
+    raw = f'{created_at.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """(created_at, id) з курсора"""
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+        moment, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(moment), int(pk)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise InvalidCursor(value)
+
+
+class KeysetPage:
+    """Сторінка курсорної пагінації (підмножина інтерфейсу django Page)"""
+    is_keyset = True
+
+    def __init__(self, object_list, cursor, next_cursor):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        """Не перша сторінка (повернення - тільки на початок списку)"""
+        return self.cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Сторінки queryset у порядку (-created_at, -id)"""
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset.order_by('-created_at', '-id')
+        self.per_page = per_page
+
+    def page(self, cursor=None):
+        queryset = self.queryset
+        if cursor:
+            created_at, pk = decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+
+        # Зайвий рядок показує, чи є наступна сторінка
+        rows = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].pk)
+        return KeysetPage(rows, cursor, next_cursor)
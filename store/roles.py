@@ -0,0 +1,88 @@
+"""
+Ролі користувача (групи Django) з кешем.
+
+Назви груп читаються одним запитом і зберігаються на об'єкті користувача,
+тобто живуть рівно один запит (request.user створюється заново для кожного).
+Якщо ROLE_CACHE_TIMEOUT > 0, вони також кешуються між запитами в кеші
+'default'; зміна груп користувача (m2m_changed, в т.ч. UserUpdateView та
+адмінка) видаляє запис після фіксації транзакції.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+CASHIER = 'Касир'
+ADMIN = 'Адміністратор'
+MANAGER = 'Керівник'
+
+
+def _cache_key(user_id):
+    return f'roles:user:{user_id}'
+
+
+def _cache_timeout():
+    return max(0, getattr(settings, 'ROLE_CACHE_TIMEOUT', 0))
+
+
+def _load(user):
+    timeout = _cache_timeout()
+    if timeout:
+        names = cache.get(_cache_key(user.pk))
+        if names is not None:
+            return frozenset(names)
+    
+    names = frozenset(user.groups.values_list('name', flat=True))
+    if timeout:
+        cache.set(_cache_key(user.pk), sorted(names), timeout)
+    return names
+
+
+def group_names(user):
+    """Назви груп користувача (не більше одного запиту на об'єкт користувача)"""
+    if not user.is_authenticated:
+        return frozenset()
+    # getattr/setattr, а не __dict__ - request.user є SimpleLazyObject
+    names = getattr(user, '_role_names', None)
+    if names is None:
+        names = _load(user)
+        user._role_names = names
+    return names
+
+
+def invalidate(user_id):
+    """Скинути кеш ролей користувача між запитами"""
+    cache.delete(_cache_key(user_id))
+
+
+def is_cashier(user):
+    return CASHIER in group_names(user)
+
+
+def is_admin(user):
+    return user.is_superuser or ADMIN in group_names(user)
+
+
+def is_manager(user):
+    return user.is_superuser or MANAGER in group_names(user)
+
+
+class UserRoles:
+    """Ролі для шаблонів: {{ roles.is_admin }}, {{ roles.names }}"""
+
+    def __init__(self, user):
+        self.user = user
+
+    @property
+    def names(self):
+        return sorted(group_names(self.user))
+
+    @property
+    def is_cashier(self):
+        return is_cashier(self.user)
+
+    @property
+    def is_admin(self):
+        return is_admin(self.user)
+
+    @property
+    def is_manager(self):
+        return is_manager(self.user)
@@ -0,0 +1,140 @@
+"""
+Сервісний шар для операцій, що змінюють кілька моделей одночасно
+"""
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Product, ProductStockBalance, Stock, StockSnapshot, Sale, SaleItem
+from .analytics import daemon as analytics_daemon
+
+
+class CheckoutError(Exception):
+    """Помилка оформлення продажу (повідомлення показується користувачу)"""
+
+
+class InsufficientStockError(CheckoutError):
+    """Недостатньо товару на складі"""
+
+    def __init__(self, product, available):
+        self.product = product
+        self.available = available
+        super().__init__(
+            f'Недостатньо товару "{product.name}" на складі. Доступно: {available}'
+        )
+
+
+class _ReservationFailed(Exception):
+    """Умовний UPDATE зарезервував не всі товари кошика"""
+
+
+def _parse_basket(items_data):
+    """Нормалізація позицій кошика: [(product_id, quantity, price), ...]"""
+    # JSON-скаляр або об'єкт замість списку позицій (items=5, items={...})
+    if not isinstance(items_data, list):
+        raise CheckoutError('Некоректні дані продажу')
+    lines = []
+    for item_data in items_data:
+        try:
+            product_id = int(item_data['product_id'])
+            quantity = int(item_data['quantity'])
+            price = Decimal(str(item_data['price'])).quantize(Decimal('0.01'))
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            raise CheckoutError('Некоректні дані позиції продажу')
+        if quantity <= 0 or price <= 0:
+            raise CheckoutError('Кількість та ціна мають бути більше 0')
+        lines.append((product_id, quantity, price))
+    if not lines:
+        raise CheckoutError('Продаж не містить жодної позиції')
+    return lines
+
+
+def _shortfall_error(products, requested):
+    """Помилка для кошика, який не вдалося зарезервувати (після відкату транзакції)"""
+    available = dict(
+        ProductStockBalance.objects.filter(product_id__in=requested.keys()).values_list(
+            'product_id', 'quantity'
+        )
+    )
+    for product_id, quantity in requested.items():
+        if available.get(product_id, 0) < quantity:
+            return InsufficientStockError(products[product_id], available.get(product_id, 0))
+    # Залишок поповнили між резервуванням і перевіркою - продаж однаково не проведено
+    return CheckoutError('Залишки змінилися під час оформлення продажу, спробуйте ще раз')
+
+
+def checkout(user, items_data):
+    """
+    Атомарне оформлення продажу.
+
+    Весь кошик перевіряється одним запитом, після чого в одній транзакції
+    залишки резервуються одним умовним UPDATE на рядках ProductStockBalance
+    (quantity >= потрібної кількості), а позиції та Stock записуються
+    пакетно (Sale.add_items), тому кількість запитів не залежить від
+    розміру кошика. Якщо хоча б одну позицію не вдалося зарезервувати -
+    транзакція відкочується повністю, тому паралельні каси не можуть
+    продати один і той самий останній товар.
+    """
+    lines = _parse_basket(items_data)
+
+    # Сумарна потреба по кожному товару (товар може бути в кількох рядках)
+    requested = OrderedDict()
+    for product_id, quantity, _ in lines:
+        requested[product_id] = requested.get(product_id, 0) + quantity
+
+    # Перевірка всього кошика одним запитом
+    products = Product.objects.filter(
+        pk__in=requested.keys(), is_active=True
+    ).with_stock().in_bulk()
+    if len(products) != len(requested):
+        raise CheckoutError('Товар не знайдено або він неактивний')
+
+    for product_id, quantity in requested.items():
+        product = products[product_id]
+        if quantity > product.stock_quantity:
+            raise InsufficientStockError(product, product.stock_quantity)
+
+    try:
+        with transaction.atomic():
+            # Резервування всього кошика одним умовним UPDATE: рядок зменшується,
+            # тільки якщо залишку вистачає; оновлено менше рядків - відкат усього продажу
+            needed = Case(
+                *(When(product_id=product_id, then=Value(quantity)) for product_id, quantity in requested.items()),
+                output_field=IntegerField(),
+            )
+            reserved = ProductStockBalance.objects.filter(
+                product_id__in=requested.keys(), quantity__gte=needed
+            ).update(quantity=F('quantity') - needed)
+            if reserved != len(requested):
+                # Частину рядків уже зменшено - виняток відкочує все резервування
+                raise _ReservationFailed
+
+            sale = Sale.objects.create(user=user, total_amount=0)
+            sale.add_items(
+                SaleItem(product_id=product_id, quantity=quantity, price=price)
+                for product_id, quantity, price in lines
+            )
+
+            # Баланс уже зменшено резервуванням, тому bulk_create (без Stock.save)
+            Stock.objects.bulk_create([
+                Stock(
+                    product_id=product_id,
+                    quantity=quantity,
+                    transaction_type='out',
+                    notes=f'Продаж #{sale.id}',
+                    created_by=user,
+                )
+                for product_id, quantity, _ in lines
+            ])
+
+            # Дельта для резидентного демона аналітики - тільки після фіксації
+            transaction.on_commit(lambda: analytics_daemon.append_sales([sale.id]))
+            # Перший продаж нового періоду дописує знімок залишків на кінець попереднього
+            transaction.on_commit(StockSnapshot.ensure_latest)
+    except _ReservationFailed:
+        # Нестача визначається за залишками після відкату, а не за щойно зменшеними рядками
+        raise _shortfall_error(products, requested) from None
+
+    return sale
@@ -0,0 +1,91 @@
+"""
+Обробники сигналів моделей, що підтримують похідні дані
+(кеш аналітики, денні підсумки продажів, знімки залишків, кеш ролей)
+"""
+from django.db import transaction
+from django.db.models import QuerySet
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import roles
+from .models import Category, Sale, SaleItem, DailyProductSales, Product, Stock, StockSnapshot
+from .analytics import cache as analytics_cache
+from .analytics import daemon as analytics_daemon
+
+
+def _invalidate_sale_day(created_at, refresh_rollup=False, reset_daemon=True):
+    if created_at is None:
+        return
+    day = timezone.localdate(created_at)
+    if refresh_rollup:
+        # Зміни поза Sale.add_items (адмінка, видалення) - підсумки дня перераховуються
+        transaction.on_commit(lambda: DailyProductSales.rebuild(since=day, until=day))
+    if reset_daemon:
+        # Демон приймає тільки нові продажі (дельти checkout) - інші зміни потребують
+        # повного перезавантаження; після перерахунку підсумків (порядок on_commit)
+        transaction.on_commit(analytics_daemon.reset)
+    # Після коміту - щоб паралельний запит не закешував дані до фіксації транзакції
+    transaction.on_commit(lambda: analytics_cache.invalidate_day(day))
+
+
+@receiver(post_save, sender=Sale)
+@receiver(post_delete, sender=Sale)
+def invalidate_analytics_for_sale(sender, instance, created=False, **kwargs):
+    # Новий продаж checkout передається демону дельтою (services.checkout)
+    _invalidate_sale_day(instance.created_at, reset_daemon=not created)
+
+
+@receiver(post_save, sender=SaleItem)
+@receiver(post_delete, sender=SaleItem)
+def invalidate_analytics_for_sale_item(sender, instance, created=False, **kwargs):
+    # При каскадному видаленні продажу рядок Sale ще існує (позиції видаляються першими)
+    created_at = Sale.objects.filter(pk=instance.sale_id).values_list('created_at', flat=True).first()
+    if created and created_at is not None:
+        # Нова позиція поза add_items - інкрементальне оновлення, як у add_items
+        DailyProductSales.record_items(timezone.localdate(created_at), [instance])
+        _invalidate_sale_day(created_at)
+    else:
+        _invalidate_sale_day(created_at, refresh_rollup=True)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def reset_daemon_for_catalog(sender, instance, created=False, **kwargs):
+    # Назви товарів і категорій демон отримує тільки в LOAD та дельтах нових продажів -
+    # перейменування чи видалення потребує повного перезавантаження
+    if not created:
+        transaction.on_commit(analytics_daemon.reset)
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def invalidate_stock_snapshots(sender, instance, created=False, origin=None, **kwargs):
+    # Нові операції датуються сьогодні й закритих знімків не зачіпають;
+    # при видаленні товару його знімки видаляються каскадно
+    if created or instance.created_at is None or isinstance(origin, Product):
+        return
+    if isinstance(origin, QuerySet) and origin.model is Product:
+        return
+    day = timezone.localdate(instance.created_at)
+    if day < timezone.localdate():
+        transaction.on_commit(lambda: StockSnapshot.invalidate_from(day))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_user_roles(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # group.user_set.add(...) - instance є групою; при clear pk_set невідомий,
+        # записи таких користувачів доживають до ROLE_CACHE_TIMEOUT
+        user_ids = pk_set or ()
+    else:
+        user_ids = [instance.pk]
+        # Об'єкт користувача в цьому запиті теж перечитає групи
+        instance.__dict__.pop('_role_names', None)
+    for user_id in user_ids:
+        transaction.on_commit(lambda user_id=user_id: roles.invalidate(user_id))
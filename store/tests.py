@@ -1,3 +1,954 @@
-from django.test import TestCase
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import Mock, patch
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Count, QuerySet, Sum
+from django.db.models.functions import TruncDate
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import roles
+from .analytics import cache as analytics_cache
+from .analytics import daemon, fetch_sales_columns, native, numpy_backend, parity, pool, runner, sqlite_source, stream
+from .models import (
+    LOW_STOCK_THRESHOLD, Category, DailyProductSales, Product, ProductStockBalance, Sale, SaleItem,
+    Stock, StockArchive, StockSnapshot,
+)
+from .pagination import KeysetPaginator
+from .services import CheckoutError, InsufficientStockError, checkout
+from .utils import local_day_start
+from .views import SaleListView, StockListView, _run_cpp_analytics
+
+
+def create_product(name='Товар', price='10.00', stock=0):
+    category, _ = Category.objects.get_or_create(name='Категорія')
+    product = Product.objects.create(name=name, category=category, price=Decimal(price))
+    if stock:
+        Stock.objects.create(product=product, quantity=stock, transaction_type='in')
+    return product
+
+
+def check_stock_balances():
+    """rebuild_stock_balances --check: CommandError, якщо баланс розходиться з журналом"""
+    call_command('rebuild_stock_balances', check=True, stdout=StringIO())
+
+
+class ProductStockBalanceTest(TestCase):
+    """Матеріалізований баланс відповідає складському журналу після будь-яких змін"""
+
+    def balance(self, product):
+        return ProductStockBalance.objects.get(product=product).quantity
+
+    def test_create_edit_delete(self):
+        product = create_product(stock=20)
+        other = create_product('Інший')
+        sold = Stock.objects.create(product=product, quantity=5, transaction_type='out')
+        Stock.objects.create(product=product, quantity=-2, transaction_type='adjustment')
+        self.assertEqual(self.balance(product), 13)
+        self.assertEqual(product.current_stock, 13)
+
+        sold.quantity = 7
+        sold.save()
+        self.assertEqual(self.balance(product), 11)
+
+        # Операція переходить на інший товар - баланс першого повертається
+        sold.product = other
+        sold.save()
+        self.assertEqual(self.balance(product), 18)
+        self.assertEqual(self.balance(other), -7)
+
+        sold.delete()
+        self.assertEqual(self.balance(other), 0)
+        check_stock_balances()
+
+    def test_product_delete_cascades(self):
+        product = create_product(stock=5)
+        product.delete()
+        self.assertFalse(ProductStockBalance.objects.exists())
+
+    def test_rebuild_fixes_drift(self):
+        product = create_product(stock=20)
+        missing = create_product('Без балансу', stock=4)
+        ProductStockBalance.objects.filter(product=product).update(quantity=999)
+        ProductStockBalance.objects.filter(product=missing).delete()
+
+        with self.assertRaises(CommandError):
+            check_stock_balances()
+        call_command('rebuild_stock_balances', stdout=StringIO())
+
+        self.assertEqual(self.balance(product), 20)
+        self.assertEqual(self.balance(missing), 4)
+        check_stock_balances()
+
+
+class ProductStockAnnotationTest(TestCase):
+    """with_stock() та low_stock(): залишок, вартість і низький залишок одним запитом"""
+
+    def setUp(self):
+        self.plenty = create_product('Багато', price='2.50', stock=LOW_STOCK_THRESHOLD + 5)
+        self.few = create_product('Мало', price='4.00', stock=3)
+        self.empty = create_product('Немає', price='7.00')
+        self.negative = create_product('Мінус', price='1.00', stock=2)
+        Stock.objects.create(product=self.negative, quantity=5, transaction_type='out')
+
+    def test_with_stock(self):
+        with self.assertNumQueries(1):
+            products = {product.pk: product for product in Product.objects.with_stock()}
+        expected = {
+            self.plenty.pk: (LOW_STOCK_THRESHOLD + 5, Decimal('37.50'), False),
+            self.few.pk: (3, Decimal('12.00'), True),
+            self.empty.pk: (0, Decimal('0'), True),
+            self.negative.pk: (-3, Decimal('0'), True),
+        }
+        for pk, (quantity, value, low) in expected.items():
+            with self.subTest(product=products[pk].name):
+                self.assertEqual(products[pk].stock_quantity, quantity)
+                self.assertEqual(products[pk].stock_value, value)
+                self.assertIs(products[pk].is_low_stock, low)
+                self.assertEqual(products[pk].current_stock, quantity)
+
+    def test_ledger_matches_balance(self):
+        balance = dict(Product.objects.with_stock().values_list('id', 'stock_quantity'))
+        ledger = dict(Product.objects.with_stock(from_ledger=True).values_list('id', 'stock_quantity'))
+        self.assertEqual(balance, ledger)
+
+    def test_low_stock(self):
+        names = list(Product.objects.low_stock().values_list('name', flat=True))
+        self.assertEqual(names, ['Мінус', 'Немає', 'Мало'])
+
+
+class CheckoutValidationTest(TestCase):
+    """Некоректний кошик - CheckoutError, а не 500"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cashier')
+
+    def test_scalar_items(self):
+        for items in (5, 'abc', None, {'product_id': 1}):
+            with self.subTest(items=items):
+                with self.assertRaises(CheckoutError):
+                    checkout(self.user, items)
+
+    def test_malformed_line(self):
+        with self.assertRaises(CheckoutError):
+            checkout(self.user, ['abc'])
+
+
+class ConcurrentCheckoutTest(TransactionTestCase):
+    """Паралельні каси не продають більше, ніж є на складі"""
+    THREADS = 12
+    QUANTITY = 3
+    STOCK = 20
+
+    def test_no_oversell(self):
+        product = create_product(stock=self.STOCK)
+        users = [User.objects.create_user(f'cashier{i}') for i in range(self.THREADS)]
+        basket = [{'product_id': product.id, 'quantity': self.QUANTITY, 'price': '10.00'}]
+
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+        lock = threading.Lock()
+
+        def worker(user):
+            try:
+                barrier.wait()
+                try:
+                    outcome = checkout(user, basket)
+                except InsufficientStockError as e:
+                    outcome = e
+                with lock:
+                    results.append(outcome)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        sold = [result for result in results if isinstance(result, Sale)]
+        rejected = [result for result in results if isinstance(result, InsufficientStockError)]
+        self.assertEqual(len(results), self.THREADS)
+        self.assertEqual(len(sold), self.STOCK // self.QUANTITY)
+        self.assertEqual(len(rejected), self.THREADS - len(sold))
+
+        balance = ProductStockBalance.objects.get(product=product).quantity
+        self.assertGreaterEqual(balance, 0)
+        self.assertEqual(balance, self.STOCK % self.QUANTITY)
+        # Матеріалізований баланс збігається з журналом
+        check_stock_balances()
+
+    def test_shortfall_in_multi_line_basket(self):
+        coffee = create_product('Кава', stock=10)
+        tea = create_product('Чай', stock=10)
+        user = User.objects.create_user('cashier')
+        basket = [
+            {'product_id': coffee.id, 'quantity': 6, 'price': '10.00'},
+            {'product_id': tea.id, 'quantity': 2, 'price': '10.00'},
+        ]
+        in_bulk = QuerySet.in_bulk
+
+        def checked_then_sold(queryset, *args, **kwargs):
+            result = in_bulk(queryset, *args, **kwargs)
+            # Інша каса продала чай між перевіркою кошика і резервуванням
+            ProductStockBalance.objects.filter(product=tea).update(quantity=1)
+            return result
+
+        with patch.object(QuerySet, 'in_bulk', checked_then_sold):
+            with self.assertRaises(InsufficientStockError) as raised:
+                checkout(user, basket)
+        # Помилка називає чай, а не каву, залишок якої встиг зменшитись до відкату
+        self.assertEqual(raised.exception.product, tea)
+        self.assertEqual(raised.exception.available, 1)
+        self.assertEqual(ProductStockBalance.objects.get(product=coffee).quantity, 10)
+        self.assertFalse(Sale.objects.exists())
+
+
+class CheckoutQueryCountTest(TestCase):
+    """Кількість запитів checkout не залежить від розміру кошика"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cashier')
+
+    def _basket(self, lines):
+        products = [create_product(f'Товар {lines}-{i}', stock=100) for i in range(lines)]
+        return [{'product_id': product.id, 'quantity': 2, 'price': '10.00'} for product in products]
+
+    def _count_queries(self, basket):
+        with CaptureQueriesContext(connection) as captured:
+            checkout(self.user, basket)
+        return len(captured)
+
+    def test_constant_queries(self):
+        counts = {lines: self._count_queries(self._basket(lines)) for lines in (1, 10, 50)}
+        self.assertEqual(len(set(counts.values())), 1, counts)
+        basket = self._basket(50)
+        with self.assertNumQueries(counts[1]):
+            checkout(self.user, basket)
+
+    def test_total_after_add_items(self):
+        product = create_product(stock=100)
+        sale = Sale.objects.create(user=self.user)
+        sale.add_items([
+            SaleItem(product=product, quantity=3, price=Decimal('10.50')),
+            SaleItem(product=product, quantity=1, price=Decimal('2.25')),
+        ])
+        sale.add_items([SaleItem(product=product, quantity=2, price=Decimal('1.00'))])
+
+        self.assertEqual(sale.total_amount, Decimal('35.75'))
+        sale.refresh_from_db()
+        self.assertEqual(sale.total_amount, Decimal('35.75'))
+        self.assertEqual(sale.total_amount, sale.calculate_total())
+
+
+def seed_sales(user, days=4):
+    """Фіксований набір продажів за кілька днів до сьогодні"""
+    category = Category.objects.create(name='Напої')
+    other = Category.objects.create(name='Снеки')
+    products = [
+        Product.objects.create(name='Кава', category=category, price=Decimal('45.50')),
+        Product.objects.create(name='Чай', category=category, price=Decimal('30.00')),
+        Product.objects.create(name='Чипси', category=other, price=Decimal('27.25')),
+    ]
+    for product in products:
+        Stock.objects.create(product=product, quantity=1000, transaction_type='in')
+
+    today = timezone.localdate()
+    for offset in range(days):
+        for i, product in enumerate(products):
+            sale = checkout(user, [
+                {'product_id': product.id, 'quantity': offset + i + 1, 'price': str(product.price)},
+                {'product_id': products[0].id, 'quantity': 1, 'price': '45.50'},
+            ])
+            day_start = timezone.make_aware(datetime.combine(today - timedelta(days=offset), datetime.min.time()))
+            Sale.objects.filter(pk=sale.pk).update(created_at=day_start + timedelta(hours=9 + i))
+    # update() обходить сигнали - підсумки днів перераховуються з позицій
+    DailyProductSales.rebuild()
+    return today - timedelta(days=days + 1), today
+
+
+ENGINE_EXECUTABLE = os.path.join(settings.BASE_DIR, 'cpp_analytics', 'analytics')
+
+
+class AnalyticsParityTest(TransactionTestCase):
+    """C++ модуль (бібліотека та процес) дає ті самі показники, що й NumPy-бекенд"""
+
+    def setUp(self):
+        self.date_from, self.date_to = seed_sales(User.objects.create_user('cashier'))
+        self.columns = fetch_sales_columns(self.date_from, self.date_to)
+        self.reference = numpy_backend.compute(self.columns)
+
+    def assertSameResult(self, result):
+        self.assertNotIn('error', result)
+        self.assertEqual(parity.diff(result, self.reference), [])
+
+    def test_reference(self):
+        self.assertEqual(self.reference['statistics']['total_sales'], 12)
+
+    @unittest.skipUnless(native.is_available(), 'libanalytics.so не зібрано')
+    def test_library(self):
+        self.assertSameResult(native.run_columnar(self.columns))
+
+    @unittest.skipUnless(os.path.exists(ENGINE_EXECUTABLE), 'cpp_analytics/analytics не зібрано')
+    def test_executable(self):
+        self.assertSameResult(stream.run_executable(ENGINE_EXECUTABLE, self.date_from, self.date_to))
+
+    @unittest.skipUnless(os.path.exists(ENGINE_EXECUTABLE), 'cpp_analytics/analytics не зібрано')
+    def test_executable_async(self):
+        # Кожен рядок потоку - окремий запис у stdin
+        with patch.object(stream, 'iter_batches', stream.iter_lines):
+            result = async_to_sync(stream.run_executable_async)(ENGINE_EXECUTABLE, self.date_from, self.date_to)
+        self.assertSameResult(result)
+
+    @unittest.skipUnless(os.path.exists(ENGINE_EXECUTABLE), 'cpp_analytics/analytics не зібрано')
+    @override_settings(ANALYTICS_POOL_SIZE=0)
+    def test_runner_streams_without_sqlite(self):
+        fallback = Mock()
+        with patch.object(sqlite_source, 'database_path', return_value=None), \
+                patch.object(native, 'is_available', return_value=False):
+            result = async_to_sync(runner._compute)(self.date_from, self.date_to, fallback)
+        # Потоковий шлях - у циклі подій, а не синхронний fallback у потоці
+        fallback.assert_not_called()
+        self.assertSameResult(result)
+
+
+class AnalyticsCacheKeyTest(TestCase):
+    """Покоління днів створюються тільки для днів з продажами"""
+
+    def setUp(self):
+        self.cache = analytics_cache.get_cache()
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+        self.user = User.objects.create_user('cashier')
+        self.product = create_product(stock=100)
+        self.today = timezone.localdate()
+
+    def sell(self, day):
+        sale = checkout(self.user, [{'product_id': self.product.id, 'quantity': 1, 'price': '10.00'}])
+        Sale.objects.filter(pk=sale.pk).update(created_at=local_day_start(day) + timedelta(hours=12))
+
+    def test_wide_range_bounded(self):
+        self.sell(self.today - timedelta(days=2))
+        self.sell(self.today)
+        analytics_cache.cache_key(self.today - timedelta(days=365 * 50), self.today + timedelta(days=365))
+        day_keys = [key for key in self.cache._cache if ':analytics:day:' in key]
+        self.assertEqual(len(day_keys), 3)
+
+    def test_sale_outside_span_changes_key(self):
+        date_from, date_to = self.today - timedelta(days=30), self.today
+        empty = analytics_cache.cache_key(date_from, date_to)
+        self.sell(self.today - timedelta(days=5))
+        first = analytics_cache.cache_key(date_from, date_to)
+        self.assertNotEqual(first, empty)
+        # Новий день поза межами, день якого ще не мав покоління
+        self.sell(self.today - timedelta(days=20))
+        self.assertNotEqual(analytics_cache.cache_key(date_from, date_to), first)
+
+
+    def test_file_cache_counts_per_process(self):
+        self.assertEqual(analytics_cache.stats()['counters'], 'cache')
+        with tempfile.TemporaryDirectory() as directory:
+            file_cache = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}
+            with override_settings(CACHES={**settings.CACHES, 'analytics': file_cache}):
+                before = analytics_cache.stats()
+                analytics_cache.lookup(self.today, self.today)
+                after = analytics_cache.stats()
+                # incr файлового кешу не атомарний між процесами - лічильники не пишуться у файли
+                self.assertIsNone(analytics_cache.get_cache().get(analytics_cache.MISSES_KEY))
+        self.assertEqual(after['counters'], 'process')
+        self.assertEqual(after['misses'], before['misses'] + 1)
+        self.assertEqual(after['hits'], before['hits'])
+
+
+class DailyProductSalesTest(TestCase):
+    """Денні підсумки (інкрементні та перераховані) збігаються з позиціями продажів"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cashier')
+        self.coffee = create_product('Кава', price='45.50', stock=100)
+        self.tea = create_product('Чай', price='30.00', stock=100)
+
+    def rollup(self):
+        return {
+            (row.date, row.product_id): (row.quantity, row.revenue, row.sale_count)
+            for row in DailyProductSales.objects.all()
+        }
+
+    def from_items(self):
+        rows = SaleItem.objects.annotate(day=TruncDate('sale__created_at')).order_by().values(
+            'day', 'product_id'
+        ).annotate(quantity=Sum('quantity'), revenue=Sum('subtotal'), sales=Count('sale_id', distinct=True))
+        return {
+            (row['day'], row['product_id']): (row['quantity'], row['revenue'], row['sales'])
+            for row in rows
+        }
+
+    def test_incremental_matches_items(self):
+        checkout(self.user, [
+            {'product_id': self.coffee.id, 'quantity': 2, 'price': '45.50'},
+            # Той самий товар у двох рядках - один продаж у sale_count
+            {'product_id': self.coffee.id, 'quantity': 1, 'price': '40.00'},
+            {'product_id': self.tea.id, 'quantity': 3, 'price': '30.00'},
+        ])
+        checkout(self.user, [{'product_id': self.tea.id, 'quantity': 1, 'price': '29.99'}])
+
+        today = timezone.localdate()
+        self.assertEqual(self.rollup(), {
+            (today, self.coffee.id): (3, Decimal('131.00'), 1),
+            (today, self.tea.id): (4, Decimal('119.99'), 2),
+        })
+        self.assertEqual(self.rollup(), self.from_items())
+
+        DailyProductSales.rebuild()
+        self.assertEqual(self.rollup(), self.from_items())
+
+    def test_edit_and_delete_refresh_day(self):
+        sale = checkout(self.user, [
+            {'product_id': self.coffee.id, 'quantity': 2, 'price': '45.50'},
+            {'product_id': self.tea.id, 'quantity': 1, 'price': '30.00'},
+        ])
+        checkout(self.user, [{'product_id': self.tea.id, 'quantity': 2, 'price': '30.00'}])
+
+        # Редагування позиції (адмінка) перераховує підсумки дня після коміту
+        item = sale.saleitem_set.get(product=self.coffee)
+        with self.captureOnCommitCallbacks(execute=True):
+            item.quantity = 5
+            item.save(update_sale_total=True)
+        self.assertEqual(self.rollup(), self.from_items())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sale.delete()
+        self.assertEqual(self.rollup(), self.from_items())
+        self.assertFalse(DailyProductSales.objects.filter(product=self.coffee).exists())
+
+
+    def test_row_created_by_concurrent_sale(self):
+        today = timezone.localdate()
+        product_filter = Product.objects.filter
+
+        def concurrent_sale(*args, **kwargs):
+            # Паралельний продаж створює рядок кави між читанням наявних рядків і bulk_create
+            if not DailyProductSales.objects.filter(date=today).exists():
+                DailyProductSales.objects.create(
+                    date=today, product=self.coffee, category=self.coffee.category,
+                    quantity=1, revenue=Decimal('45.50'), sale_count=1,
+                )
+            return product_filter(*args, **kwargs)
+
+        with patch.object(Product.objects, 'filter', concurrent_sale):
+            DailyProductSales.record_items(today, [
+                SaleItem(product=self.coffee, quantity=2, subtotal=Decimal('91.00')),
+                SaleItem(product=self.tea, quantity=1, subtotal=Decimal('30.00')),
+            ])
+        self.assertEqual(self.rollup(), {
+            (today, self.coffee.id): (3, Decimal('136.50'), 2),
+            (today, self.tea.id): (1, Decimal('30.00'), 1),
+        })
+
+
+class ConcurrentDailyProductSalesTest(TransactionTestCase):
+    """Паралельні продажі першого дня створюють підсумки для всіх товарів"""
+    THREADS = 8
+
+    def test_new_day(self):
+        common = create_product('Кава', stock=100)
+        own = [create_product(f'Товар {i}', stock=100) for i in range(self.THREADS)]
+        users = [User.objects.create_user(f'cashier{i}') for i in range(self.THREADS)]
+        barrier = threading.Barrier(self.THREADS)
+        errors = []
+
+        def worker(user, product):
+            try:
+                barrier.wait()
+                checkout(user, [
+                    {'product_id': common.id, 'quantity': 1, 'price': '10.00'},
+                    {'product_id': product.id, 'quantity': 2, 'price': '10.00'},
+                ])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=args) for args in zip(users, own)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        today = timezone.localdate()
+        rows = {
+            row.product_id: (row.quantity, row.revenue, row.sale_count)
+            for row in DailyProductSales.objects.filter(date=today)
+        }
+        expected = {product.id: (2, Decimal('20.00'), 1) for product in own}
+        expected[common.id] = (self.THREADS, Decimal('10.00') * self.THREADS, self.THREADS)
+        self.assertEqual(rows, expected)
+
+
+@unittest.skipUnless(os.path.exists(ENGINE_EXECUTABLE), 'cpp_analytics/analytics не зібрано')
+class ColumnarStreamValidationTest(unittest.TestCase):
+    """Некоректне числове поле колонкового потоку - помилка з номером рядка, а не 0"""
+
+    def run_engine(self, item_fields):
+        document = '\n'.join([
+            stream.HEADER,
+            'P\t1\tКава',
+            'C\t1\tНапої',
+            'S\t1\t2026-01-01\t10.00',
+            'I\t1\t1\t1\t' + item_fields,
+        ]) + '\n'
+        output = subprocess.run(
+            [ENGINE_EXECUTABLE], input=document, capture_output=True, text=True, encoding='utf-8', timeout=10,
+        ).stdout
+        return json.loads(output)
+
+    def test_valid(self):
+        self.assertNotIn('error', self.run_engine('2\t5.00\t10.00'))
+
+    def test_malformed_numbers(self):
+        for fields in ('12abc\t5.00\t10.00', 'abc\t5.00\t10.00', '2\t5.00x\t10.00', '2\t\t10.00'):
+            with self.subTest(fields=fields):
+                error = self.run_engine(fields).get('error', '')
+                self.assertTrue(error.startswith('Line 5: '), error)
+
+
+@unittest.skipUnless(os.path.exists(ENGINE_EXECUTABLE), 'cpp_analytics/analytics не зібрано')
+@override_settings(ANALYTICS_POOL_SIZE=0)
+class AnalyticsDaemonTest(TransactionTestCase):
+    """Демон на тимчасовому сокеті: дельти, RESET та відмова демона"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cashier')
+        self.date_from, self.date_to = seed_sales(self.user)
+
+    def reference(self):
+        return numpy_backend.compute(fetch_sales_columns(self.date_from, self.date_to))
+
+    def test_duplicate_append_ignored(self):
+        with parity.local_daemon(ENGINE_EXECUTABLE):
+            result = daemon.query(self.date_from, self.date_to)
+            self.assertEqual(parity.diff(result, self.reference()), [])
+
+            last_sale = Sale.objects.order_by('-id').values_list('id', flat=True).first()
+            daemon.append_sales([last_sale])
+            daemon.append_sales([last_sale])
+            self.assertEqual(daemon.query(self.date_from, self.date_to), result)
+
+    def test_repeated_load_keeps_appended_sales(self):
+        with parity.local_daemon(ENGINE_EXECUTABLE):
+            epoch = daemon.request('PING')['epoch']
+            # Набір, який інший клієнт зібрав до нового продажу
+            stale = ''.join(stream.iter_lines(None, None))
+            self.assertTrue(daemon.load(epoch))
+
+            product = Product.objects.get(name='Чай')
+            checkout(self.user, [{'product_id': product.id, 'quantity': 2, 'price': '30.00'}])
+
+            # Те саме LOAD після APPEND нового продажу відхиляється, а не замінює набір
+            self.assertFalse(daemon.request(f'LOAD {epoch}\n{stale}')['ok'])
+            result = daemon.query(self.date_from, self.date_to)
+        self.assertEqual(parity.diff(result, self.reference()), [])
+
+    def test_history_in_small_chunks(self):
+        with parity.local_daemon(ENGINE_EXECUTABLE):
+            epoch = daemon.request('PING')['epoch']
+            lines = ''.join(stream.iter_history_lines(chunk_size=2))
+            self.assertTrue(daemon.request(f'LOAD {epoch}\n{lines}')['ok'])
+            result = daemon.query(self.date_from, self.date_to)
+        self.assertEqual(parity.diff(result, self.reference()), [])
+
+    def test_product_rename_resets(self):
+        with parity.local_daemon(ENGINE_EXECUTABLE):
+            daemon.query(self.date_from, self.date_to)
+            product = Product.objects.get(name='Чай')
+            product.name = 'Зелений чай'
+            product.save()
+            result = daemon.query(self.date_from, self.date_to)
+        self.assertIn('Зелений чай', json.dumps(result, ensure_ascii=False))
+        self.assertEqual(parity.diff(result, self.reference()), [])
+
+    def test_reset_after_edit_matches_fresh_load(self):
+        with parity.local_daemon(ENGINE_EXECUTABLE):
+            before = daemon.query(self.date_from, self.date_to)
+
+            # Редагування позиції: сигнали перераховують підсумки дня та надсилають RESET
+            item = SaleItem.objects.order_by('id').first()
+            item.quantity += 5
+            item.save(update_sale_total=True)
+
+            edited = daemon.query(self.date_from, self.date_to)
+            self.assertNotEqual(edited, before)
+
+        with parity.local_daemon(ENGINE_EXECUTABLE):
+            fresh = daemon.query(self.date_from, self.date_to)
+        self.assertEqual(parity.diff(edited, fresh), [])
+        self.assertEqual(parity.diff(edited, self.reference()), [])
+
+    def test_killed_daemon_falls_back(self):
+        with parity.local_daemon(ENGINE_EXECUTABLE) as process:
+            daemon.query(self.date_from, self.date_to)
+            # Сокет лишається на диску, а з'єднання в пулі - обірване
+            process.kill()
+            process.wait()
+
+            result = _run_cpp_analytics(self.date_from, self.date_to)
+        self.assertNotIn('error', result)
+        self.assertEqual(parity.diff(result, self.reference()), [])
+
+
+@unittest.skipUnless(os.path.exists(ENGINE_EXECUTABLE), 'cpp_analytics/analytics не зібрано')
+@override_settings(ANALYTICS_POOL_SIZE=1)
+class AnalyticsPoolTest(TransactionTestCase):
+    """Воркер пулу: колонковий потік частинами та таймаут запису"""
+
+    def tearDown(self):
+        pool.close()
+
+    def test_stream_in_chunks(self):
+        date_from, date_to = seed_sales(User.objects.create_user('cashier'))
+        # Кожен рядок потоку - окрема частина кадру
+        with patch.object(stream, 'iter_batches', stream.iter_lines):
+            result = pool.run_stream(date_from, date_to)
+        reference = numpy_backend.compute(fetch_sales_columns(date_from, date_to))
+        self.assertEqual(parity.diff(result, reference), [])
+        # Воркер дочитав кадр і обслуговує наступні запити
+        self.assertEqual(parity.diff(pool.run_stream(date_from, date_to), reference), [])
+
+    def test_write_timeout(self):
+        with tempfile.TemporaryDirectory() as directory:
+            executable = os.path.join(directory, 'stalled')
+            with open(executable, 'w') as script:
+                script.write('#!/bin/sh\nsleep 30\n')
+            os.chmod(executable, 0o755)
+            worker = pool.EngineWorker(executable)
+            try:
+                started = time.monotonic()
+                with self.assertRaises(TimeoutError):
+                    worker.exchange(b'x' * (4 << 20), 0.5)
+                self.assertLess(time.monotonic() - started, 5)
+            finally:
+                worker.process.kill()
+                worker.close()
+
+
+class KeysetPaginationTest(TestCase):
+    """Курсорні сторінки: без пропусків і повторів, у т.ч. при однаковому created_at"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin')
+        product = create_product(stock=100)
+        self.sales = [Sale.objects.create(user=self.admin, total_amount=i) for i in range(7)]
+        # Кілька продажів з однаковим часом - порядок між ними визначає id
+        moment = timezone.now() - timedelta(hours=1)
+        Sale.objects.filter(pk__in=[sale.pk for sale in self.sales[1:5]]).update(created_at=moment)
+        self.expected = list(Sale.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        for i in range(5):
+            Stock.objects.create(product=product, quantity=i + 1, transaction_type='in')
+        Stock.objects.update(created_at=moment)
+
+    def collect(self, queryset, per_page):
+        paginator = KeysetPaginator(queryset, per_page)
+        ids, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            self.assertLessEqual(len(page), per_page)
+            ids.extend(row.pk for row in page)
+            if not page.has_next():
+                return ids
+            cursor = page.next_cursor
+
+    def test_paginator(self):
+        for per_page in (1, 2, 3, 7, 50):
+            with self.subTest(per_page=per_page):
+                self.assertEqual(self.collect(Sale.objects.all(), per_page), self.expected)
+        stock = list(Stock.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(self.collect(Stock.objects.all(), 2), stock)
+
+    def test_json_pages(self):
+        self.client.force_login(self.admin)
+        ids = []
+        url = reverse('sale_list') + '?format=json'
+        with patch.object(SaleListView, 'paginate_by', 3):
+            while url:
+                data = self.client.get(url).json()
+                ids.extend(row['id'] for row in data['results'])
+                url = data['next']
+        self.assertEqual(ids, self.expected)
+
+    def test_default_json_row(self):
+        self.client.force_login(self.admin)
+        category = Category.objects.get()
+        data = self.client.get(reverse('category_list'), {'format': 'json'}).json()
+        row, = data['results']
+        # JSONListMixin.to_json за замовчуванням - тільки json_fields, включно з id та created_at
+        self.assertEqual(set(row), {'id', 'name', 'description', 'created_at'})
+        self.assertEqual((row['id'], row['name']), (category.id, category.name))
+
+    def test_invalid_cursor(self):
+        self.client.force_login(self.admin)
+        for name in ('sale_list', 'stock_list'):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name), {'cursor': 'не-курсор'})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+
+
+class RunningBalanceTest(TestCase):
+    """Наростаючий залишок на сторінках журналу збігається з підсумком операцій"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin')
+        self.products = [create_product('Кава'), create_product('Чай')]
+        start = timezone.now() - timedelta(days=3)
+        operations = [('in', 20), ('out', 3), ('adjustment', -2), ('in', 5), ('out', 4), ('out', 1)]
+        for i in range(12):
+            transaction_type, quantity = operations[i % len(operations)]
+            stock = Stock.objects.create(
+                product=self.products[i % 2], quantity=quantity, transaction_type=transaction_type,
+            )
+            # Пари операцій з однаковим часом - порядок всередині визначає id
+            Stock.objects.filter(pk=stock.pk).update(created_at=start + timedelta(hours=i // 2))
+
+    def expected(self):
+        balances, result = {}, {}
+        for stock in Stock.objects.order_by('created_at', 'id'):
+            balances[stock.product_id] = balances.get(stock.product_id, 0) + stock.signed_quantity
+            result[stock.pk] = balances[stock.product_id]
+        return result
+
+    def pages(self, **params):
+        self.client.force_login(self.admin)
+        rows, cursor = [], None
+        with patch.object(StockListView, 'paginate_by', 5):
+            while True:
+                query = {'format': 'json', **params}
+                if cursor:
+                    query['cursor'] = cursor
+                data = self.client.get(reverse('stock_list'), query).json()
+                rows.extend(data['results'])
+                cursor = data['next_cursor']
+                if not cursor:
+                    return rows
+
+    def test_across_pages(self):
+        expected = self.expected()
+        rows = self.pages()
+        self.assertEqual(len(rows), 12)
+        self.assertEqual({row['id']: row['running_balance'] for row in rows}, expected)
+
+    def test_product_filter(self):
+        expected = self.expected()
+        product = self.products[1]
+        rows = self.pages(product=product.pk)
+        self.assertEqual(len(rows), 6)
+        product_ids = Stock.objects.filter(product=product).values_list('id', flat=True)
+        self.assertEqual(
+            {row['id']: row['running_balance'] for row in rows},
+            {pk: expected[pk] for pk in product_ids},
+        )
+
+    def test_page_slice(self):
+        expected = self.expected()
+        rows = list(Stock.objects.order_by('-created_at', '-id')[3:8])
+        # Одна вибірка на сторінку: баланс мінус новіші операції, без вікна по всьому журналу
+        with self.assertNumQueries(1):
+            Stock.attach_running_balances(rows)
+        self.assertEqual({row.pk: row.running_balance for row in rows}, {row.pk: expected[row.pk] for row in rows})
+
+    def test_current_balance(self):
+        expected = self.expected()
+        for stock in Stock.objects.all():
+            self.assertEqual(stock.current_balance, expected[stock.pk])
+
+
+class StockSnapshotTest(TestCase):
+    """Залишок на кінець дня (with_stock(as_of=...)) зі знімками та без них"""
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.product = create_product()
+        self.other = create_product('Інший')
+        self.operations = [
+            (self.product, 10, 'in', 50), (self.other, 9, 'in', 8), (self.product, 6, 'out', 5),
+            (self.other, 5, 'out', 3), (self.product, 3, 'adjustment', -2), (self.product, 0, 'in', 7),
+        ]
+        self.stocks = []
+        for product, days_ago, transaction_type, quantity in self.operations:
+            stock = Stock.objects.create(product=product, quantity=quantity, transaction_type=transaction_type)
+            Stock.objects.filter(pk=stock.pk).update(
+                created_at=local_day_start(self.today - timedelta(days=days_ago)) + timedelta(hours=12)
+            )
+            self.stocks.append(stock)
+
+    def expected(self, as_of):
+        balances = {self.product.pk: 0, self.other.pk: 0}
+        for stock in Stock.objects.all():
+            if timezone.localdate(stock.created_at) <= as_of:
+                balances[stock.product_id] += stock.signed_quantity
+        return balances
+
+    def assertBalancesAsOf(self):
+        for days_ago in range(12, -1, -1):
+            as_of = self.today - timedelta(days=days_ago)
+            with self.subTest(as_of=as_of):
+                actual = dict(Product.objects.with_stock(as_of=as_of).values_list('id', 'stock_quantity'))
+                self.assertEqual(actual, self.expected(as_of))
+
+    def test_without_snapshots(self):
+        self.assertBalancesAsOf()
+
+    def test_with_snapshots(self):
+        for days_ago in (8, 4, 1):
+            StockSnapshot.take(self.today - timedelta(days=days_ago))
+        self.assertBalancesAsOf()
+
+    def test_take_closed_days_only(self):
+        with self.assertRaises(ValueError):
+            StockSnapshot.take(self.today)
+        self.assertTrue(StockSnapshot.ensure_latest())
+        self.assertFalse(StockSnapshot.ensure_latest())
+        latest = StockSnapshot.period_end(self.today)
+        self.assertEqual(
+            dict(StockSnapshot.objects.filter(date=latest).values_list('product_id', 'quantity')),
+            self.expected(latest),
+        )
+
+    def test_past_edit_invalidates(self):
+        StockSnapshot.take(self.today - timedelta(days=7))
+        StockSnapshot.take(self.today - timedelta(days=2))
+        old = self.stocks[2]
+        old.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            old.quantity = 9
+            old.save()
+        remaining = set(StockSnapshot.objects.values_list('date', flat=True))
+        self.assertEqual(remaining, {self.today - timedelta(days=7)})
+        self.assertBalancesAsOf()
+
+
+class StockArchiveTest(TestCase):
+    """Архівація журналу не змінює залишків і перевіряється verify()"""
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.products = [create_product('Кава'), create_product('Чай')]
+        for i, days_ago in enumerate((12, 10, 9, 7, 6, 4, 3, 1, 0)):
+            transaction_type, quantity = [('in', 30), ('out', 4), ('adjustment', -1)][i % 3]
+            stock = Stock.objects.create(
+                product=self.products[i % 2], quantity=quantity, transaction_type=transaction_type,
+            )
+            Stock.objects.filter(pk=stock.pk).update(
+                created_at=local_day_start(self.today - timedelta(days=days_ago)) + timedelta(hours=10)
+            )
+        self.balances = dict(ProductStockBalance.objects.values_list('product_id', 'quantity'))
+        self.as_of = {
+            days_ago: dict(Product.objects.with_stock(as_of=self.today - timedelta(days=days_ago)).values_list(
+                'id', 'stock_quantity'
+            ))
+            for days_ago in range(14)
+        }
+
+    def assertUnchanged(self):
+        self.assertEqual(dict(ProductStockBalance.objects.values_list('product_id', 'quantity')), self.balances)
+        self.assertEqual(StockArchive.ledger_balances(), {pk: q for pk, q in self.balances.items() if q})
+        self.assertEqual(StockArchive.verify(), {})
+        check_stock_balances()
+        for days_ago, expected in self.as_of.items():
+            with self.subTest(days_ago=days_ago):
+                as_of = self.today - timedelta(days=days_ago)
+                self.assertEqual(
+                    dict(Product.objects.with_stock(as_of=as_of).values_list('id', 'stock_quantity')), expected
+                )
+
+    def test_round_trip(self):
+        archived, openings = StockArchive.archive_before(self.today - timedelta(days=5))
+        self.assertEqual(archived, 5)
+        self.assertEqual(openings, 2)
+        self.assertEqual(StockArchive.objects.count(), 5)
+        self.assertEqual(Stock.objects.filter(transaction_type='opening').count(), 2)
+        self.assertEqual(StockArchive.boundary(), self.today - timedelta(days=5))
+        self.assertUnchanged()
+
+        # Повторна архівація пізнішої межі переносить і рядки 'opening'
+        StockArchive.archive_before(self.today - timedelta(days=2))
+        self.assertEqual(Stock.objects.filter(transaction_type='opening').count(), 2)
+        self.assertUnchanged()
+
+    def test_boundary_checks(self):
+        StockArchive.archive_before(self.today - timedelta(days=5))
+        with self.assertRaises(ValueError):
+            StockArchive.archive_before(self.today - timedelta(days=8))
+        with self.assertRaises(ValueError):
+            StockArchive.archive_before(self.today + timedelta(days=1))
+
+    def test_verify_reports_drift(self):
+        StockArchive.archive_before(self.today - timedelta(days=5))
+        row = StockArchive.objects.filter(transaction_type='in').first()
+        StockArchive.objects.filter(pk=row.pk).update(quantity=row.quantity + 1)
+        self.assertEqual(list(StockArchive.verify()), [row.product_id])
+
+
+@override_settings(ROLE_CACHE_TIMEOUT=300)
+class RoleCacheTest(TestCase):
+    """Ролі читаються один раз на запит і скидаються при зміні груп"""
+
+    def setUp(self):
+        self.cashier_group = Group.objects.create(name=roles.CASHIER)
+        self.admin_group = Group.objects.create(name=roles.ADMIN)
+        self.user = User.objects.create_user('cashier')
+        self.user.groups.add(self.cashier_group)
+        roles.invalidate(self.user.pk)
+        self.addCleanup(roles.invalidate, self.user.pk)
+
+    def fresh_user(self):
+        # Новий об'єкт - як request.user наступного запиту
+        return User.objects.get(pk=self.user.pk)
+
+    def test_cached_between_requests(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(roles.is_cashier(self.user))
+            self.assertFalse(roles.is_admin(self.user))
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(roles.is_cashier(user))
+
+    def test_groups_add_and_remove(self):
+        self.assertEqual(roles.group_names(self.fresh_user()), {roles.CASHIER})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(self.admin_group)
+        # Той самий об'єкт і наступний запит бачать нову роль
+        self.assertTrue(roles.is_admin(self.user))
+        self.assertTrue(roles.is_admin(self.fresh_user()))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.remove(self.cashier_group)
+        self.assertFalse(roles.is_cashier(self.fresh_user()))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin_group.user_set.remove(self.user)
+        self.assertEqual(roles.group_names(self.fresh_user()), frozenset())
+
+    def test_template_context(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['roles'].names, [roles.CASHIER])
+        self.assertTrue(response.context['roles'].is_cashier)
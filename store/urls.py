@@ -38,6 +38,7 @@ urlpatterns = [
     path('reports/', views.ReportsView.as_view(), name='reports'),
     path('reports/sales/pdf/', views.SalesReportPDFView.as_view(), name='sales_report_pdf'),
     path('api/analytics/', views.AnalyticsDataView.as_view(), name='analytics_data'),
+    path('api/analytics/cache/', views.AnalyticsCacheStatsView.as_view(), name='analytics_cache_stats'),
     path('api/product/<int:pk>/price/', views.ProductPriceAPIView.as_view(), name='product_price_api'),
     
     # Користувачі
@@ -0,0 +1,46 @@
+"""
+Допоміжні функції для фільтрації за локальними датами
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def parse_date(value):
+    """Дата з рядка YYYY-MM-DD або None для порожнього/некоректного значення"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (ValueError, TypeError):
+        return None
+
+
+def local_day_start(day):
+    """Початок локального дня (TIME_ZONE, Europe/Kyiv) як aware datetime"""
+    return datetime.combine(day, time.min, tzinfo=timezone.get_current_timezone())
+
+
+def local_date_range(date_from=None, date_to=None):
+    """
+    Напіввідкритий інтервал [start, end) aware datetime для локальних дат
+    date_from..date_to включно. Відсутня межа повертається як None.
+    """
+    start = local_day_start(date_from) if date_from else None
+    end = local_day_start(date_to + timedelta(days=1)) if date_to else None
+    return start, end
+
+
+def date_range_filter(field, date_from=None, date_to=None):
+    """
+    Умови filter() для DateTimeField за локальними датами.
+
+    На відміну від field__date, порівнюється саме поле, тому БД може
+    використати індекс: date_range_filter('sale__created_at', d1, d2)
+    -> {'sale__created_at__gte': ..., 'sale__created_at__lt': ...}
+    """
+    start, end = local_date_range(date_from, date_to)
+    lookups = {}
+    if start is not None:
+        lookups[f'{field}__gte'] = start
+    if end is not None:
+        lookups[f'{field}__lt'] = end
+    return lookups
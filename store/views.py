@@ -6,23 +6,27 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.models import User, Group
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
 from django.contrib import messages
 from django.db.models import Sum, Count, Q
-from django.http import JsonResponse, HttpResponse
+from django.db.models.functions import TruncDate
+from django.http import JsonResponse, HttpResponse, Http404
 from django.utils import timezone
 from django.template.loader import render_to_string
 from django.views.generic import (
     ListView, CreateView, UpdateView, DeleteView, 
     DetailView, TemplateView, View
 )
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from datetime import datetime, timedelta
 import json
-import subprocess
 import os
 from django.conf import settings
 from io import BytesIO
 import base64
+import logging
+from asgiref.sync import sync_to_async
 
 try:
     if os.path.exists('/opt/homebrew/lib'):
@@ -43,32 +47,43 @@ try:
 except ImportError:
     plt = None
 
-from .models import Category, Product, Stock, Sale, SaleItem
+from .models import Category, Product, Stock, Sale, DailyProductSales
 from .forms import (
     UserRegistrationForm, CategoryForm, ProductForm, 
     StockForm, SaleItemForm
 )
+from .services import checkout, CheckoutError
+from .utils import date_range_filter, parse_date
+from .pagination import KeysetPage, KeysetPaginator, InvalidCursor
+from . import roles
+from .analytics import fetch_sales_columns, native, numpy_backend
+from .analytics import cache as analytics_cache
+from .analytics import stream as analytics_stream
+from .analytics import daemon as analytics_daemon
+from .analytics import sqlite_source
+from .analytics import runner as analytics_runner
+from .analytics import pool as analytics_pool
 
 
 # ========== МІКСИНИ ДЛЯ ПЕРЕВІРКИ РОЛЕЙ ==========
 
 class RoleCheckMixin:
-    """Базовий міксин для перевірки ролей користувачів"""
+    """Базовий міксин для перевірки ролей користувачів (групи читаються раз на запит, store/roles.py)"""
     
     @staticmethod
     def is_cashier(user):
         """Перевірка чи користувач касир"""
-        return user.groups.filter(name='Касир').exists()
+        return roles.is_cashier(user)
     
     @staticmethod
     def is_admin(user):
         """Перевірка чи користувач адміністратор"""
-        return user.groups.filter(name='Адміністратор').exists() or user.is_superuser
+        return roles.is_admin(user)
     
     @staticmethod
     def is_manager(user):
         """Перевірка чи користувач керівник"""
-        return user.groups.filter(name='Керівник').exists() or user.is_superuser
+        return roles.is_manager(user)
 
 
 class AdminRequiredMixin(LoginRequiredMixin, UserPassesTestMixin, RoleCheckMixin):
@@ -85,6 +100,19 @@ class ManagerRequiredMixin(LoginRequiredMixin, UserPassesTestMixin, RoleCheckMix
         return self.is_manager(self.request.user)
 
 
+class AsyncManagerRequiredMixin(RoleCheckMixin):
+    """Міксин для перевірки прав керівника в асинхронних view"""
+    
+    async def dispatch(self, request, *args, **kwargs):
+        # request.user ліниво читає БД - в циклі подій тільки через auser()
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        if not await sync_to_async(self.is_manager)(user):
+            raise PermissionDenied
+        return await super().dispatch(request, *args, **kwargs)
+
+
 class CashierRequiredMixin(LoginRequiredMixin, UserPassesTestMixin, RoleCheckMixin):
     """Міксин для перевірки прав касира"""
     
@@ -116,6 +144,67 @@ class AllRolesMixin(LoginRequiredMixin, UserPassesTestMixin, RoleCheckMixin):
         return self.is_cashier(user) or self.is_admin(user) or self.is_manager(user)
 
 
+# ========== ПАГІНАЦІЯ ТА JSON-ВАРІАНТ СПИСКІВ ==========
+
+class KeysetPaginationMixin:
+    """Курсорна пагінація ListView за (created_at, id), параметр ?cursor= (store/pagination.py)"""
+    paginate_by = 50
+    
+    def paginate_queryset(self, queryset, page_size):
+        try:
+            page = KeysetPaginator(queryset, page_size).page(self.request.GET.get('cursor') or None)
+        except InvalidCursor:
+            raise Http404('Некоректний курсор сторінки')
+        return None, page, page.object_list, page.has_other_pages()
+
+
+class JSONListMixin:
+    """Сторінка списку в JSON (?format=json) з посиланням на наступну - для поступового завантаження"""
+    # Поля моделі в рядку JSON за замовчуванням; None - усі поля
+    json_fields = None
+    
+    def to_json(self, obj):
+        """Рядок сторінки: значення полів json_fields (списки з пов'язаними даними перевизначають)"""
+        # Не model_to_dict: він пропускає нередаговані поля (id, created_at)
+        return {
+            field.attname: field.value_from_object(obj)
+            for field in obj._meta.concrete_fields
+            if self.json_fields is None or field.name in self.json_fields
+        }
+    
+    def _page_url(self, **params):
+        # Фільтри запиту зберігаються, змінюється тільки сторінка/курсор
+        query = self.request.GET.copy()
+        for key, value in params.items():
+            query[key] = value
+        return f'{self.request.path}?{query.urlencode()}'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Рядок фільтрів без номера сторінки/курсора - для посилань у store/pagination.html
+        query = self.request.GET.copy()
+        for key in ('page', 'cursor', 'format'):
+            query.pop(key, None)
+        context['page_query'] = query.urlencode()
+        return context
+    
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.GET.get('format') != 'json':
+            return super().render_to_response(context, **response_kwargs)
+        
+        page = context.get('page_obj')
+        data = {'results': [self.to_json(obj) for obj in context['object_list']], 'next': None}
+        if isinstance(page, KeysetPage):
+            data['next_cursor'] = page.next_cursor
+            if page.has_next():
+                data['next'] = self._page_url(cursor=page.next_cursor)
+        elif page is not None:
+            data.update(page=page.number, num_pages=page.paginator.num_pages, count=page.paginator.count)
+            if page.has_next():
+                data['next'] = self._page_url(page=page.next_page_number())
+        return JsonResponse(data)
+
+
 # ========== АВТЕНТИФІКАЦІЯ ==========
 
 class LoginView(View):
@@ -192,15 +281,15 @@ class DashboardView(LoginRequiredMixin, RoleCheckMixin, TemplateView):
     
     def _get_manager_context(self):
         """Контекст для керівника"""
-        today = timezone.now().date()
+        today = timezone.localdate()
         week_ago = today - timedelta(days=7)
         
-        sales_today = Sale.objects.filter(created_at__date=today).aggregate(
+        sales_today = Sale.objects.filter(**date_range_filter('created_at', today, today)).aggregate(
             total=Sum('total_amount'),
             count=Count('id')
         )
         
-        sales_week = Sale.objects.filter(created_at__date__gte=week_ago).aggregate(
+        sales_week = Sale.objects.filter(**date_range_filter('created_at', week_ago)).aggregate(
             total=Sum('total_amount'),
             count=Count('id')
         )
@@ -214,39 +303,40 @@ class DashboardView(LoginRequiredMixin, RoleCheckMixin, TemplateView):
         """Контекст для адміністратора"""
         products_count = Product.objects.count()
         categories_count = Category.objects.count()
-        low_stock_products = []
-        
-        for product in Product.objects.filter(is_active=True):
-            stock = product.current_stock
-            if stock < 10:
-                low_stock_products.append({'product': product, 'stock': stock})
+        low_stock = Product.objects.filter(is_active=True).low_stock()
         
         return {
             'products_count': products_count,
             'categories_count': categories_count,
-            'low_stock_products': low_stock_products[:5],
+            'low_stock_count': low_stock.count(),
+            'low_stock_products': [
+                {'product': product, 'stock': product.stock_quantity}
+                for product in low_stock[:5]
+            ],
         }
     
     def _get_cashier_context(self):
         """Контекст для касира"""
-        today = timezone.now().date()
+        today = timezone.localdate()
         sales_today = Sale.objects.filter(
             user=self.request.user, 
-            created_at__date=today
+            **date_range_filter('created_at', today, today)
         )
         return {'sales_today': sales_today}
 
 
 # ========== КАТЕГОРІЇ (CRUD) ==========
 
-class CategoryListView(AdminRequiredMixin, ListView):
+class CategoryListView(AdminRequiredMixin, JSONListMixin, ListView):
     """Клас для відображення списку категорій"""
     model = Category
     template_name = 'store/category_list.html'
     context_object_name = 'categories'
+    paginate_by = 50
+    json_fields = ['id', 'name', 'description', 'created_at']
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().order_by('name', 'id')
         search = self.request.GET.get('search', '')
         if search:
             queryset = queryset.filter(name__icontains=search)
@@ -306,14 +396,15 @@ class CategoryDeleteView(AdminRequiredMixin, DeleteView):
 
 # ========== ТОВАРИ (CRUD) ==========
 
-class ProductListView(StaffOrManagerMixin, ListView):
+class ProductListView(StaffOrManagerMixin, JSONListMixin, ListView):
     """Клас для відображення списку товарів"""
     model = Product
     template_name = 'store/product_list.html'
     context_object_name = 'products'
+    paginate_by = 50
     
     def get_queryset(self):
-        queryset = Product.objects.select_related('category').all()
+        queryset = Product.objects.select_related('category', 'stock_balance').order_by('name', 'id')
         search = self.request.GET.get('search', '')
         category_id = self.request.GET.get('category', '')
         
@@ -333,6 +424,18 @@ class ProductListView(StaffOrManagerMixin, ListView):
         context['category_id'] = self.request.GET.get('category', '')
         context['can_edit'] = self.is_admin(self.request.user)
         return context
+    
+    def to_json(self, product):
+        return {
+            'id': product.id,
+            'name': product.name,
+            'category_id': product.category_id,
+            'category': product.category.name,
+            'price': str(product.price),
+            'barcode': product.barcode,
+            'current_stock': product.current_stock,
+            'is_active': product.is_active,
+        }
 
 
 class ProductCreateView(AdminRequiredMixin, CreateView):
@@ -383,19 +486,25 @@ class ProductDeleteView(AdminRequiredMixin, DeleteView):
 
 # ========== СКЛАД ==========
 
-class StockListView(StaffOrManagerMixin, ListView):
-    """Клас для відображення списку складських операцій"""
+class StockListView(StaffOrManagerMixin, KeysetPaginationMixin, JSONListMixin, ListView):
+    """Клас для відображення списку складських операцій (від нових, сторінки за курсором)"""
     model = Stock
     template_name = 'store/stock_list.html'
     context_object_name = 'stocks'
     
     def get_queryset(self):
-        queryset = Stock.objects.select_related('product', 'created_by').all()
+        queryset = Stock.objects.select_related('product', 'created_by')
         product_id = self.request.GET.get('product', '')
         if product_id:
             queryset = queryset.filter(product_id=product_id)
         return queryset
     
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+        # Залишок після кожної операції - тільки для рядків сторінки, а не по всьому журналу
+        Stock.attach_running_balances(object_list)
+        return paginator, page, object_list, is_paginated
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['products'] = Product.objects.all()
@@ -409,6 +518,22 @@ class StockListView(StaffOrManagerMixin, ListView):
             not self.is_admin(self.request.user)
         )
         return context
+    
+    def to_json(self, stock):
+        return {
+            'id': stock.id,
+            'product_id': stock.product_id,
+            'product': stock.product.name,
+            'quantity': stock.quantity,
+            'transaction_type': stock.transaction_type,
+            'transaction_type_display': stock.get_transaction_type_display(),
+            'running_balance': stock.running_balance,
+            'created_by': (
+                (stock.created_by.get_full_name() or stock.created_by.username) if stock.created_by else None
+            ),
+            'created_at': stock.created_at.isoformat(),
+            'notes': stock.notes,
+        }
 
 
 class StockCreateView(StaffOrManagerMixin, CreateView):
@@ -467,8 +592,8 @@ class StockCreateView(StaffOrManagerMixin, CreateView):
 
 # ========== ПРОДАЖІ ==========
 
-class SaleListView(AllRolesMixin, ListView):
-    """Клас для відображення списку продажів"""
+class SaleListView(AllRolesMixin, KeysetPaginationMixin, JSONListMixin, ListView):
+    """Клас для відображення списку продажів (від нових, сторінки за курсором)"""
     model = Sale
     template_name = 'store/sale_list.html'
     context_object_name = 'sales'
@@ -485,10 +610,9 @@ class SaleListView(AllRolesMixin, ListView):
         date_from = self.request.GET.get('date_from', '')
         date_to = self.request.GET.get('date_to', '')
         
-        if date_from:
-            queryset = queryset.filter(created_at__date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(created_at__date__lte=date_to)
+        queryset = queryset.filter(
+            **date_range_filter('created_at', parse_date(date_from), parse_date(date_to))
+        )
         
         return queryset
     
@@ -497,6 +621,15 @@ class SaleListView(AllRolesMixin, ListView):
         context['date_from'] = self.request.GET.get('date_from', '')
         context['date_to'] = self.request.GET.get('date_to', '')
         return context
+    
+    def to_json(self, sale):
+        return {
+            'id': sale.id,
+            'user': sale.user.get_full_name() or sale.user.username,
+            'created_at': sale.created_at.isoformat(),
+            'total_amount': str(sale.total_amount),
+            'url': reverse('sale_detail', args=[sale.id]),
+        }
 
 
 class SaleCreateView(CashierOrAdminMixin, View):
@@ -504,49 +637,22 @@ class SaleCreateView(CashierOrAdminMixin, View):
     template_name = 'store/sale_create.html'
     
     def get(self, request):
-        products = Product.objects.filter(is_active=True).select_related('category')
+        products = Product.objects.filter(is_active=True).select_related(
+            'category', 'stock_balance'
+        )
         return render(request, self.template_name, {'products': products})
     
     def post(self, request):
-        sale = Sale.objects.create(user=request.user, total_amount=0)
-        
-        # Обробка позицій продажу
-        items_data = json.loads(request.POST.get('items', '[]'))
-        for item_data in items_data:
-            product = get_object_or_404(Product, pk=item_data['product_id'])
-            quantity = int(item_data['quantity'])
-            price = float(item_data['price'])
-            
-            # Перевірка наявності на складі
-            current_stock = product.current_stock
-            if quantity > current_stock:
-                messages.error(
-                    request, 
-                    f'Недостатньо товару "{product.name}" на складі. '
-                    f'Доступно: {current_stock}'
-                )
-                sale.delete()
-                return redirect('sale_create')
-            
-            # Створення позиції
-            SaleItem.objects.create(
-                sale=sale,
-                product=product,
-                quantity=quantity,
-                price=price
-            )
-            
-            # Створення складської операції (списання)
-            Stock.objects.create(
-                product=product,
-                quantity=quantity,
-                transaction_type='out',
-                notes=f'Продаж #{sale.id}',
-                created_by=request.user
-            )
+        try:
+            items_data = json.loads(request.POST.get('items', '[]'))
+            sale = checkout(request.user, items_data)
+        except json.JSONDecodeError:
+            messages.error(request, 'Некоректні дані продажу')
+            return redirect('sale_create')
+        except CheckoutError as e:
+            messages.error(request, str(e))
+            return redirect('sale_create')
         
-        sale.total_amount = sale.calculate_total()
-        sale.save()
         messages.success(request, f'Продаж #{sale.id} створено успішно!')
         return redirect('sale_detail', pk=sale.id)
 
@@ -643,10 +749,7 @@ class ReportsView(ManagerRequiredMixin, TemplateView):
             date_to_str = date_to.strftime('%Y-%m-%d')
         
         # Фільтруємо продажі
-        sales = Sale.objects.filter(
-            created_at__date__gte=date_from,
-            created_at__date__lte=date_to
-        )
+        sales = Sale.objects.filter(**date_range_filter('created_at', date_from, date_to))
         total_revenue = sales.aggregate(total=Sum('total_amount'))['total'] or 0
         total_count = sales.count()
         average_check = (total_revenue / total_count) if total_count > 0 else 0
@@ -657,8 +760,8 @@ class ReportsView(ManagerRequiredMixin, TemplateView):
         # Топ товарів
         top_products = self._get_top_products(cpp_data, date_from, date_to)
         
-        # Залишки на складі
-        stock_products = self._get_stock_products()
+        # Залишки на складі на кінець періоду (знімок + журнал після нього)
+        stock_products = self._get_stock_products(as_of=date_to)
         
         context.update({
             'date_from': date_from_str,
@@ -668,6 +771,7 @@ class ReportsView(ManagerRequiredMixin, TemplateView):
             'average_check': average_check,
             'top_products': top_products,
             'stock_products': stock_products,
+            'stock_as_of': date_to,
             'cpp_data': cpp_data if 'error' not in cpp_data else None,
         })
         
@@ -679,39 +783,42 @@ class ReportsView(ManagerRequiredMixin, TemplateView):
         if 'error' not in cpp_data and 'top_products_by_revenue' in cpp_data:
             for item in cpp_data['top_products_by_revenue'][:10]:
                 top_products.append({
+                    'product_id': item.get('product_id'),
                     'product__name': item['product_name'],
                     'total_quantity': item.get('quantity', 0),
                     'total_amount': item['revenue']
                 })
         else:
-            top_products_raw = SaleItem.objects.filter(
-                sale__created_at__date__gte=date_from,
-                sale__created_at__date__lte=date_to
-            ).values('product__name').annotate(
+            top_products_raw = DailyProductSales.objects.filter(
+                date__gte=date_from,
+                date__lte=date_to
+            ).values('product_id', 'product__name').annotate(
                 total_quantity=Sum('quantity'),
-                total_amount=Sum('subtotal')
+                total_amount=Sum('revenue')
             ).order_by('-total_amount')[:10]
             
             for item in top_products_raw:
                 top_products.append({
+                    'product_id': item['product_id'],
                     'product__name': item['product__name'],
                     'total_quantity': item['total_quantity'],
                     'total_amount': float(item['total_amount'] or 0)
                 })
         return top_products
     
-    def _get_stock_products(self):
-        """Отримання залишків на складі"""
-        stock_products = []
-        for product in Product.objects.filter(is_active=True):
-            stock = product.current_stock
-            stock_products.append({
+    def _get_stock_products(self, as_of=None, limit=10):
+        """Отримання залишків на складі на дату as_of (одним запитом, найдорожчі першими)"""
+        products = Product.objects.filter(is_active=True).with_stock(as_of=as_of).order_by(
+            '-stock_value', 'name'
+        )[:limit]
+        return [
+            {
                 'product': product,
-                'stock': stock,
-                'value': stock * product.price
-            })
-        stock_products.sort(key=lambda x: x['value'], reverse=True)
-        return stock_products
+                'stock': product.stock_quantity,
+                'value': product.stock_value,
+            }
+            for product in products
+        ]
     
     def _call_cpp_analytics(self, date_from_str, date_to_str):
         """Виклик C++ модуля для аналітики"""
@@ -751,10 +858,7 @@ class SalesReportPDFView(StaffOrManagerMixin, View):
             return redirect('reports')
         
         # Продажі за період
-        sales = Sale.objects.filter(
-            created_at__date__gte=date_from,
-            created_at__date__lte=date_to
-        )
+        sales = Sale.objects.filter(**date_range_filter('created_at', date_from, date_to))
         
         # Отримуємо аналітику з C++
         cpp_data = call_cpp_analytics(date_from_str, date_to_str)
@@ -797,6 +901,7 @@ class SalesReportPDFView(StaffOrManagerMixin, View):
         if 'error' not in cpp_data:
             top_by_amount = [
                 {
+                    'product_id': item.get('product_id'),
                     'product_name': item.get('product_name', ''),
                     'product__name': item.get('product_name', ''),
                     'revenue': item.get('revenue', 0),
@@ -808,6 +913,7 @@ class SalesReportPDFView(StaffOrManagerMixin, View):
             
             top_by_quantity = [
                 {
+                    'product_id': item.get('product_id'),
                     'product_name': item.get('product_name', ''),
                     'product__name': item.get('product_name', ''),
                     'quantity': item.get('quantity', 0),
@@ -827,16 +933,17 @@ class SalesReportPDFView(StaffOrManagerMixin, View):
             total_count = sales.count()
             average_check = total_revenue / total_count if total_count > 0 else 0
             
-            top_by_amount_raw = SaleItem.objects.filter(
-                sale__created_at__date__gte=date_from,
-                sale__created_at__date__lte=date_to
-            ).values('product__name').annotate(
-                total_amount=Sum('subtotal'),
+            top_by_amount_raw = DailyProductSales.objects.filter(
+                date__gte=date_from,
+                date__lte=date_to
+            ).values('product_id', 'product__name').annotate(
+                total_amount=Sum('revenue'),
                 total_quantity=Sum('quantity')
             ).order_by('-total_amount')
             
             top_by_amount = [
                 {
+                    'product_id': item['product_id'],
                     'product__name': item['product__name'],
                     'product_name': item['product__name'],
                     'total_amount': float(item['total_amount'] or 0),
@@ -846,16 +953,17 @@ class SalesReportPDFView(StaffOrManagerMixin, View):
                 for item in top_by_amount_raw
             ]
             
-            top_by_quantity_raw = SaleItem.objects.filter(
-                sale__created_at__date__gte=date_from,
-                sale__created_at__date__lte=date_to
-            ).values('product__name').annotate(
-                total_amount=Sum('subtotal'),
+            top_by_quantity_raw = DailyProductSales.objects.filter(
+                date__gte=date_from,
+                date__lte=date_to
+            ).values('product_id', 'product__name').annotate(
+                total_amount=Sum('revenue'),
                 total_quantity=Sum('quantity')
             ).order_by('-total_quantity')
             
             top_by_quantity = [
                 {
+                    'product_id': item['product_id'],
                     'product__name': item['product__name'],
                     'product_name': item['product__name'],
                     'total_quantity': item['total_quantity'],
@@ -865,54 +973,28 @@ class SalesReportPDFView(StaffOrManagerMixin, View):
                 for item in top_by_quantity_raw
             ]
             
-            # Статистики
-            sale_amounts = [float(x) for x in sales.values_list('total_amount', flat=True) if x and x > 0]
-            if sale_amounts:
-                sale_amounts.sort()
-                n = len(sale_amounts)
-                mean = sum(sale_amounts) / n
-                median = (sale_amounts[n // 2] if n % 2 == 1 
-                         else (sale_amounts[n // 2 - 1] + sale_amounts[n // 2]) / 2)
-                variance = sum((x - mean) ** 2 for x in sale_amounts) / n
-                std_dev = variance ** 0.5
-                min_val = min(sale_amounts)
-                max_val = max(sale_amounts)
-            else:
-                mean = median = std_dev = min_val = max_val = 0
-            
-            cpp_data['statistics'] = {
-                'total_revenue': float(total_revenue),
-                'mean': float(mean),
-                'median': float(median),
-                'std_dev': float(std_dev),
-                'min': float(min_val),
-                'max': float(max_val),
-                'total_sales': total_count
+            # Статистики чеків - тим самим NumPy-бекендом, що й аналітика; без продажів - нулі
+            statistics = (
+                numpy_backend.compute(fetch_sales_columns(date_from, date_to)).get('statistics')
+                if total_count else None
+            )
+            cpp_data['statistics'] = statistics or {
+                'total_revenue': 0.0, 'mean': 0.0, 'median': 0.0, 'std_dev': 0.0,
+                'min': 0.0, 'max': 0.0, 'total_sales': 0,
             }
         
-        # Залишки на складі
-        stock_data = []
-        for product in Product.objects.filter(is_active=True):
-            incoming = Stock.objects.filter(
-                product=product, transaction_type='in'
-            ).aggregate(total=Sum('quantity'))['total'] or 0
-            
-            outgoing = Stock.objects.filter(
-                product=product, transaction_type='out'
-            ).aggregate(total=Sum('quantity'))['total'] or 0
-            
-            adjustments = Stock.objects.filter(
-                product=product, transaction_type='adjustment'
-            ).aggregate(total=Sum('quantity'))['total'] or 0
-            
-            balance = incoming - outgoing + adjustments
-            stock_data.append({
+        # Залишки на складі на кінець періоду (одним запитом, найдорожчі першими)
+        stock_products = Product.objects.filter(is_active=True).select_related(
+            'category'
+        ).with_stock(as_of=date_to).order_by('-stock_value', 'name')[:20]
+        stock_data = [
+            {
                 'product': product,
-                'balance': balance,
-                'value': float(balance * product.price) if balance > 0 else 0
-            })
-        
-        stock_data.sort(key=lambda x: x['value'], reverse=True)
+                'balance': product.stock_quantity,
+                'value': float(product.stock_value),
+            }
+            for product in stock_products
+        ]
         
         return {
             'date_from': date_from.strftime('%d.%m.%Y'),
@@ -980,10 +1062,17 @@ class SalesReportPDFView(StaffOrManagerMixin, View):
         return image_base64
 
 
-class AnalyticsDataView(ManagerRequiredMixin, View):
-    """Клас для API отримання даних для аналітики"""
+class AnalyticsDataView(AsyncManagerRequiredMixin, View):
+    """
+    Клас для API отримання даних для аналітики.
     
-    def get(self, request):
+    Асинхронний: C++ модуль запускається через asyncio без блокування воркера,
+    з обмеженням паралельності та об'єднанням однакових запитів
+    (store/analytics/runner.py). Якщо черга заповнена - останній результат
+    діапазону з кешу з ознакою stale або 503.
+    """
+    
+    async def get(self, request):
         date_from_str = request.GET.get(
             'date_from', 
             (timezone.now() - timedelta(days=30)).strftime('%Y-%m-%d')
@@ -996,53 +1085,23 @@ class AnalyticsDataView(ManagerRequiredMixin, View):
         except (ValueError, TypeError):
             date_from = (timezone.now() - timedelta(days=30)).date()
             date_to = timezone.now().date()
-            date_from_str = date_from.strftime('%Y-%m-%d')
-            date_to_str = date_to.strftime('%Y-%m-%d')
         
-        # Виклик C++ модуля
-        cpp_data = call_cpp_analytics(date_from_str, date_to_str)
+        stale = False
+        try:
+            cpp_data = await analytics_runner.run(date_from, date_to, _run_cpp_analytics)
+        except analytics_runner.Saturated:
+            cpp_data = await sync_to_async(analytics_cache.stale)(date_from, date_to)
+            if cpp_data is None:
+                response = JsonResponse({'error': 'Забагато запитів аналітики, спробуйте пізніше'}, status=503)
+                response['Retry-After'] = '5'
+                return response
+            stale = True
         
         if 'error' in cpp_data:
             # Резервний варіант
-            sales_by_date = Sale.objects.filter(
-                created_at__date__gte=date_from,
-                created_at__date__lte=date_to
-            ).extra(
-                select={'day': 'date(created_at)'}
-            ).values('day').annotate(
-                total=Sum('total_amount'),
-                count=Count('id')
-            ).order_by('day')
-            
-            sales_by_date_list = [
-                {
-                    'day': item['day'],
-                    'total': float(item['total'] or 0),
-                    'count': item['count']
-                }
-                for item in sales_by_date
-            ]
-            
-            category_sales = SaleItem.objects.filter(
-                sale__created_at__date__gte=date_from,
-                sale__created_at__date__lte=date_to
-            ).values('product__category__name').annotate(
-                total=Sum('subtotal')
-            ).order_by('-total')
-            
-            category_sales_list = [
-                {
-                    'product__category__name': item['product__category__name'],
-                    'total': float(item['total'] or 0)
-                }
-                for item in category_sales
-            ]
-            
-            return JsonResponse({
-                'sales_by_date': sales_by_date_list,
-                'category_sales': category_sales_list,
-                'cpp_error': cpp_data.get('error'),
-            })
+            data = await sync_to_async(self._fallback_data)(date_from, date_to)
+            data['cpp_error'] = cpp_data.get('error')
+            return JsonResponse(data)
         
         # Використовуємо дані з C++
         sales_by_date_list = [
@@ -1056,13 +1115,14 @@ class AnalyticsDataView(ManagerRequiredMixin, View):
         
         category_sales_list = [
             {
+                'product__category_id': item.get('category_id'),
                 'product__category__name': item['category'],
                 'total': item['share']
             }
             for item in cpp_data.get('category_shares', [])
         ]
         
-        return JsonResponse({
+        data = {
             'sales_by_date': sales_by_date_list,
             'category_sales': category_sales_list,
             'daily_revenue': cpp_data.get('daily_revenue', []),
@@ -1073,6 +1133,60 @@ class AnalyticsDataView(ManagerRequiredMixin, View):
             'category_shares': cpp_data.get('category_shares', []),
             'statistics': cpp_data.get('statistics', {}),
             'abc_analysis': cpp_data.get('abc_analysis', []),
+        }
+        if stale:
+            data['stale'] = True
+        return JsonResponse(data)
+    
+    @staticmethod
+    def _fallback_data(date_from, date_to):
+        """Виручка по днях і частки категорій запитами ORM"""
+        sales_by_date = Sale.objects.filter(
+            **date_range_filter('created_at', date_from, date_to)
+        ).annotate(day=TruncDate('created_at')).values('day').annotate(
+            total=Sum('total_amount'),
+            count=Count('id')
+        ).order_by('day')
+        
+        sales_by_date_list = [
+            {
+                'day': item['day'],
+                'total': float(item['total'] or 0),
+                'count': item['count']
+            }
+            for item in sales_by_date
+        ]
+        
+        category_sales = DailyProductSales.objects.filter(
+            date__gte=date_from,
+            date__lte=date_to
+        ).values('category_id', 'category__name').annotate(
+            total=Sum('revenue')
+        ).order_by('-total')
+        
+        category_sales_list = [
+            {
+                'product__category_id': item['category_id'],
+                'product__category__name': item['category__name'],
+                'total': float(item['total'] or 0)
+            }
+            for item in category_sales
+        ]
+        
+        return {
+            'sales_by_date': sales_by_date_list,
+            'category_sales': category_sales_list,
+        }
+
+
+class AnalyticsCacheStatsView(ManagerRequiredMixin, View):
+    """Клас для API лічильників кешу та черги C++ модуля аналітики"""
+    
+    def get(self, request):
+        return JsonResponse({
+            **analytics_cache.stats(),
+            'engine': analytics_runner.stats(),
+            'pool': analytics_pool.stats(),
         })
 
 
@@ -1090,11 +1204,26 @@ class ProductPriceAPIView(LoginRequiredMixin, DetailView):
 
 # ========== КЕРУВАННЯ КОРИСТУВАЧАМИ ==========
 
-class UserListView(AdminRequiredMixin, ListView):
+class UserListView(AdminRequiredMixin, JSONListMixin, ListView):
     """Клас для відображення списку користувачів"""
     model = User
     template_name = 'store/user_list.html'
     context_object_name = 'users'
+    paginate_by = 50
+    
+    def get_queryset(self):
+        return User.objects.prefetch_related('groups').order_by('username')
+    
+    def to_json(self, user):
+        return {
+            'id': user.id,
+            'username': user.username,
+            'full_name': user.get_full_name(),
+            'email': user.email,
+            'groups': [group.name for group in user.groups.all()],
+            'is_staff': user.is_staff,
+            'is_superuser': user.is_superuser,
+        }
 
 
 class UserCreateView(AdminRequiredMixin, CreateView):
@@ -1156,8 +1285,36 @@ class UserUpdateView(AdminRequiredMixin, UpdateView):
 # ========== ДОПОМІЖНІ ФУНКЦІЇ ==========
 
 def call_cpp_analytics(date_from_str, date_to_str):
-    """Виклик C++ модуля для аналітики - ядро обчислень (ООП версія)"""
+    """Аналітика за період з кешем результатів (store/analytics/cache.py)"""
+    try:
+        date_from = datetime.strptime(date_from_str, '%Y-%m-%d').date()
+        date_to = datetime.strptime(date_to_str, '%Y-%m-%d').date()
+    except (ValueError, TypeError):
+        date_from = (timezone.now() - timedelta(days=30)).date()
+        date_to = timezone.now().date()
+    
+    return analytics_cache.get_or_compute(
+        date_from, date_to, lambda: _run_cpp_analytics(date_from, date_to)
+    )
+
+
+def _run_cpp_analytics(date_from, date_to):
+    """
+    Виклик C++ модуля для аналітики - ядро обчислень (ООП версія).
+    
+    Спочатку - резидентний демон (дані вже в пам'яті, без читання БД),
+    якщо він запущений; для SQLite - пряме читання БД C++ модулем (Python
+    передає тільки шлях і межі днів); далі бібліотека в межах процесу
+    (ctypes) з колонками з ORM; інакше - прогрітий воркер пулу або окремий
+    процес з потоковим колонковим вводом у stdin.
+    Якщо C++ модуль не зібрано взагалі - NumPy-бекенд з тими ж показниками.
+    """
     try:
+        try:
+            return analytics_daemon.query(date_from, date_to)
+        except analytics_daemon.DaemonUnavailable:
+            pass
+        
         # Спробуємо використати ООП версію, якщо вона існує
         cpp_executable_oop = os.path.join(settings.BASE_DIR, 'cpp_analytics', 'analytics_oop')
         cpp_executable = os.path.join(settings.BASE_DIR, 'cpp_analytics', 'analytics')
@@ -1165,64 +1322,55 @@ def call_cpp_analytics(date_from_str, date_to_str):
         # Перевіряємо чи існує ООП версія
         if os.path.exists(cpp_executable_oop):
             cpp_executable = cpp_executable_oop
-        elif not os.path.exists(cpp_executable):
-            return {'error': 'C++ модуль не знайдено'}
-        
-        if not os.path.exists(cpp_executable):
-            return {'error': 'C++ модуль не знайдено'}
-        
-        try:
-            date_from = datetime.strptime(date_from_str, '%Y-%m-%d').date()
-            date_to = datetime.strptime(date_to_str, '%Y-%m-%d').date()
-        except (ValueError, TypeError):
-            date_from = (timezone.now() - timedelta(days=30)).date()
-            date_to = timezone.now().date()
         
-        # ОДИН запит до БД
-        sales = Sale.objects.filter(
-            created_at__date__gte=date_from,
-            created_at__date__lte=date_to
-        ).prefetch_related('saleitem_set__product__category')
+        use_native = native.is_available()
+        has_executable = os.path.exists(cpp_executable)
         
-        # Формуємо JSON
-        input_data = {'sales': []}
+        # Пряме читання db.sqlite3 - без вибірки через ORM та передачі даних
+        database_path = sqlite_source.database_path()
+        if database_path and (native.supports_sqlite() or has_executable):
+            try:
+                if native.supports_sqlite():
+                    result = native.run_sqlite(database_path, date_from, date_to)
+                elif analytics_pool.is_enabled():
+                    result = analytics_pool.run_sqlite(database_path, date_from, date_to)
+                else:
+                    result = sqlite_source.run_executable(cpp_executable, database_path, date_from, date_to)
+            except (RuntimeError, analytics_pool.PoolUnavailable) as e:
+                result = {'error': str(e)}
+            if result.get('error') in (None, 'No sales found'):
+                return result
+            logging.getLogger(__name__).warning(f'C++ модуль (SQLite): {result["error"]}')
+        if not (use_native or has_executable or numpy_backend.is_available()):
+            return {'error': 'C++ модуль не знайдено'}
         
-        for sale in sales:
-            sale_data = {
-                'id': sale.id,
-                'date': sale.created_at.strftime('%Y-%m-%d'),
-                'total_amount': float(sale.total_amount),
-                'items': []
-            }
+        if use_native or not has_executable:
+            # Два запити values_list замість гідрації моделей
+            columns = fetch_sales_columns(date_from, date_to)
             
-            for item in sale.saleitem_set.all():
-                sale_data['items'].append({
-                    'product_id': item.product.id,
-                    'product_name': item.product.name,
-                    'category_id': item.product.category.id,
-                    'category_name': item.product.category.name,
-                    'quantity': item.quantity,
-                    'price': float(item.price),
-                    'subtotal': float(item.subtotal),
-                })
+            if use_native:
+                try:
+                    return native.run_columnar(columns)
+                except RuntimeError as e:
+                    logging.getLogger(__name__).warning(f'C++ бібліотека: {e}')
             
-            input_data['sales'].append(sale_data)
+            # Модуль не зібрано - векторизований NumPy-бекенд з тими ж показниками
+            if not has_executable:
+                if numpy_backend.is_available():
+                    return numpy_backend.compute(columns)
+                return {'error': 'C++ модуль не знайдено'}
         
-        # Виклик C++ програми
-        result = subprocess.run(
-            [cpp_executable],
-            input=json.dumps(input_data, ensure_ascii=False),
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
+        # Прогрітий воркер пулу замість запуску процесу на кожен запит
+        if analytics_pool.is_enabled():
+            try:
+                return analytics_pool.run_stream(date_from, date_to)
+            except analytics_pool.PoolUnavailable as e:
+                logging.getLogger(__name__).warning(f'Пул воркерів C++ модуля: {e}')
         
-        if result.returncode == 0:
-            return json.loads(result.stdout)
-        else:
-            return {'error': result.stderr or 'Помилка виконання C++ модуля'}
+        # Виклик C++ програми з потоковим колонковим вводом (без JSON документа в пам'яті)
+        return analytics_stream.run_executable(cpp_executable, date_from, date_to, timeout=30)
     
     except json.JSONDecodeError as e:
         return {'error': f'Помилка парсингу JSON від C++: {str(e)}'}
     except Exception as e:
-        return {'error': str(e)}
\ No newline at end of file
+        return {'error': str(e)}